@@ -0,0 +1,246 @@
+#!/usr/bin/python
+# -*- coding: latin-1 -*-
+
+# Newer DS Credits Editor - Edits Newer DS's
+# zh_cutscenes/A_CREDITS/2848 Credits_Sequence.bin
+# Version 1.0
+# Copyright (C) 2013-2019 RoadrunnerWMC
+
+# This file is part of Newer DS Credits Editor.
+
+# Newer DS Credits Editor is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Newer DS Credits Editor is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Newer DS Credits Editor.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# benchmark.py
+# Measures the time and peak memory used by the editor's main
+# operations on generated sequences of various sizes. Run with --help
+# for options.
+
+
+################################################################
+################################################################
+
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import newer_ds_credits_core as core
+
+
+################################################################
+################################################################
+################################################################
+###################### Sequence Generator ######################
+
+
+_ROLES = ['Programming', 'Graphics', 'Music', 'Level Design', 'Testing', 'Special Thanks']
+_NAMES = ['Treeki', 'Tempus', 'RoadrunnerWMC', 'Skawo', 'Meatball132', 'Kirblue',
+    'Grop', 'Danster64', 'Sir_Lemmington', 'AceOfIce', 'Ninji', 'Pop006']
+
+
+def generateSequence(count, seed=0):
+    """
+    Generate a CreditsSequenceBin with exactly count commands that
+    looks like a real credits sequence: loading fonts, then pages of
+    header and body text separated by delays, with occasional scene
+    switches. The same count and seed always give the same sequence.
+    """
+    rng = random.Random(seed)
+    commands = [
+        core.LoadFileCommand(rng.randrange(0x10000), 1),
+        core.LoadFileCommand(rng.randrange(0x10000), 2),
+        core.FadeFromBlackCommand(),
+        ]
+
+    while len(commands) < count:
+        if rng.random() < 0.1:
+            commands += [
+                core.FadeToBlackCommand(),
+                core.DelayCommand(30),
+                core.SwitchSceneCommand(rng.randrange(1, 5), rng.randrange(4), 1, 2, 3, False),
+                core.DelayCommand(rng.choice([1, 2, 5])),
+                core.FadeFromBlackCommand(),
+                ]
+
+        commands += [
+            core.SetHeaderTextCommand(rng.choice(_ROLES)),
+            core.SetBodyTextCommand('\n'.join(rng.sample(_NAMES, rng.randrange(1, 5)))),
+            core.ShowTextCommand(),
+            core.DelayCommand(rng.choice([120, 180, 240, 300])),
+            core.HideTextCommand(),
+            core.DelayCommand(rng.choice([20, 30, 40])),
+            ]
+
+    file = core.CreditsSequenceBin()
+    file.Commands = commands[:count - 1] + [core.ExitStageCommand()]
+    return file
+
+
+def editSequence(file, changes, seed=0):
+    """
+    Return a copy of a CreditsSequenceBin with some commands inserted,
+    removed or replaced at random places
+    """
+    rng = random.Random(seed)
+    commands = list(file.Commands)
+    for _ in range(changes):
+        i = rng.randrange(len(commands))
+        op = rng.randrange(3)
+        if op == 0:
+            commands.insert(i, core.DelayCommand(rng.randrange(1000)))
+        elif op == 1 and len(commands) > 1:
+            del commands[i]
+        else:
+            commands[i] = core.DelayCommand(rng.randrange(1000))
+
+    edited = core.CreditsSequenceBin()
+    edited.Commands = commands
+    return edited
+
+
+################################################################
+################################################################
+################################################################
+######################### Measurements #########################
+
+
+def measure(setup, operation, repeat):
+    """
+    Time operation(setup()) repeat times, and then run it once more
+    under tracemalloc. Returns (best time in seconds, peak memory in
+    bytes). Only memory allocated by Python is counted, not memory
+    allocated by Qt.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        operation(arg)
+        best = min(best, time.perf_counter() - start)
+
+    arg = setup()
+    tracemalloc.start()
+    try:
+        operation(arg)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return best, peak
+
+
+def benchmarkCore(count, seed, repeat):
+    """
+    Benchmark the operations that don't need Qt
+    """
+    file = generateSequence(count, seed)
+    data = file.save()
+
+    results = {}
+    results['_initFromData'] = measure(lambda: data, core.CreditsSequenceBin, repeat)
+    results['save'] = measure(lambda: file, lambda f: f.save(), repeat)
+
+    # Comparing with a copy that has a few scattered changes, and with
+    # a completely different sequence, which costs the most
+    edited = editSequence(file, max(1, count // 30), seed)
+    other = generateSequence(count, seed + 1)
+    results['diffSequences (edited)'] = measure(lambda: edited, lambda f: core.diffSequences(file, f), repeat)
+    results['diffSequences (other)'] = measure(lambda: other, lambda f: core.diffSequences(file, f), repeat)
+    return results
+
+
+def benchmarkGui(count, seed, repeat, app):
+    """
+    Benchmark the operations in CreditsViewer. Each of these includes
+    processing the resulting events (layout and painting).
+    """
+    from PyQt5 import QtCore
+    from newer_ds_credits_editor import CreditsViewer
+
+    file = generateSequence(count, seed)
+    viewer = CreditsViewer()
+    viewer.resize(800, 600)
+    viewer.show()
+    app.processEvents()
+
+    def setFile(f):
+        viewer.setFile(f)
+        app.processEvents()
+
+    def updateNames(_):
+        viewer.updateNames()
+        app.processEvents()
+
+    def dragDrop(_):
+        # Drag the first command to the end, the same way a drop on
+        # the list does
+        model = viewer.model
+        mime = model.mimeData([model.index(0)])
+        model.dropMimeData(mime, Qt.MoveAction, model.rowCount(), 0, QtCore.QModelIndex())
+        app.processEvents()
+
+    Qt = QtCore.Qt
+    results = {}
+    results['CreditsViewer.setFile'] = measure(lambda: generateSequence(count, seed), setFile, repeat)
+    results['updateNames'] = measure(lambda: None, updateNames, repeat)
+    results['handleDragDrop'] = measure(lambda: None, dragDrop, repeat)
+
+    viewer.close()
+    viewer.deleteLater()
+    app.processEvents()
+    return results
+
+
+def main(argv):
+    """
+    Main startup function
+    """
+    parser = argparse.ArgumentParser(description='Benchmark Newer DS Credits Editor on generated sequences.')
+    parser.add_argument('--sizes', default='100,1000,10000,100000,1000000',
+        help='comma-separated sequence sizes, in commands (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='generator seed (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per operation; the best is reported (default: %(default)s)')
+    parser.add_argument('--no-gui', action='store_true', help='skip the operations that need Qt')
+    parser.add_argument('--json', help='also write the results to this JSON file')
+    options = parser.parse_args(argv[1:])
+
+    app = None
+    if not options.no_gui:
+        # Run without a display unless one is asked for
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5 import QtWidgets
+        app = QtWidgets.QApplication(argv[:1])
+
+    allResults = []
+    print(f'{"commands":>9}  {"operation":<24} {"time (ms)":>10} {"peak (KiB)":>11}')
+    for count in (int(s) for s in options.sizes.split(',')):
+        results = benchmarkCore(count, options.seed, options.repeat)
+        if app is not None:
+            results.update(benchmarkGui(count, options.seed, options.repeat, app))
+
+        for operation, (seconds, peak) in results.items():
+            print(f'{count:>9}  {operation:<24} {seconds * 1000:>10.2f} {peak / 1024:>11.1f}')
+            allResults.append({'commands': count, 'operation': operation, 'seconds': seconds, 'peakBytes': peak})
+
+    if options.json:
+        with open(options.json, 'w', encoding='utf-8') as f:
+            json.dump({'seed': options.seed, 'repeat': options.repeat, 'results': allResults}, f, indent=1)
+
+if __name__ == '__main__': main(sys.argv)
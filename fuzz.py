@@ -0,0 +1,318 @@
+#!/usr/bin/python
+# -*- coding: latin-1 -*-
+
+# Newer DS Credits Editor - Edits Newer DS's
+# zh_cutscenes/A_CREDITS/2848 Credits_Sequence.bin
+# Version 1.0
+# Copyright (C) 2013-2019 RoadrunnerWMC
+
+# This file is part of Newer DS Credits Editor.
+
+# Newer DS Credits Editor is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Newer DS Credits Editor is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Newer DS Credits Editor.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# fuzz.py
+# Coverage-guided fuzzing of the sequence file parser. Inputs are
+# mutated from a corpus, and ones that run new code in
+# newer_ds_credits_core.py are added to it. Each input is checked with
+# checkInput(). Run with --help for options.
+
+
+################################################################
+################################################################
+
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+import traceback
+
+import benchmark
+import newer_ds_credits_core as core
+
+try:
+    import newer_ds_credits_arrays as arrays
+except ImportError: # NumPy isn't installed; the columnar form isn't checked
+    arrays = None
+
+
+################################################################
+################################################################
+################################################################
+########################### Checks #############################
+
+
+def _tooLong(com):
+    """
+    Return True if a command's text or data is too long to be saved
+    """
+    if isinstance(com, core.TextCommand):
+        return len(com.text) > core.MAX_TEXT_LENGTH
+    return type(com) is core.UnknownCommand and len(com.data) > core.MAX_UNKNOWN_DATA_LENGTH
+
+
+def _saveOrTextTooLong(file):
+    """
+    Return file.save(), or None if it can't be saved because some text
+    or unknown command data is too long. Files can contain records
+    that are slightly too long to save again, since padding a record
+    to a multiple of 4 bytes can take it over 255.
+    """
+    try:
+        return file.save()
+    except ValueError:
+        if not any(_tooLong(com) for com in file.Commands):
+            raise
+        return None
+
+
+def checkInput(data):
+    """
+    Parse data in every way the editor can, and raise AssertionError if
+    the results are inconsistent. Any other exception is a bug too.
+    """
+    # Recovering never fails
+    recovered = core.CreditsSequenceBin(data, recover=True)
+    saved = _saveOrTextTooLong(recovered)
+
+    # Strict parsing fails exactly when recovering finds problems, at
+    # the same place, and otherwise gives the same commands
+    try:
+        strict = core.CreditsSequenceBin(data)
+    except core.SequenceParseError as e:
+        assert recovered.parseErrors, 'strict parsing failed, but recovering found no problems'
+        assert recovered.parseErrors[0].offset == e.offset, 'the first problems are in different places'
+        strict = None
+    else:
+        assert not recovered.parseErrors, 'recovering found problems, but strict parsing didn\'t'
+        assert _saveOrTextTooLong(strict) == saved, 'strict and recovering parsing disagree'
+
+    # Streaming agrees with strict parsing
+    try:
+        streamed = core.CreditsSequenceBin()
+        streamed.Commands = list(core.iterCommands(data))
+    except core.SequenceParseError:
+        assert strict is None, 'streaming failed, but strict parsing didn\'t'
+    else:
+        assert strict is not None, 'strict parsing failed, but streaming didn\'t'
+        assert _saveOrTextTooLong(streamed) == saved, 'streaming and strict parsing disagree'
+
+    # The columnar form of the data gives the same commands, or fails
+    # on the same damage
+    if arrays is not None:
+        try:
+            columns = arrays.columnsFromData(data)
+        except core.SequenceParseError:
+            assert strict is None, 'columnsFromData() failed, but strict parsing didn\'t'
+        else:
+            try:
+                fromColumns = arrays.columnsToSequence(columns)
+            except ValueError:
+                assert strict is None, 'the columns can\'t be converted back, but strict parsing didn\'t fail'
+            else:
+                assert strict is not None, 'strict parsing failed, but the columns can be converted back'
+                assert _saveOrTextTooLong(fromColumns) == saved, 'the columns and strict parsing disagree'
+
+    if saved is None: return
+
+    # Whatever was loaded saves without any damage, and loads back the
+    # same, including through scripts and JSON
+    again = core.CreditsSequenceBin(saved, recover=True)
+    assert not again.parseErrors, 'saving damaged the file'
+    assert again.save() == saved, 'saving isn\'t stable'
+    assert core.compileScript(core.decompileScript(recovered)[0])[0].save() == saved, 'the script form is different'
+    assert core.sequenceFromJson(core.sequenceToJson(recovered)).save() == saved, 'the JSON form is different'
+    if arrays is not None:
+        assert arrays.columnsToSequence(arrays.sequenceToColumns(recovered)).save() == saved, 'the columnar form is different'
+
+
+################################################################
+################################################################
+################################################################
+########################### Coverage ###########################
+
+
+class Coverage():
+    """
+    Records which lines of some files run right after which others
+    ("edges"), with sys.settrace()
+    """
+    def __init__(self, *filenames):
+        self.filenames = set(filenames)
+        self.edges = set()
+
+    def _trace(self, frame, event, arg):
+        if frame.f_code.co_filename not in self.filenames: return None
+        edges = self.edges
+        last = -frame.f_code.co_firstlineno
+
+        def traceLines(frame, event, arg):
+            nonlocal last
+            if event == 'line':
+                line = frame.f_lineno
+                edges.add((last, line))
+                last = line
+            return traceLines
+        return traceLines
+
+    def run(self, func, *args):
+        """
+        Run func(*args) and return the set of edges it covered
+        """
+        self.edges = set()
+        sys.settrace(self._trace)
+        try:
+            func(*args)
+        finally:
+            sys.settrace(None)
+        return self.edges
+
+
+################################################################
+################################################################
+################################################################
+########################### Mutation ###########################
+
+
+_INTERESTING_BYTES = [0, 1, 2, 3, 4, 5, 8, 0x0B, 0x0E, 0x22, 0x23, 0x7F, 0x80, 0xFC, 0xFD, 0xFE, 0xFF]
+
+
+def _randomRecord(rng):
+    """
+    Return the record of a random (valid) command
+    """
+    comType = rng.choice(list(core.CommandsById.values()))
+    values = {}
+    for f in comType.fieldSpecs:
+        kind = core.FIELD_KINDS[f.kind]
+        if f.kind == 'text':
+            values[f.name] = ''.join(chr(rng.randrange(0x100)) for _ in range(rng.choice([0, 1, 5, 249])))
+        elif kind.maximum is None:
+            values[f.name] = rng.random() < 0.5
+        else:
+            values[f.name] = rng.choice([0, 1, kind.maximum, rng.randrange(kind.maximum + 1)])
+    out = bytearray()
+    core.CommandEncoders[comType](comType(**values), out)
+    return out
+
+
+def mutate(data, rng, corpus, maxLength):
+    """
+    Return a mutated copy of data
+    """
+    data = bytearray(data)
+    for _ in range(rng.randint(1, 4)):
+        op = rng.randrange(7)
+        pos = rng.randrange(len(data) + 1)
+        if op == 0 and data:
+            data[pos % len(data)] ^= 1 << rng.randrange(8)
+        elif op == 1 and data:
+            data[pos % len(data)] = rng.choice(_INTERESTING_BYTES)
+        elif op == 2:
+            data[pos:pos] = bytes(rng.randrange(0x100) for _ in range(rng.randint(1, 8)))
+        elif op == 3:
+            del data[pos : pos + rng.randint(1, 16)]
+        elif op == 4:
+            del data[pos:]
+        elif op == 5:
+            other = rng.choice(corpus)
+            data[pos:] = other[rng.randrange(len(other) + 1):]
+        else:
+            pos -= pos % 4
+            data[pos:pos] = _randomRecord(rng)
+    return bytes(data[:maxLength])
+
+
+def seedCorpus():
+    """
+    Return a list of inputs to start from
+    """
+    everyType = core.CreditsSequenceBin()
+    everyType.Commands = [comType() for comType in core.CommandsById.values()]
+    seeds = [b'', b'\x02\x00', everyType.save()]
+    seeds.extend(benchmark.generateSequence(count, count).save() for count in (1, 5, 20, 60))
+    return seeds
+
+
+################################################################
+################################################################
+################################################################
+############################ main() ############################
+
+
+def main(argv):
+    """
+    Main startup function
+    """
+    parser = argparse.ArgumentParser(description='Fuzz the Newer DS Credits Editor sequence parser.')
+    parser.add_argument('--seconds', type=float, default=60, help='how long to run for (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: %(default)s)')
+    parser.add_argument('--max-length', type=int, default=1024, help='largest input, in bytes (default: %(default)s)')
+    parser.add_argument('--corpus', help='directory of inputs to start from, which new inputs are also saved to')
+    parser.add_argument('--no-coverage', action='store_true', help='mutate randomly, without coverage tracing')
+    options = parser.parse_args(argv[1:])
+
+    rng = random.Random(options.seed)
+    corpus = seedCorpus()
+    if options.corpus:
+        os.makedirs(options.corpus, exist_ok=True)
+        for name in sorted(os.listdir(options.corpus)):
+            with open(os.path.join(options.corpus, name), 'rb') as f:
+                corpus.append(f.read())
+
+    coverage = Coverage(core.__file__)
+    seen = set()
+    for data in corpus:
+        seen |= coverage.run(checkInput, data)
+
+    start = lastReport = time.perf_counter()
+    execs = 0
+    while time.perf_counter() - start < options.seconds:
+        data = mutate(rng.choice(corpus), rng, corpus, options.max_length)
+        try:
+            if options.no_coverage:
+                checkInput(data)
+                edges = set()
+            else:
+                edges = coverage.run(checkInput, data)
+        except Exception:
+            name = f'crash-{hashlib.sha1(data).hexdigest()}.bin'
+            with open(name, 'wb') as f:
+                f.write(data)
+            traceback.print_exc()
+            print(f'Failed on an input of {len(data)} bytes, saved as {name}')
+            return 1
+        execs += 1
+
+        if not edges <= seen:
+            seen |= edges
+            corpus.append(data)
+            if options.corpus:
+                with open(os.path.join(options.corpus, hashlib.sha1(data).hexdigest()), 'wb') as f:
+                    f.write(data)
+
+        now = time.perf_counter()
+        if now - lastReport >= 5:
+            lastReport = now
+            print(f'{execs:>9} execs  {execs / (now - start):>7.0f}/s  {len(seen):>5} edges  {len(corpus):>5} inputs')
+
+    elapsed = time.perf_counter() - start
+    print(f'Done: {execs} execs in {elapsed:.1f} s ({execs / elapsed:.0f}/s), {len(seen)} edges, {len(corpus)} inputs, no failures')
+    return 0
+
+if __name__ == '__main__': sys.exit(main(sys.argv))
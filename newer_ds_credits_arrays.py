@@ -0,0 +1,544 @@
+#!/usr/bin/python
+# -*- coding: latin-1 -*-
+
+# Newer DS Credits Editor - Edits Newer DS's
+# zh_cutscenes/A_CREDITS/2848 Credits_Sequence.bin
+# Version 1.0
+# Copyright (C) 2013-2019 RoadrunnerWMC
+
+# This file is part of Newer DS Credits Editor.
+
+# Newer DS Credits Editor is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Newer DS Credits Editor is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Newer DS Credits Editor.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# newer_ds_credits_arrays.py
+# Operations on many commands at once, using NumPy arrays. Unlike
+# newer_ds_credits_core.py, this needs NumPy, so the editor only
+# imports it when one of these operations is used.
+
+
+################################################################
+################################################################
+
+
+import collections
+import io
+import re
+
+import numpy as np
+
+import newer_ds_credits_core as core
+
+
+################################################################
+################################################################
+################################################################
+########################## Bulk Edits ##########################
+
+
+# Each bulk edit takes the indices of the commands to change (a
+# selection or the result of a filter), ignores the ones that don't
+# have the field being changed, and writes all of the new values back
+# with a single CreditsSequenceBin.setFieldValues() call. They return
+# the indices of the commands that actually changed.
+
+
+def commandsWithField(file, indices, field):
+    """
+    Return an array of the indices whose commands have a field
+    """
+    commands = file.Commands
+    types = {comType for comType, fields in core.CommandFields.items() if field in fields}
+    return np.fromiter((i for i in indices if type(commands[i]) in types), dtype=np.intp)
+
+
+def fieldMaximum(file, indices, field):
+    """
+    Return the largest value that every command at indices can store
+    in an integer field, or None if it's a boolean or string field
+    """
+    commands = file.Commands
+    limits = {core.CommandFieldLimits[type(commands[i])].get(field) for i in indices}
+    limits.discard(None)
+    return min(limits) if limits else None
+
+
+def gatherField(file, indices, field):
+    """
+    Return an array of the values of a field of the commands at
+    indices (which must all have it)
+    """
+    commands = file.Commands
+    values = [getattr(commands[i], field) for i in indices]
+    if values and type(values[0]) is str:
+        return np.array(values, dtype=object)
+    return np.array(values, dtype=bool if values and type(values[0]) is bool else np.int64)
+
+
+def scatterField(file, indices, field, values):
+    """
+    Write an array of values back to a field of the commands at
+    indices, as one change. Returns the indices that changed.
+    """
+    return file.setFieldValues(field, indices.tolist(), values.tolist())
+
+
+def scaleDelays(file, indices, factor=1.0, offset=0):
+    """
+    Multiply the time of every delay at indices by factor and then add
+    offset (both in frames), rounding to the nearest frame and keeping
+    within the range the game can store
+    """
+    indices = commandsWithField(file, indices, 'time')
+    times = gatherField(file, indices, 'time')
+    maximum = core.CommandFieldLimits[core.DelayCommand]['time']
+    newTimes = np.clip(np.rint(times * factor + offset), 0, maximum).astype(np.int64)
+    return scatterField(file, indices, 'time', newTimes)
+
+
+def remapField(file, indices, field, table):
+    """
+    Replace the values of an integer field (an area, entrance or
+    background ID, for example) through table, {old value: new value}.
+    Values that aren't in the table are left alone. Raises ValueError
+    if a new value is too large for the field.
+    """
+    indices = commandsWithField(file, indices, field)
+    if not len(indices) or not table: return []
+    maximum = fieldMaximum(file, indices, field)
+    if maximum is None:
+        raise ValueError(f'"{field}" isn\'t an integer field')
+    for new in table.values():
+        if not 0 <= new <= maximum:
+            raise ValueError(f'"{field}" must be between 0 and {maximum}')
+
+    # A lookup table over every possible value does the whole remap in
+    # one indexing operation
+    values = gatherField(file, indices, field)
+    lookup = np.arange(maximum + 1, dtype=np.int64)
+    old = np.fromiter(table.keys(), dtype=np.int64)
+    inRange = (old >= 0) & (old <= maximum)
+    lookup[old[inRange]] = np.fromiter(table.values(), dtype=np.int64)[inRange]
+    return scatterField(file, indices, field, lookup[values])
+
+
+def fillField(file, indices, field, value):
+    """
+    Set a field to the same value in every command at indices that has
+    it. Raises ValueError if the value doesn't fit the field.
+    """
+    indices = commandsWithField(file, indices, field)
+    if not len(indices): return []
+    for comType in {type(file.Commands[i]) for i in indices.tolist()}:
+        limits = core.CommandFieldLimits[comType]
+        kind = str if field not in limits else bool if limits[field] is None else int
+        if type(value) is not kind:
+            raise ValueError(f'"{field}" must be {"a string" if kind is str else "true or false" if kind is bool else "an integer"}')
+        if kind is int and not 0 <= value <= limits[field]:
+            raise ValueError(f'"{field}" must be between 0 and {limits[field]}')
+
+    values = np.empty(len(indices), dtype=object)
+    values.fill(value)
+    return scatterField(file, indices, field, values)
+
+
+
+################################################################
+################################################################
+################################################################
+######################### Columnar Form ########################
+
+
+# A sequence in columnar form is a SequenceColumns:
+#
+# - table is a structured array with one row per command: its index,
+#   command ID, the byte offset of its record in the binary form, and
+#   the frame it runs on (as in Timeline.startFrame()).
+# - fields is {command type: structured array}, with one row for each
+#   command of that type: its index, and then its fields, with the
+#   same sizes as in the binary form. Text commands have the length of
+#   their text as well, since fixed-size byte strings lose trailing
+#   null bytes. Command types without fields only appear in table.
+# - fields[core.UnknownCommand] has the records that can't be decoded,
+#   as raw bytes: ones with unknown command IDs, and damaged ones that
+#   are too short for their command type. Their IDs are in table as
+#   usual, but they don't appear in the columns of that type.
+#
+# Each array can be filtered, sorted and summed like any other NumPy
+# array, without creating Command objects.
+SequenceColumns = collections.namedtuple('SequenceColumns', 'table fields')
+
+TABLE_DTYPE = np.dtype([('index', '<i8'), ('id', 'u1'), ('offset', '<u4'), ('frame', '<i8')])
+
+_TEXT_DTYPE = np.dtype([('length', 'u1'), ('text', f'S{0xFF}')])
+
+_BLOB_DTYPE = np.dtype([('index', '<i8'), ('id', 'u1'), ('length', 'u1'), ('data', f'S{0xFF}')])
+
+_STRUCT_CODES = {'B': 'u1', 'H': '<u2', 'I': '<u4', '?': '?'}
+
+
+def _recordDtype(comType):
+    """
+    Return a packed dtype matching a command type's dataStruct, so
+    that its parameters can be viewed directly in the binary form. Pad
+    bytes become gaps between the fields.
+    """
+    names, formats, offsets = [], [], []
+    fields = iter(core.CommandFields[comType])
+    offset = 0
+    for count, code in re.findall(r'(\d*)([a-zA-Z?])', comType.dataStruct.format):
+        for _ in range(int(count or 1)):
+            if code != 'x':
+                names.append(next(fields))
+                formats.append(_STRUCT_CODES[code])
+                offsets.append(offset)
+            offset += np.dtype(_STRUCT_CODES.get(code, 'u1')).itemsize
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': comType.dataStruct.size})
+
+
+# Record dtypes, for command types with fixed-size fields, and the
+# dtypes of their columns in SequenceColumns.fields
+RecordDtypes = {comType: _recordDtype(comType)
+    for comType in core.CommandsById.values() if comType.dataStruct is not None}
+ColumnDtypes = {comType: np.dtype([('index', '<i8')] + [(f, d.fields[f][0]) for f in d.names])
+    for comType, d in RecordDtypes.items()}
+ColumnDtypes.update({comType: np.dtype([('index', '<i8')] + _TEXT_DTYPE.descr)
+    for comType in core.CommandsById.values() if issubclass(comType, core.TextCommand)})
+ColumnDtypes[core.UnknownCommand] = _BLOB_DTYPE
+
+
+def _gatherBytes(buf, starts, lengths):
+    """
+    Return a (len(starts), 0xFF) array of the lengths[i] bytes at each
+    of starts, padded with nulls
+    """
+    padded = np.concatenate([buf, np.zeros(0xFF, dtype=np.uint8)])
+    raw = padded[starts[:, None] + np.arange(0xFF)]
+    raw[np.arange(0xFF) >= lengths[:, None]] = 0
+    return raw
+
+
+def _columnsFromRecords(data, offsets):
+    """
+    Return the SequenceColumns of a sequence in binary form, given the
+    offsets of its records
+    """
+    buf = np.frombuffer(bytes(data), dtype=np.uint8)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    ids = buf[offsets + 1]
+    recordLengths = buf[offsets].astype(np.int64)
+
+    # Records are decoded as their command type only if they're long
+    # enough for it; everything else is kept as raw bytes
+    decoded = np.zeros(len(offsets), dtype=bool)
+
+    table = np.empty(len(offsets), dtype=TABLE_DTYPE)
+    table['index'] = np.arange(len(offsets))
+    table['id'] = ids
+    table['offset'] = offsets
+    table['frame'] = 0
+
+    fields = {}
+    for id, comType in core.CommandsById.items():
+        isType = ids == id
+        if comType not in ColumnDtypes:
+            decoded |= isType
+            continue
+
+        # Gather the parameter bytes of every record of this type into
+        # one row each, and view the rows as records
+        if comType in RecordDtypes:
+            recordDtype = RecordDtypes[comType]
+            positions = np.flatnonzero(isType & (recordLengths >= recordDtype.itemsize + 2))
+            if not len(positions): continue
+            raw = buf[offsets[positions, None] + 2 + np.arange(recordDtype.itemsize)]
+            records = raw.view(recordDtype).ravel()
+        else:
+            textLengths = np.zeros(len(offsets), dtype=np.int64)
+            hasLength = isType & (recordLengths >= 3)
+            textLengths[hasLength] = buf[offsets[hasLength] + 2]
+            positions = np.flatnonzero(hasLength & (textLengths + 3 <= recordLengths))
+            if not len(positions): continue
+            raw = _gatherBytes(buf, offsets[positions] + 3, textLengths[positions])
+            records = np.empty(len(positions), dtype=_TEXT_DTYPE)
+            records['length'] = textLengths[positions]
+            records['text'] = raw.view(_TEXT_DTYPE['text']).ravel()
+
+        decoded[positions] = True
+        column = np.empty(len(positions), dtype=ColumnDtypes[comType])
+        column['index'] = positions
+        for name in records.dtype.names:
+            column[name] = records[name]
+        fields[comType] = column
+
+    positions = np.flatnonzero(~decoded)
+    if len(positions):
+        blobs = np.empty(len(positions), dtype=_BLOB_DTYPE)
+        blobs['index'] = positions
+        blobs['id'] = ids[positions]
+        blobs['length'] = recordLengths[positions] - 2
+        raw = _gatherBytes(buf, offsets[positions] + 2, recordLengths[positions] - 2)
+        blobs['data'] = raw.view(_BLOB_DTYPE['data']).ravel()
+        fields[core.UnknownCommand] = blobs
+
+    # Every command runs on the frame after all of the delays before it
+    delays = fields.get(core.DelayCommand)
+    if delays is not None:
+        waits = np.zeros(len(offsets), dtype=np.int64)
+        waits[delays['index']] = delays['time']
+        table['frame'][1:] = np.cumsum(waits)[:-1]
+
+    return SequenceColumns(table, fields)
+
+
+def sequenceToColumns(file):
+    """
+    Convert a CreditsSequenceBin to a SequenceColumns
+    """
+    f = io.BytesIO()
+    offsets = []
+    file.saveTo(f, offsets=offsets)
+    return _columnsFromRecords(f.getbuffer(), offsets)
+
+
+def columnsFromData(data):
+    """
+    Return the SequenceColumns of a sequence file's data, without
+    creating Command objects
+    """
+    offsets = [offset for offset, id, params in core.iterRecords(data)]
+    return _columnsFromRecords(data, offsets)
+
+
+def columnsToSequence(columns):
+    """
+    Create a CreditsSequenceBin from a SequenceColumns. Raises
+    ValueError if table and fields don't agree with each other, or if
+    there's a damaged record, which can't be turned into a command.
+    """
+    table, fields = columns
+    ids = table['id']
+    if not np.array_equal(table['index'], np.arange(len(table))):
+        raise ValueError('The table\'s indices aren\'t 0, 1, 2...')
+
+    commands = np.empty(len(table), dtype=object)
+    isBlob = np.zeros(len(table), dtype=bool)
+    blobs = fields.get(core.UnknownCommand)
+    if blobs is not None:
+        positions = blobs['index']
+        if (np.any(np.diff(positions) <= 0) or np.any((positions < 0) | (positions >= len(table)))
+                or not np.array_equal(blobs['id'], ids[positions])):
+            raise ValueError('The Unknown commands in fields don\'t match the table')
+        isBlob[positions] = True
+        for index, id, length, data in blobs.tolist():
+            try:
+                commands[index] = core.UnknownCommand(id, data.ljust(length, b'\0'))
+            except ValueError as e:
+                raise ValueError(f'Command {index} is damaged: {e}') from None
+
+    for id in np.unique(ids[~isBlob]).tolist():
+        comType = core.CommandsById.get(id)
+        if comType is None:
+            raise ValueError(f'Unknown command ID: {id}')
+        positions = np.flatnonzero((ids == id) & ~isBlob)
+
+        if comType not in ColumnDtypes:
+            commands[positions] = comType()
+            continue
+
+        column = fields.get(comType)
+        if column is None or not np.array_equal(column['index'], positions):
+            raise ValueError(f'The {core.CommandTypeNames[comType]} commands in fields don\'t match the table')
+
+        if comType in RecordDtypes:
+            rows = column[list(core.CommandFields[comType])].tolist()
+            values = [comType(*row) for row in rows]
+        else:
+            values = [comType(text.ljust(length, b'\0').decode('latin-1'))
+                for length, text in zip(column['length'].tolist(), column['text'].tolist())]
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        commands[positions] = column
+
+    file = core.CreditsSequenceBin()
+    file.Commands = commands.tolist()
+    return file
+
+
+def saveColumns(path, columns):
+    """
+    Save a SequenceColumns to a .npz file, with one array for the
+    table and one for each command type, named after it
+    """
+    arrays = {core.CommandTypeNames[comType]: column for comType, column in columns.fields.items()}
+    np.savez(path, table=columns.table, **arrays)
+
+
+def loadColumns(path):
+    """
+    Load a SequenceColumns saved by saveColumns()
+    """
+    with np.load(path) as npz:
+        fields = {core.CommandsByTypeName[name]: npz[name] for name in npz.files if name != 'table'}
+        return SequenceColumns(npz['table'], fields)
+
+
+
+################################################################
+################################################################
+################################################################
+############################ Queries ###########################
+
+
+# These answer questions about a whole sequence from its
+# SequenceColumns. State that's carried from command to command (the
+# current scene, which text is showing...) is worked out for every
+# command at once, by finding the last command before it that set it.
+
+
+def _lastSet(mask):
+    """
+    Return, for each position, the last position at or before it where
+    mask is true, or -1 if there isn't one
+    """
+    return np.maximum.accumulate(np.where(mask, np.arange(len(mask)), -1))
+
+
+def _stateAt(mask, values, initial):
+    """
+    Return, for each position, the value set by the last position at or
+    before it where mask is true (values is indexed by position), or
+    initial if there isn't one
+    """
+    last = _lastSet(mask)
+    return np.where(last >= 0, values[np.maximum(last, 0)], initial)
+
+
+def _isType(columns, *comTypes):
+    """
+    Return a mask of the commands of any of the given types, leaving
+    out records that can't be decoded
+    """
+    mask = np.isin(columns.table['id'], [core.CommandIds[comType] for comType in comTypes])
+    blobs = columns.fields.get(core.UnknownCommand)
+    if blobs is not None:
+        mask[blobs['index']] = False
+    return mask
+
+
+def _delays(columns):
+    """
+    Return (indices, times) of the sequence's delays
+    """
+    delays = columns.fields.get(core.DelayCommand)
+    if delays is None:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return delays['index'], delays['time'].astype(np.int64)
+
+
+def totalWaitPerScene(columns):
+    """
+    Return an array of the total number of frames spent in delays in
+    each scene. Element 0 is the time before the first Switch Scene,
+    and element n the time after the nth one.
+    """
+    indices, times = _delays(columns)
+    scene = np.cumsum(_isType(columns, core.SwitchSceneCommand))
+    sceneCount = (scene[-1] if len(scene) else 0) + 1
+    totals = np.zeros(sceneCount, dtype=np.int64)
+    np.add.at(totals, scene[indices], times)
+    return totals
+
+
+def textPageIndices(columns):
+    """
+    Return the indices of the delays that start each page of text, the
+    same ones as core.iterTextPages()
+    """
+    table, fields = columns
+    n = len(table)
+    T = core
+
+    # Give every distinct text a number, with empty text as -1 (the
+    # same as no text at all)
+    keys = np.full(n, -1, dtype=np.int64)
+    texts = [fields[t] for t in (T.SetHeaderTextCommand, T.SetBodyTextCommand) if t in fields]
+    if texts:
+        allTexts = np.concatenate(texts)
+        unique, numbers = np.unique(allTexts[['length', 'text']], return_inverse=True)
+        keys[allTexts['index']] = np.where(allTexts['length'] > 0, numbers.ravel(), -1)
+
+    shows = np.zeros(n, dtype=bool)
+    shows[_isType(columns, T.ShowTextCommand, T.ShowHeaderTextCommand, T.ShowBodyTextCommand)] = True
+    fades = np.zeros(n, dtype=np.int8)
+    fades[_isType(columns, T.FadeToBlackCommand)] = 1
+    fades[_isType(columns, T.FadeToWhiteCommand)] = 2
+
+    header = _stateAt(_isType(columns, T.SetHeaderTextCommand), keys, -1)
+    body = _stateAt(_isType(columns, T.SetBodyTextCommand), keys, -1)
+    headerShown = _stateAt(_isType(columns, T.ShowTextCommand, T.HideTextCommand,
+        T.ShowHeaderTextCommand, T.HideHeaderTextCommand), shows, False)
+    bodyShown = _stateAt(_isType(columns, T.ShowTextCommand, T.HideTextCommand,
+        T.ShowBodyTextCommand, T.HideBodyTextCommand), shows, False)
+    fade = _stateAt(_isType(columns, T.FadeToBlackCommand, T.FadeFromBlackCommand,
+        T.FadeToWhiteCommand, T.FadeFromWhiteCommand), fades, 0)
+
+    # A page starts at each delay where text is visible, unless the
+    # previous delay showed exactly the same thing
+    d, _ = _delays(columns)
+    header, body, headerShown, bodyShown = header[d], body[d], headerShown[d], bodyShown[d]
+    visible = (fade[d] == 0) & ((headerShown & (header >= 0)) | (bodyShown & (body >= 0)))
+    same = np.zeros(len(d), dtype=bool)
+    same[1:] = (visible[:-1] & (header[1:] == header[:-1]) & (body[1:] == body[:-1])
+        & (headerShown[1:] == headerShown[:-1]) & (bodyShown[1:] == bodyShown[:-1]))
+    return d[visible & ~same]
+
+
+def textPageCount(columns):
+    """
+    Return the number of pages of text in the sequence
+    """
+    return len(textPageIndices(columns))
+
+
+SLOT_USAGE_DTYPE = np.dtype([('slot', 'u1'), ('loads', '<i8'), ('unloads', '<i8'), ('frames', '<i8')])
+
+
+def slotUsage(columns):
+    """
+    Return a structured array with a row for each file slot that's
+    used: how many times a file is loaded into it and unloaded from it,
+    and for how many frames (of delays) it has a file loaded
+    """
+    table, fields = columns
+    n = len(table)
+    slots = np.full(n, -1, dtype=np.int16)
+    loading = np.zeros(n, dtype=bool)
+    for comType in (core.LoadFileCommand, core.UnloadFileCommand):
+        if comType in fields:
+            slots[fields[comType]['index']] = fields[comType]['slot']
+            loading[fields[comType]['index']] = comType is core.LoadFileCommand
+
+    indices, times = _delays(columns)
+    used = np.unique(slots[slots >= 0])
+    usage = np.zeros(len(used), dtype=SLOT_USAGE_DTYPE)
+    usage['slot'] = used
+    for row, slot in enumerate(used.tolist()):
+        mask = slots == slot
+        usage['loads'][row] = np.count_nonzero(mask & loading)
+        usage['unloads'][row] = np.count_nonzero(mask & ~loading)
+        loaded = _stateAt(mask, loading, False)
+        usage['frames'][row] = times[loaded[indices]].sum()
+    return usage
@@ -0,0 +1,3633 @@
+#!/usr/bin/python
+# -*- coding: latin-1 -*-
+
+# Newer DS Credits Editor - Edits Newer DS's
+# zh_cutscenes/A_CREDITS/2848 Credits_Sequence.bin
+# Version 1.0
+# Copyright (C) 2013-2019 RoadrunnerWMC
+
+# This file is part of Newer DS Credits Editor.
+
+# Newer DS Credits Editor is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Newer DS Credits Editor is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Newer DS Credits Editor.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# newer_ds_credits_core.py
+# This contains everything that doesn't need Qt: the commands, the
+# file format, scripts and batch mode. It only uses the standard
+# library, so tools can import it without PyQt being installed.
+# newer_ds_credits_editor.py builds the GUI on top of it.
+
+
+################################################################
+################################################################
+
+
+version = '1.0'
+
+import array
+import atexit
+import bisect
+import collections
+import functools
+import io
+import itertools
+import json
+import mmap
+import operator
+import os
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+
+
+
+################################################################
+################################################################
+################################################################
+############################ Tracing ###########################
+
+
+# Functions decorated with @traced are timed, and the times written
+# to a Chrome trace file (JSON, which chrome://tracing, Perfetto and
+# speedscope can all open), when tracing is enabled. It's enabled by
+# setting the NDCE_TRACE environment variable to the path of the file
+# to write, or with the editor's --trace command-line option.
+#
+# While tracing is disabled, @traced returns the function unchanged,
+# so it costs nothing. enableTracing() replaces each decorated
+# function with a timing wrapper at that point.
+TRACE_ENVIRONMENT_VARIABLE = 'NDCE_TRACE'
+
+
+class Tracer():
+    """
+    Collects trace events in memory, and writes them out as a Chrome
+    trace. Events can be added from any thread. After maxEvents, events
+    are only counted in the summary.
+    """
+    def __init__(self, path, maxEvents=1000000):
+        self.path = path
+        self.maxEvents = maxEvents
+        self.events = []
+        self.dropped = 0
+        self.summary = {} # {name: [calls, total ns, max ns]}
+        self._start = _clockNs()
+        self._pid = os.getpid()
+
+    def addSpan(self, name, start, end):
+        """
+        Record that name ran from start to end (_clockNs() times)
+        """
+        stats = self.summary.get(name)
+        if stats is None:
+            stats = self.summary.setdefault(name, [0, 0, 0])
+        duration = end - start
+        stats[0] += 1
+        stats[1] += duration
+        if duration > stats[2]: stats[2] = duration
+
+        if len(self.events) >= self.maxEvents:
+            self.dropped += 1
+            return
+        self.events.append({'name': name, 'ph': 'X', 'pid': self._pid, 'tid': threading.get_ident(),
+            'ts': (start - self._start) / 1000, 'dur': duration / 1000})
+
+    def addCounter(self, name, value):
+        """
+        Record the current value of a counter, which trace viewers show
+        as a graph over time
+        """
+        if len(self.events) >= self.maxEvents:
+            self.dropped += 1
+            return
+        self.events.append({'name': name, 'ph': 'C', 'pid': self._pid,
+            'ts': (_clockNs() - self._start) / 1000, 'args': {'value': value}})
+
+    def toJson(self):
+        """
+        Return the trace as a JSON string
+        """
+        summary = {name: {'calls': calls, 'totalMs': total / 1e6, 'maxMs': maximum / 1e6}
+            for name, (calls, total, maximum) in sorted(self.summary.items())}
+        return json.dumps({
+            'traceEvents': list(self.events),
+            'displayTimeUnit': 'ms',
+            'otherData': {'version': f'Newer DS Credits Editor {version}', 'summary': summary, 'droppedEvents': self.dropped},
+            })
+
+    def write(self):
+        """
+        Write the trace to self.path
+        """
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(self.toJson())
+
+
+# time.perf_counter_ns() is new in Python 3.7
+try:
+    _clockNs = time.perf_counter_ns
+except AttributeError:
+    def _clockNs():
+        return int(time.perf_counter() * 1000000000)
+
+
+_tracer = None
+_tracedFunctions = []
+
+
+def _traceWrapper(func, tracer):
+    name = func.__qualname__
+    clock = _clockNs
+    addSpan = tracer.addSpan
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            addSpan(name, start, clock())
+    wrapper.untraced = func
+    return wrapper
+
+
+def traced(func):
+    """
+    Decorator for functions and methods that should be timed while
+    tracing is enabled
+    """
+    if _tracer is not None:
+        return _traceWrapper(func, _tracer)
+    _tracedFunctions.append(func)
+    return func
+
+
+def traceCounter(name, value):
+    """
+    Record the value of a counter, if tracing is enabled
+    """
+    if _tracer is not None:
+        _tracer.addCounter(name, value)
+
+
+def enableTracing(path):
+    """
+    Start tracing, and write the trace to path when Python exits.
+    Functions that have already been decorated with @traced are
+    replaced with timing wrappers in their modules and classes. Returns
+    the Tracer.
+    """
+    global _tracer
+    if _tracer is not None: return _tracer
+    _tracer = Tracer(path)
+
+    for func in _tracedFunctions:
+        owner = sys.modules[func.__module__]
+        *ownerPath, attr = func.__qualname__.split('.')
+        for part in ownerPath:
+            owner = getattr(owner, part)
+        if owner.__dict__.get(attr) is func:
+            setattr(owner, attr, _traceWrapper(func, _tracer))
+    _tracedFunctions.clear()
+
+    atexit.register(_tracer.write)
+    return _tracer
+
+
+def _enableTracingFromEnvironment():
+    path = os.environ.get(TRACE_ENVIRONMENT_VARIABLE)
+    if not path: return
+
+    # Batch mode's worker processes import this module too, and
+    # shouldn't overwrite the main process's trace
+    import multiprocessing
+    if multiprocessing.current_process().name == 'MainProcess':
+        enableTracing(path)
+
+_enableTracingFromEnvironment()
+
+
+
+################################################################
+################################################################
+################################################################
+########################### Commands ###########################
+
+
+class Command():
+    """
+    Base class for all commands.
+
+    Commands are plain data: they only hold the values that are saved
+    to the file. Editor widgets for them are created by the GUI, only
+    when the command is selected.
+
+    The subclasses for each command type are created from
+    COMMAND_SCHEMA, below.
+    """
+    __slots__ = ()
+    name = ''
+    description = ''
+    dynamicDescription = None
+
+    # FieldSpecs for the command's fields, in order
+    fieldSpecs = ()
+
+    # Precompiled struct.Struct for the command's parameters, for
+    # commands whose parameters have a fixed layout
+    dataStruct = None
+
+    @classmethod
+    def fromData(cls, data):
+        """
+        Create a Command instance based on some data
+        """
+        return cls.fromBuffer(data, 0)
+
+    @classmethod
+    def fromBuffer(cls, buffer, offset):
+        """
+        Create a Command instance based on data found at some offset
+        in a buffer (bytes, bytearray, memoryview, mmap...), without
+        copying it
+        """
+        if cls.dataStruct is None: return cls()
+        return cls(*cls.dataStruct.unpack_from(buffer, offset))
+
+    def asData(self):
+        """
+        Return data based on current settings
+        """
+        return b''
+
+
+class ParameterlessCommand(Command):
+    """
+    Base class for commands that have no settings. Since they have no
+    state, all instances of each subclass are one shared object.
+    """
+    __slots__ = ()
+    _instance = None
+
+    def __new__(cls):
+        self = cls.__dict__.get('_instance')
+        if self is None:
+            self = super().__new__(cls)
+            cls._instance = self
+        return self
+
+
+NEWER_DS_FILE_SLOTS = [
+    'Logo',
+    'Header Font',
+    'Body Font',
+    'The End',
+    'Coin Counter Font',
+    'Darkness']
+
+
+def fileSlotName(slot):
+    """
+    Return the display name of a file slot number
+    """
+    if 0 <= slot < len(NEWER_DS_FILE_SLOTS):
+        return NEWER_DS_FILE_SLOTS[slot]
+    return f'Unknown ({slot})'
+
+
+# The longest string that fits in a record: a record can be at most
+# 252 bytes (the largest multiple of 4 that fits in its length byte),
+# and 3 of those are the length, ID and string length bytes
+MAX_TEXT_LENGTH = 249
+
+
+class TextCommand(Command):
+    """
+    Base class for commands which set a string of text
+    """
+    __slots__ = ()
+
+    @classmethod
+    def fromBuffer(cls, buffer, offset):
+        strLen = buffer[offset]
+        return cls(str(buffer[offset+1 : offset+1+strLen], 'latin-1'))
+
+    def asData(self):
+        s = self.text.encode('latin-1')
+        if len(s) > 0xFF:
+            raise ValueError(f'Text is too long to be saved ({len(s)} bytes): {self.text!r}')
+        return bytes([len(s)]) + s
+
+
+def _shortText(text):
+    """
+    Return text shortened to fit in a command's description
+    """
+    s = text.replace('\n', ' / ')
+    if len(s) > 16 + 3:
+        s = s[:16] + '...'
+    return s
+
+
+# The kinds of fields commands can have: the struct format code for
+# their value, the largest value (None for booleans and text), the
+# default value, and a function that formats the value for
+# descriptions (None to use it as-is). Text is stored as a length byte
+# followed by that many latin-1 bytes, and has to be a command's only
+# field.
+FieldKind = collections.namedtuple('FieldKind', 'code maximum default display')
+FIELD_KINDS = {
+    'u8': FieldKind('B', 0xFF, 0, None),
+    'u16': FieldKind('H', 0xFFFF, 0, None),
+    'u32': FieldKind('I', 0xFFFFFFFF, 0, None),
+    'bool': FieldKind('?', None, False, None),
+    'slot': FieldKind('B', 0xFF, 0, fileSlotName), # a file slot number
+    'text': FieldKind(None, None, '', _shortText),
+    'pad16': FieldKind('xx', None, None, None), # two unused bytes; no name
+    'blob': FieldKind(None, None, b'', None), # raw bytes (see UnknownCommand)
+    'commandId': FieldKind('B', 0xFF, None, None), # an UnknownCommand's ID; can't be edited
+    }
+
+# One field of a command: its name, kind, and the label for it in the
+# editor
+FieldSpec = collections.namedtuple('FieldSpec', 'name kind label')
+
+# One command type: its ID, its name in scripts and JSON (the class is
+# named typeName + "Command"), its display name and description, its
+# fields in the order they're stored, and a description of a
+# particular command, either as a str.format() template with the
+# (formatted) fields as arguments, or as a function of the command
+CommandSpec = collections.namedtuple('CommandSpec', 'id typeName name description fields summary')
+CommandSpec.__new__.__defaults__ = ((), None) # namedtuple(defaults=) is new in Python 3.7
+
+
+COMMAND_SCHEMA = [
+    CommandSpec(1, 'Delay', 'Wait', 'Causes a delay before the next command is processed.', (
+            FieldSpec('time', 'u16', 'Time (in frames):'),
+        ),
+        lambda com: 'for 1 frame' if com.time == 1 else f'for {com.time} frames'),
+    CommandSpec(2, 'SwitchScene', 'Switch Scene', 'Causes the level to switch to another scene.', (
+            FieldSpec('areaId', 'u16', 'Area ID:'),
+            FieldSpec('entranceId', 'u16', 'Entrance ID:'),
+            FieldSpec('bgTop', 'u8', 'Background ID (top):'),
+            FieldSpec('bgBottom', 'u8', 'Background ID (bottom):'),
+            FieldSpec('tilesetSlot', 'u8', 'Tileset Slot:'),
+            FieldSpec('isEndingScene', 'bool', 'Is Ending Scene'),
+        ),
+        'to area {areaId}, entrance {entranceId}'),
+    CommandSpec(3, 'FadeLogoIn', 'Fade Logo In', 'Causes the logo to begin to fade in.'),
+    CommandSpec(4, 'DropLogo', 'Drop Logo', 'Causes the logo to drop to the lower screen.'),
+    CommandSpec(5, 'FadeToBlack', 'Fade to Black', 'Causes the screen to fade to black.'),
+    CommandSpec(6, 'FadeFromBlack', 'Fade from Black', 'Causes the screen to fade in from black.'),
+    CommandSpec(7, 'FadeToWhite', 'Fade to White', 'Causes the screen to fade to white.'),
+    CommandSpec(8, 'FadeFromWhite', 'Fade from White', 'Causes the screen to fade in from white.'),
+    CommandSpec(9, 'ShowText', 'Show Text', 'Causes the current header and body text to fade in.'),
+    CommandSpec(10, 'HideText', 'Hide Text', 'Causes the current header and body text to fade out.'),
+    CommandSpec(11, 'SetHeaderText', 'Set Header Text', 'Changes the current header text.', (
+            FieldSpec('text', 'text', 'Text:'),
+        ),
+        'to "{text}"'),
+    CommandSpec(12, 'ShowHeaderText', 'Show Header Text', 'Causes the current header text to fade in.'),
+    CommandSpec(13, 'HideHeaderText', 'Hide Header Text', 'Causes the current header text to fade out.'),
+    CommandSpec(14, 'SetBodyText', 'Set Body Text', 'Changes the current body text.', (
+            FieldSpec('text', 'text', 'Text:'),
+        ),
+        'to "{text}"'),
+    CommandSpec(15, 'ShowBodyText', 'Show Body Text', 'Causes the current body text to fade in.'),
+    CommandSpec(16, 'HideBodyText', 'Hide Body Text', 'Causes the current body text to fade out.'),
+    CommandSpec(17, 'DisablePlayerControl', 'Disable Player Control', 'Prevents Mario from receiving button inputs.'),
+    CommandSpec(18, 'EnablePlayerControl', 'Enable Player Control', 'Allows Mario to receive button inputs again.'),
+    CommandSpec(19, 'EnableLowGravityPhysics', 'Enable Low-Gravity Physics', 'Causes Mario to experience low-gravity physics.'),
+    CommandSpec(20, 'DisableLowGravityPhysics', 'Disable Low-Gravity Physics', 'Switches Mario back to normal physics.'),
+    CommandSpec(21, 'UnlockInactiveCharacter', 'Unlock Inactive Character', 'Causes the inactive character to be able to move.'),
+    CommandSpec(22, 'SetPlayersFacingScreen', 'Set Players Facing Screen', 'Causes all of the players to face the screen.'),
+    CommandSpec(23, 'LoadAndPlacePeach', 'Load and Place Peach', 'Loads Peach and positions her at a given location.', (
+            FieldSpec(None, 'pad16', None),
+            FieldSpec('x', 'u32', 'X:'),
+            FieldSpec('y', 'u32', 'Y:'),
+        ),
+        'at position (0x{x:08X}, 0x{y:08X})'),
+    CommandSpec(24, 'PlayCharacterWinAnimations', 'Play Character Win Animations', 'Causes the characters to play their "win" animations.'),
+    CommandSpec(25, 'BeginFireworks', 'Begin Fireworks', 'Starts the fireworks firing.'),
+    CommandSpec(26, 'EndFireworks', 'End Fireworks', 'Stops the fireworks.'),
+    CommandSpec(27, 'ShowDarknessOverlay', 'Show Darkness Overlay', 'Causes the wipe behind "The End" to occur.'),
+    CommandSpec(28, 'ShowTheEnd', 'Show "The End"', 'Causes "The End" to be displayed on-screen.'),
+    CommandSpec(29, 'HideTheEnd', 'Hide "The End"', 'Causes "The End" to be hidden.'),
+    CommandSpec(30, 'ShowCoinCounter', 'Show Coin Counter', 'Displays the coin counter.'),
+    CommandSpec(31, 'HideCoinCounter', 'Hide Coin Counter', 'Hides the coin counter.'),
+    CommandSpec(32, 'LoadFile', 'Load File', 'Causes a file to be loaded.', (
+            FieldSpec('fileId', 'u16', 'File ID:'),
+            FieldSpec('slot', 'slot', 'Slot:'),
+        ),
+        'to the "{slot}" slot'),
+    CommandSpec(33, 'UnloadFile', 'Unload File', 'Causes a file to be unloaded.', (
+            FieldSpec('slot', 'slot', 'Slot:'),
+        ),
+        'from the "{slot}" slot'),
+    CommandSpec(34, 'ExitStage', 'Exit Stage', 'Causes the stage to be exited.'),
+    ]
+
+
+def _compileFunction(source, **namespace):
+    """
+    Compile the source of one function, with namespace as its globals,
+    and return it. Generating the code for each command type means
+    each field is read and written by name, with no loops or
+    unpacking at run time.
+    """
+    exec(source, namespace)
+    return namespace[source[4 : source.index('(')]]
+
+
+def _compileInit(fields):
+    """
+    Return an __init__ method taking each field as an argument, with
+    its kind's default value
+    """
+    params = ''.join(f', {f.name}={FIELD_KINDS[f.kind].default!r}' for f in fields)
+    body = ''.join(f'\n    self.{f.name} = {f.name}' for f in fields)
+    return _compileFunction(f'def __init__(self{params}):{body}')
+
+
+def _compileSummary(summary, fields):
+    """
+    Return a function returning a command's dynamicDescription, from a
+    CommandSpec's summary
+    """
+    if summary is None or callable(summary): return summary
+
+    format = summary.format
+    getters = []
+    for f in fields:
+        get, display = operator.attrgetter(f.name), FIELD_KINDS[f.kind].display
+        if display is not None:
+            get = lambda com, get=get, display=display: display(get(com))
+        getters.append((f.name, get))
+    return lambda com: format(**{name: get(com) for name, get in getters})
+
+
+def _compileCommandType(spec):
+    """
+    Create the Command subclass for a CommandSpec
+    """
+    fields = tuple(f for f in spec.fields if f.name is not None)
+    names = tuple(f.name for f in fields)
+    attrs = {
+        '__slots__': names,
+        '__doc__': spec.description,
+        '__module__': __name__,
+        'name': spec.name,
+        'description': spec.description,
+        'fieldSpecs': fields,
+        }
+
+    if not fields:
+        base = ParameterlessCommand
+    elif any(f.kind == 'text' for f in fields):
+        if len(fields) > 1:
+            raise ValueError(f'{spec.typeName}: text has to be the only field')
+        base = TextCommand
+    else:
+        base = Command
+        dataStruct = struct.Struct('<' + ''.join(FIELD_KINDS[f.kind].code for f in spec.fields))
+        attrs['dataStruct'] = dataStruct
+        values = ', '.join(f'self.{name}' for name in names)
+        attrs['asData'] = _compileFunction(f'def asData(self):\n    return pack({values})', pack=dataStruct.pack)
+
+    if fields:
+        attrs['__init__'] = _compileInit(fields)
+    summary = _compileSummary(spec.summary, fields)
+    if summary is not None:
+        attrs['dynamicDescription'] = property(summary)
+
+    className = spec.typeName + 'Command'
+    attrs['__qualname__'] = className
+    return type(className, (base,), attrs)
+
+
+# Command types by ID, created from COMMAND_SCHEMA. Each one is also
+# a global, named typeName + "Command" (DelayCommand...).
+CommandsById = {spec.id: _compileCommandType(spec) for spec in COMMAND_SCHEMA}
+globals().update((comType.__name__, comType) for comType in CommandsById.values())
+
+
+# The most data an unknown command can have: like text, its record
+# can be at most 252 bytes, and 2 of those are the length and ID bytes
+MAX_UNKNOWN_DATA_LENGTH = 250
+
+
+class UnknownCommand(Command):
+    """
+    A record with a command ID that this editor doesn't know. It's kept
+    as raw bytes, and saved unchanged (apart from padding). data is
+    everything in the record after the ID (including any padding). It
+    can also be set to a str, which is converted to bytes as latin-1,
+    the way scripts and JSON give it.
+
+    The ID can't be 0, which ends the sequence, or the ID of a known
+    command type, since the record would be loaded back as that type.
+    """
+    __slots__ = ('commandId', '_data')
+    name = 'Unknown Command'
+    description = 'A command that this editor doesn\'t recognize. It\'s saved unchanged.'
+    fieldSpecs = (FieldSpec('commandId', 'commandId', 'Command ID:'), FieldSpec('data', 'blob', 'Data:'))
+
+    def __init__(self, commandId=None, data=b''):
+        if commandId is None:
+            raise ValueError('An unknown command needs a command ID')
+        if commandId == 0:
+            raise ValueError('Command ID 0 ends the sequence, so it can\'t be used by an unknown command')
+        if commandId in CommandsById:
+            raise ValueError(f'Command ID {commandId} is {CommandsById[commandId].name}, so it can\'t be used by an unknown command')
+        self.commandId = commandId
+        self.data = data
+
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value.encode('latin-1') if type(value) is str else bytes(value)
+
+    def asData(self):
+        return self._data
+
+    @property
+    def dynamicDescription(self):
+        return f'ID {self.commandId}, {len(self._data)} bytes'
+
+
+def _compileDecoder(comType):
+    """
+    Return a function that decodes a command of the given type from
+    (buffer, offset)
+    """
+    if issubclass(comType, ParameterlessCommand):
+        # These are all the same object, so there's nothing to decode
+        instance = comType()
+        return lambda buffer, offset: instance
+    return comType.fromBuffer
+
+
+# Decoder functions, indexed by command ID
+CommandDecoders = {id: _compileDecoder(comType) for id, comType in CommandsById.items()}
+
+
+class SequenceParseError(ValueError):
+    """
+    Error in the binary form of a sequence, in the record at a
+    particular byte offset
+    """
+    def __init__(self, message, offset):
+        super().__init__(f'offset 0x{offset:X}: {message}')
+        self.message = message
+        self.offset = offset
+
+
+def _recordMinimum(comType):
+    """
+    Return the smallest record length a command type can be decoded
+    from
+    """
+    if comType.dataStruct is not None:
+        return comType.dataStruct.size + 2
+    return 3 if issubclass(comType, TextCommand) else 2
+
+
+def _recordProblem(buf, i, length, end):
+    """
+    Return a message saying why the record at buf[i] (length bytes
+    long, in a buffer whose data ends at end) can't be decoded, or
+    None if it can. Records with unknown command IDs can always be
+    decoded, as UnknownCommands.
+    """
+    if length < 2:
+        return f'record length is {length}, but records are at least 2 bytes long'
+    if i + length > end:
+        return f'the data ends partway through this record ({end - i} of {length} bytes)'
+    comType = CommandsById.get(buf[i + 1])
+    if comType is None:
+        return None
+    minimum = _recordMinimum(comType)
+    if length < minimum:
+        return f'{comType.name} records are at least {minimum} bytes long, but this one is {length}'
+    if issubclass(comType, TextCommand) and 3 + buf[i + 2] > length:
+        return f'the text ({buf[i + 2]} bytes) doesn\'t fit in the record ({length} bytes)'
+    return None
+
+
+def _decodeRecord(buf, i, length):
+    """
+    Decode the record at buf[i], which _recordProblem() has accepted
+    """
+    decode = _RECORD_DECODERS[buf[i + 1]]
+    if decode is None:
+        return UnknownCommand(buf[i + 1], bytes(buf[i + 2 : i + length]))
+    return decode(buf, i + 2)
+
+
+# Decoder functions indexed by command ID, for all 256 IDs (None for
+# unknown ones), and the record length each one can safely be used
+# on without any other checks. Text commands and unknown IDs need
+# more checks than that, so their lengths are impossibly large.
+_RECORD_DECODERS = [CommandDecoders.get(id) for id in range(0x100)]
+_FAST_RECORD_MINIMUMS = [0x100] * 0x100
+for id, comType in CommandsById.items():
+    if not issubclass(comType, TextCommand):
+        _FAST_RECORD_MINIMUMS[id] = _recordMinimum(comType)
+del id, comType
+_TEXT_COMMAND_IDS = frozenset(id for id, comType in CommandsById.items() if issubclass(comType, TextCommand))
+
+
+def CommandFromData(data):
+    """
+    Return a command from data
+    """
+    return CommandDecoders[data[0]](data, 1)
+
+
+# Command IDs, indexed by command type
+CommandIds = {comType: id for id, comType in CommandsById.items()}
+
+
+def _compileEncoder(id, comType):
+    """
+    Return a function that appends the complete record (length, ID,
+    parameters and padding) for a command of the given type to a
+    bytearray
+    """
+    if issubclass(comType, ParameterlessCommand):
+        record = bytes([4, id, 0, 0])
+        def encode(com, out):
+            out += record
+
+    elif comType.dataStruct is not None:
+        # Fixed size, so the whole record (header, parameters and
+        # padding) can be packed by one struct
+        size = comType.dataStruct.size + 2
+        padding = -size % 4
+        pack = struct.Struct('<BB' + comType.dataStruct.format[1:] + 'x' * padding).pack
+        values = ''.join(f', com.{f.name}' for f in comType.fieldSpecs)
+        encode = _compileFunction(f'def encode(com, out):\n    out += pack({size + padding}, {id}{values})', pack=pack)
+
+    elif issubclass(comType, TextCommand):
+        # Same as below, with asData() inlined
+        paddings = [bytes(n) for n in range(4)]
+        def encode(com, out):
+            s = com.text.encode('latin-1')
+            size = len(s) + 3
+            padding = -size % 4
+            if size + padding > 0xFF:
+                com.asData() # raises the right error if the text itself is too long
+                raise ValueError(f'Command is too long to be saved ({len(s) + 1} bytes of data): {com}')
+            out += bytes((size + padding, id, len(s)))
+            out += s
+            out += paddings[padding]
+
+    else:
+        def encode(com, out):
+            data = com.asData()
+            size = len(data) + 2
+            padding = -size % 4
+            if size + padding > 0xFF:
+                raise ValueError(f'Command is too long to be saved ({len(data)} bytes of data): {com}')
+            out += bytes([size + padding, id])
+            out += data
+            out += bytes(padding)
+
+    return encode
+
+
+def _encodeUnknown(com, out):
+    data = com.data
+    size = len(data) + 2
+    padding = -size % 4
+    if size + padding > 0xFF:
+        raise ValueError(f'Command is too long to be saved ({len(data)} bytes of data): {com}')
+    out += bytes((size + padding, com.commandId))
+    out += data
+    out += bytes(padding)
+
+
+# Encoder functions, indexed by command type
+CommandEncoders = {comType: _compileEncoder(id, comType) for id, comType in CommandsById.items()}
+CommandEncoders[UnknownCommand] = _encodeUnknown
+
+
+class SequenceListener():
+    """
+    Base class for objects that want to be told about changes made to
+    a CreditsSequenceBin through its editing methods. Subclasses
+    override whichever methods they need. "AboutTo" methods are called
+    before the change is made, and the others after it.
+    """
+    def commandsAboutToBeInserted(self, index, count): pass
+    def commandsInserted(self, index, commands): pass
+    def commandsAboutToBeRemoved(self, index, count): pass
+    def commandsRemoved(self, index, commands): pass
+    def commandsAboutToBeMoved(self, index, count, destination): pass
+    def commandsMoved(self, index, count, destination): pass
+    def commandsAboutToBeReset(self): pass
+    def commandsReset(self): pass
+    def commandAboutToChange(self, index, field, value): pass
+    def commandChanged(self, index, field, oldValue, newValue): pass
+
+    # setFieldValues() calls these once for all of the commands it
+    # changes. By default they just call the methods above for each one;
+    # listeners can override them to handle many changes more cheaply.
+    def commandsAboutToChange(self, indices, field, values):
+        for index, value in zip(indices, values):
+            self.commandAboutToChange(index, field, value)
+    def commandsChanged(self, indices, field, oldValues, newValues):
+        for index, oldValue, newValue in zip(indices, oldValues, newValues):
+            self.commandChanged(index, field, oldValue, newValue)
+
+
+def commandRuns(indices):
+    """
+    Group command indices into runs of consecutive ones. Returns a
+    sorted list of (start, count).
+    """
+    runs = []
+    for i in sorted(set(indices)):
+        if runs and runs[-1][0] + runs[-1][1] == i:
+            runs[-1][1] += 1
+        else:
+            runs.append([i, 1])
+    return [tuple(run) for run in runs]
+
+
+# How often (in bytes) CreditsSequenceBin reports its loading progress
+PROGRESS_INTERVAL = 0x8000
+
+
+class CreditsSequenceBin():
+    """
+    Class which represents "2848 Credits_Sequence.bin"
+
+    self.Commands can be read and modified directly, but changes made
+    through the editing methods (insertCommands(), setField()...) are
+    also reported to any SequenceListeners that have been added.
+    """
+    def __init__(self, data=None, progress=None, recover=False):
+        self.Commands = []
+        self.parseErrors = []
+        self._listeners = []
+        if data is not None: self._initFromData(data, progress, recover)
+
+    def addListener(self, listener):
+        """
+        Start reporting changes to a SequenceListener
+        """
+        self._listeners.append(listener)
+
+    def removeListener(self, listener):
+        """
+        Stop reporting changes to a SequenceListener
+        """
+        self._listeners.remove(listener)
+
+    def insertCommands(self, index, commands):
+        """
+        Insert a list of commands before the given index
+        """
+        commands = list(commands)
+        if not commands: return
+        for l in self._listeners: l.commandsAboutToBeInserted(index, len(commands))
+        self.Commands[index:index] = commands
+        for l in self._listeners: l.commandsInserted(index, commands)
+
+    def removeCommands(self, index, count=1):
+        """
+        Remove count commands starting at the given index, and return
+        them
+        """
+        if count <= 0: return []
+        for l in self._listeners: l.commandsAboutToBeRemoved(index, count)
+        removed = self.Commands[index : index + count]
+        del self.Commands[index : index + count]
+        for l in self._listeners: l.commandsRemoved(index, removed)
+        return removed
+
+    def moveCommands(self, index, count, destination):
+        """
+        Move count commands starting at index so that they end up
+        before the command that's currently at destination (which may
+        be len(self.Commands)). Returns False if that wouldn't move
+        anything.
+        """
+        if count <= 0 or index <= destination <= index + count:
+            return False
+
+        for l in self._listeners: l.commandsAboutToBeMoved(index, count, destination)
+
+        # Rotate just the part of the list that's affected
+        C = self.Commands
+        if destination < index:
+            C[destination : index + count] = C[index : index + count] + C[destination : index]
+        else:
+            C[index : destination] = C[index + count : destination] + C[index : index + count]
+
+        for l in self._listeners: l.commandsMoved(index, count, destination)
+        return True
+
+    def moveCommandsTo(self, indices, destination):
+        """
+        Move the commands at the given indices so that they end up
+        together, in order, before the command that's currently at
+        destination (which may be len(self.Commands)). Each run of
+        consecutive indices is moved with one call to moveCommands(), so
+        only the part of the sequence between the commands and the
+        destination is touched. Returns the index of the first of the
+        commands afterward.
+        """
+        runs = commandRuns(indices)
+        for start, count in runs:
+            if start < destination < start + count:
+                destination = start # dropped onto itself
+                break
+
+        # Runs before the destination are moved down to it, closest
+        # first, and runs after it are moved up to it, closest first
+        target = destination
+        for start, count in reversed([r for r in runs if r[0] < destination]):
+            self.moveCommands(start, count, target)
+            target -= count
+        first = target
+
+        target = destination
+        for start, count in (r for r in runs if r[0] >= destination):
+            self.moveCommands(start, count, target)
+            target += count
+        return first
+
+    def setCommands(self, commands):
+        """
+        Replace all of the commands
+        """
+        for l in self._listeners: l.commandsAboutToBeReset()
+        self.Commands = list(commands)
+        for l in self._listeners: l.commandsReset()
+
+    def setField(self, index, field, value):
+        """
+        Change one field of the command at the given index. Returns
+        False if it already had that value.
+        """
+        com = self.Commands[index]
+        oldValue = getattr(com, field)
+        if oldValue == value and type(oldValue) is type(value): return False
+        for l in self._listeners: l.commandAboutToChange(index, field, value)
+        setattr(com, field, value)
+        for l in self._listeners: l.commandChanged(index, field, oldValue, value)
+        return True
+
+    def setFieldValues(self, field, indices, values):
+        """
+        Change one field of many commands at once: the command at each
+        index in indices gets the corresponding value. Listeners are
+        told about all of the changes together. Returns the list of
+        indices of the commands that didn't already have those values.
+        """
+        commands = self.Commands
+        changed, oldValues, newValues = [], [], []
+        for index, value in zip(indices, values):
+            oldValue = getattr(commands[index], field)
+            if oldValue == value and type(oldValue) is type(value): continue
+            changed.append(index)
+            oldValues.append(oldValue)
+            newValues.append(value)
+        if not changed: return changed
+
+        for l in self._listeners: l.commandsAboutToChange(changed, field, newValues)
+        for index, value in zip(changed, newValues):
+            setattr(commands[index], field, value)
+        for l in self._listeners: l.commandsChanged(changed, field, oldValues, newValues)
+        return changed
+
+    @traced
+    def _initFromData(self, data, progress=None, recover=False):
+        """
+        Initialise the CreditsSequenceBin from raw file data. If
+        progress is given, it's called as progress(bytesRead, total)
+        after every PROGRESS_INTERVAL bytes or so. It can raise an
+        exception to stop loading.
+
+        Records with unknown command IDs are kept as UnknownCommands.
+        Damaged data raises a SequenceParseError for the first problem,
+        unless recover is True. Then every problem is added to
+        self.parseErrors, and as much as possible is loaded: a record
+        that's too short for its command type, or cut off by the end of
+        the data, is left out, and loading continues at the next
+        multiple of 4 bytes (where records normally start) after a
+        record with an impossible length.
+
+        Every step moves forward by at least 2 bytes, so this always
+        finishes in time linear in the size of the data.
+        """
+
+        # No headers. Iterate over the data until we've reached the EOF
+        # command. Each record is a length byte (which counts itself),
+        # a command ID byte, and then the parameters. Everything is
+        # read in place from one memoryview, with no slicing.
+        commands = []
+        append = commands.append
+        decoders, minimums, textIds = _RECORD_DECODERS, _FAST_RECORD_MINIMUMS, _TEXT_COMMAND_IDS
+        self.parseErrors = []
+        with memoryview(data) as buf:
+            i = 0
+            end = len(buf)
+            limit = sys.maxsize if progress is None else PROGRESS_INTERVAL
+            while True:
+                try:
+                    length = buf[i]
+                    id = buf[i + 1]
+                except IndexError:
+                    error = SequenceParseError('the data ends without the terminating record', i)
+                    if not recover: raise error from None
+                    self.parseErrors.append(error)
+                    break
+                if id == 0: break
+
+                # Make a command. Undamaged records only need a quick
+                # check; everything else is checked in detail.
+                if minimums[id] <= length and i + length <= end:
+                    append(decoders[id](buf, i + 2))
+                    i += length
+                elif id in textIds and 3 <= length and i + length <= end and buf[i + 2] + 3 <= length:
+                    append(decoders[id](buf, i + 2))
+                    i += length
+                else:
+                    problem = _recordProblem(buf, i, length, end)
+                    if problem is None:
+                        append(_decodeRecord(buf, i, length))
+                        i += length
+                    else:
+                        error = SequenceParseError(problem, i)
+                        if not recover: raise error
+                        self.parseErrors.append(error)
+                        if length < 2:
+                            i = (i // 4 + 1) * 4
+                        elif i + length > end:
+                            break
+                        else:
+                            i += length
+
+                if i >= limit:
+                    progress(min(i, end), end)
+                    limit = i + PROGRESS_INTERVAL
+
+        # Assign to self.commands
+        self.Commands = commands
+        traceCounter('commandsLoaded', len(commands))
+
+
+    @traced
+    def save(self):
+        """
+        Convert self.Commands to bytes that can be saved
+        """
+        f = io.BytesIO()
+        self.saveTo(f)
+        return f.getvalue()
+
+
+    def saveTo(self, file, chunkSize=0x10000, offsets=None):
+        """
+        Write self.Commands to a binary file object, in chunks of
+        about chunkSize bytes. If offsets is a list (or array), the
+        offset of each command's record is appended to it.
+        """
+        encoders = CommandEncoders
+        out = bytearray()
+        written = 0
+
+        for com in self.Commands:
+            if offsets is not None:
+                offsets.append(written + len(out))
+
+            try:
+                encoders[type(com)](com, out)
+            except KeyError:
+                raise ValueError(f'Could not find ID of command: {com}') from None
+
+            if len(out) >= chunkSize:
+                file.write(out)
+                written += len(out)
+                out.clear()
+
+        out += b'\x02\x00' # null command
+        file.write(out)
+
+
+
+################################################################
+################################################################
+################################################################
+########################### Timeline ###########################
+
+
+# The game runs at 60 frames per second
+FRAMES_PER_SECOND = 60
+
+
+def formatFrames(frames):
+    """
+    Format a number of frames as "m:ss.ff", where ff is the frame
+    within the second
+    """
+    seconds, f = divmod(frames, FRAMES_PER_SECOND)
+    minutes, seconds = divmod(seconds, 60)
+    return f'{minutes}:{seconds:02d}.{f:02d}'
+
+
+def parseFrames(text):
+    """
+    Parse a time written either as a number of frames ("5400") or as
+    "m:ss" or "m:ss.ff" (see formatFrames()). Raises ValueError if
+    it's neither.
+    """
+    text = text.strip()
+    m = re.fullmatch(r'(?:(\d+):)?(\d+)(?:\.(\d+))?', text)
+    if m is None or (m.group(1) is None and m.group(3) is not None):
+        raise ValueError(f'Invalid time: "{text}"')
+    if m.group(1) is None:
+        return int(m.group(2))
+
+    minutes, seconds, frames = int(m.group(1)), int(m.group(2)), int(m.group(3) or 0)
+    if seconds >= 60 or frames >= FRAMES_PER_SECOND:
+        raise ValueError(f'Invalid time: "{text}"')
+    return (minutes * 60 + seconds) * FRAMES_PER_SECOND + frames
+
+
+class FenwickTree():
+    """
+    Fenwick tree (binary indexed tree) over a list of non-negative
+    integers, supporting O(log n) point updates, prefix sums and
+    searches by prefix sum
+    """
+    def __init__(self, values=()):
+        # 1-based internally. Built in linear time: each node is the
+        # difference of two prefix sums.
+        prefix = [0]
+        prefix.extend(itertools.accumulate(values))
+        self.tree = [0] + [prefix[i] - prefix[i & (i - 1)] for i in range(1, len(prefix))]
+
+    def __len__(self):
+        return len(self.tree) - 1
+
+    def add(self, index, delta):
+        """
+        Add delta to the value at index
+        """
+        tree = self.tree
+        i = index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def prefixSum(self, count):
+        """
+        Return the sum of the first count values
+        """
+        tree = self.tree
+        total = 0
+        i = count
+        while i > 0:
+            total += tree[i]
+            i &= i - 1
+        return total
+
+    def search(self, target):
+        """
+        Return the smallest index such that the sum of the values up
+        to and including it is greater than target, or len(self) if
+        there isn't one
+        """
+        tree = self.tree
+        pos = 0
+        step = 1 << (len(tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(tree) and tree[nxt] <= target:
+                pos = nxt
+                target -= tree[nxt]
+            step >>= 1
+        return pos
+
+
+class Timeline(SequenceListener):
+    """
+    Index of when each command in a CreditsSequenceBin runs, in frames
+    from the start of the sequence. Only Delay commands take any time.
+
+    This keeps itself up to date as the sequence is edited through its
+    editing methods. Changing a delay costs O(log n). Inserting or
+    removing commands shifts every later position, so the tree is
+    rebuilt (in linear time) the next time it's queried. Small moves
+    are applied as point updates.
+    """
+    def __init__(self, file):
+        self.file = file
+        file.addListener(self)
+        self.commandsReset()
+
+    def detach(self):
+        """
+        Stop following changes to the file
+        """
+        self.file.removeListener(self)
+
+    @staticmethod
+    def _delaysOf(commands):
+        return [com.time if type(com) is DelayCommand else 0 for com in commands]
+
+    def _ensureTree(self):
+        if self._tree is None:
+            self._tree = FenwickTree(self._delays)
+        return self._tree
+
+    def startFrame(self, index):
+        """
+        Return the frame on which the command at index runs
+        """
+        return self._ensureTree().prefixSum(index)
+
+    def totalFrames(self):
+        """
+        Return the length of the whole sequence, in frames
+        """
+        return self._total
+
+    def commandAtFrame(self, frame):
+        """
+        Return the index of the Delay command that's waiting during
+        the given frame. The commands before it (back to the previous
+        delay) are the ones that took effect most recently. Returns
+        len(file.Commands) if the sequence is over by then.
+        """
+        return self._ensureTree().search(frame)
+
+    def commandsInserted(self, index, commands):
+        delays = self._delaysOf(commands)
+        self._delays[index:index] = delays
+        self._total += sum(delays)
+        self._tree = None
+
+    def commandsRemoved(self, index, commands):
+        self._total -= sum(self._delays[index : index + len(commands)])
+        del self._delays[index : index + len(commands)]
+        self._tree = None
+
+    def commandsMoved(self, index, count, destination):
+        d = self._delays
+        if destination < index:
+            start, end = destination, index + count
+            d[start:end] = d[index : index + count] + d[destination : index]
+        else:
+            start, end = index, destination
+            d[start:end] = d[index + count : destination] + d[index : index + count]
+
+        if self._tree is None: return
+
+        if (end - start) * max(1, len(d).bit_length()) > len(d):
+            self._tree = None # cheaper to rebuild
+            return
+
+        # Recompute the affected values and apply the differences
+        tree = self._tree
+        for i in range(start, end):
+            delta = d[i] - (tree.prefixSum(i + 1) - tree.prefixSum(i))
+            if delta:
+                tree.add(i, delta)
+
+    def commandsReset(self):
+        self._delays = self._delaysOf(self.file.Commands)
+        self._total = sum(self._delays)
+        self._tree = None
+
+    def commandChanged(self, index, field, oldValue, newValue):
+        if field == 'time' and type(self.file.Commands[index]) is DelayCommand:
+            self._delays[index] = newValue
+            self._total += newValue - oldValue
+            if self._tree is not None:
+                self._tree.add(index, newValue - oldValue)
+
+
+# What's on screen, as far as the credits text is concerned. fade is
+# None, 'black' or 'white'.
+TextState = collections.namedtuple('TextState', 'header body headerShown bodyShown fade')
+INITIAL_TEXT_STATE = TextState('', '', False, False, None)
+
+
+# For each command type that affects the TextState, a function
+# returning the (field, value) pairs it sets
+_TEXT_STATE_EFFECTS = {
+    SetHeaderTextCommand: lambda com: [('header', com.text)],
+    SetBodyTextCommand: lambda com: [('body', com.text)],
+    ShowTextCommand: lambda com: [('headerShown', True), ('bodyShown', True)],
+    HideTextCommand: lambda com: [('headerShown', False), ('bodyShown', False)],
+    ShowHeaderTextCommand: lambda com: [('headerShown', True)],
+    HideHeaderTextCommand: lambda com: [('headerShown', False)],
+    ShowBodyTextCommand: lambda com: [('bodyShown', True)],
+    HideBodyTextCommand: lambda com: [('bodyShown', False)],
+    FadeToBlackCommand: lambda com: [('fade', 'black')],
+    FadeFromBlackCommand: lambda com: [('fade', None)],
+    FadeToWhiteCommand: lambda com: [('fade', 'white')],
+    FadeFromWhiteCommand: lambda com: [('fade', None)],
+    }
+
+
+def textStateAt(commands, index):
+    """
+    Return the TextState just before commands[index] runs. To get the
+    state at a frame, use Timeline.commandAtFrame() for the index.
+
+    This searches backward from index, stopping as soon as every field
+    has been found, so it usually only looks at the current page.
+    """
+    found = {}
+    effects = _TEXT_STATE_EFFECTS
+    for i in range(min(index, len(commands)) - 1, -1, -1):
+        com = commands[i]
+        if type(com) not in effects: continue
+        for field, value in effects[type(com)](com):
+            found.setdefault(field, value)
+        if len(found) == len(TextState._fields): break
+
+    return INITIAL_TEXT_STATE._replace(**found)
+
+
+def iterTextPages(commands):
+    """
+    Yield (index, TextState) for each page of text in a sequence: each
+    Delay during which some text is visible, if what's visible is
+    different from the last page. This is a single forward pass.
+    """
+    effects = _TEXT_STATE_EFFECTS
+    state = INITIAL_TEXT_STATE
+    last = None
+    for i, com in enumerate(commands):
+        comType = type(com)
+        if comType in effects:
+            state = state._replace(**dict(effects[comType](com)))
+        elif comType is DelayCommand:
+            visible = state.fade is None and (
+                (state.headerShown and state.header) or (state.bodyShown and state.body))
+            if not visible:
+                last = None
+            elif state != last:
+                yield i, state
+                last = state
+
+
+################################################################
+################################################################
+################################################################
+############################# Undo #############################
+
+
+def _undoSizeOf(value):
+    """
+    Estimate how many bytes an undo delta's value keeps alive
+    """
+    if type(value) is not tuple:
+        return sys.getsizeof(value)
+
+    size = sys.getsizeof(value)
+    for com in value:
+        if isinstance(com, ParameterlessCommand): continue # shared
+        size += sys.getsizeof(com)
+        if isinstance(com, TextCommand):
+            size += sys.getsizeof(com.text)
+    return size
+
+
+class UndoStack(SequenceListener):
+    """
+    Undo/redo history for a CreditsSequenceBin, recorded from the
+    changes it reports. Each step is a short list of deltas rather
+    than a copy of the sequence:
+
+        ('insert', index, commands)
+        ('remove', index, commands)
+        ('move', index, count, destination)
+        ('field', index, field, oldValue, newValue)
+        ('fields', field, indices, oldValues, newValues)
+
+    The last one is from setFieldValues(). Edits to the same field of
+    the same command less than mergeInterval seconds apart (typing,
+    spinning a spinbox) are merged into one step. Once the history
+    takes up more than about memoryLimit bytes, the oldest steps are
+    forgotten. Replacing all of the commands with setCommands() clears
+    it.
+
+    If changedCallback is set, it's called whenever canUndo() or
+    canRedo() may have changed.
+    """
+    def __init__(self, file, memoryLimit=1 << 20, mergeInterval=1.0):
+        self.file = file
+        self.memoryLimit = memoryLimit
+        self.mergeInterval = mergeInterval
+        self.changedCallback = None
+
+        # Steps are [estimated size, [deltas...]]
+        self._undo = collections.deque()
+        self._redo = []
+        self._size = 0
+        self._macro = None
+        self._macroDepth = 0
+        self._applying = False
+        self._mergeable = False
+        self._lastEditTime = 0
+
+        file.addListener(self)
+
+    def detach(self):
+        """
+        Stop following changes to the file
+        """
+        self.file.removeListener(self)
+
+    def canUndo(self):
+        return bool(self._undo)
+
+    def canRedo(self):
+        return bool(self._redo)
+
+    def memoryUsage(self):
+        """
+        Return the estimated size of the history, in bytes
+        """
+        return self._size
+
+    def clear(self):
+        """
+        Forget all undo and redo steps
+        """
+        self._undo.clear()
+        self._redo.clear()
+        self._size = 0
+        self._mergeable = False
+        self._changed()
+
+    def beginMacro(self):
+        """
+        Group every change until the matching endMacro() into a single
+        step. Macros can be nested.
+        """
+        self._macroDepth += 1
+        if self._macroDepth == 1:
+            self._macro = []
+
+    def endMacro(self):
+        """
+        End a group of changes started with beginMacro()
+        """
+        self._macroDepth -= 1
+        if self._macroDepth == 0:
+            deltas, self._macro = self._macro, None
+            if deltas: self._push(deltas)
+            self._mergeable = False
+
+    def undo(self):
+        """
+        Undo the most recent step. Returns the index of the command
+        it affected last (or None if there was nothing to undo).
+        """
+        if not self._undo: return None
+        step = self._undo.pop()
+        index = self._run(self._revert, reversed(step[1]))
+        self._redo.append(step)
+        self._mergeable = False
+        self._changed()
+        return index
+
+    def redo(self):
+        """
+        Redo the most recently undone step. Returns the index of the
+        command it affected last (or None if there was nothing to
+        redo).
+        """
+        if not self._redo: return None
+        step = self._redo.pop()
+        index = self._run(self._apply, step[1])
+        self._undo.append(step)
+        self._mergeable = False
+        self._changed()
+        return index
+
+    def _run(self, function, deltas):
+        # Changes made while undoing and redoing aren't recorded
+        self._applying = True
+        try:
+            for delta in deltas:
+                index = function(delta)
+        finally:
+            self._applying = False
+        return index
+
+    def _apply(self, delta):
+        f = self.file
+        kind = delta[0]
+        if kind == 'insert':
+            f.insertCommands(delta[1], delta[2])
+        elif kind == 'remove':
+            f.removeCommands(delta[1], len(delta[2]))
+        elif kind == 'move':
+            _, index, count, destination = delta
+            f.moveCommands(index, count, destination)
+            return destination if destination < index else destination - count
+        elif kind == 'fields':
+            f.setFieldValues(delta[1], delta[2], delta[4])
+            return delta[2][0]
+        else:
+            f.setField(delta[1], delta[2], delta[4])
+        return delta[1]
+
+    def _revert(self, delta):
+        f = self.file
+        kind = delta[0]
+        if kind == 'insert':
+            f.removeCommands(delta[1], len(delta[2]))
+        elif kind == 'remove':
+            f.insertCommands(delta[1], delta[2])
+        elif kind == 'move':
+            # Move the block back from wherever it ended up
+            _, index, count, destination = delta
+            if destination < index:
+                f.moveCommands(destination, count, index + count)
+            else:
+                f.moveCommands(destination - count, count, index)
+        elif kind == 'fields':
+            f.setFieldValues(delta[1], delta[2], delta[3])
+            return delta[2][0]
+        else:
+            f.setField(delta[1], delta[2], delta[3])
+        return delta[1]
+
+    def _record(self, delta):
+        if self._applying: return
+        if self._macro is not None:
+            self._macro.append(delta)
+            return
+
+        now = time.monotonic()
+        if (delta[0] == 'field' and self._mergeable and now - self._lastEditTime <= self.mergeInterval):
+            step = self._undo[-1]
+            last = step[1][-1]
+            if len(step[1]) == 1 and last[0] == 'field' and last[1:3] == delta[1:3]:
+                # Keep the original old value and the newest new value
+                step[1][0] = ('field', delta[1], delta[2], last[3], delta[4])
+                self._resize(step, self._stepSize(step[1]))
+                self._lastEditTime = now
+                return
+
+        self._push([delta])
+        self._mergeable = delta[0] == 'field'
+        self._lastEditTime = now
+
+    @staticmethod
+    def _stepSize(deltas):
+        return sys.getsizeof(deltas) + sum(sys.getsizeof(d) + _undoSizeOf(d[-1]) + (
+            _undoSizeOf(d[-2]) if d[0] in ('field', 'fields') else 0) + (
+            _undoSizeOf(d[2]) if d[0] == 'fields' else 0) for d in deltas)
+
+    def _resize(self, step, size):
+        self._size += size - step[0]
+        step[0] = size
+
+    def _push(self, deltas):
+        for step in self._redo:
+            self._size -= step[0]
+        self._redo.clear()
+
+        step = [0, deltas]
+        self._resize(step, self._stepSize(deltas))
+        self._undo.append(step)
+
+        # Stay within the memory limit, but always keep the newest step
+        while self._size > self.memoryLimit and len(self._undo) > 1:
+            self._size -= self._undo.popleft()[0]
+
+        self._changed()
+
+    def _changed(self):
+        if self.changedCallback is not None:
+            self.changedCallback()
+
+    def commandsInserted(self, index, commands):
+        self._record(('insert', index, tuple(commands)))
+
+    def commandsRemoved(self, index, commands):
+        self._record(('remove', index, tuple(commands)))
+
+    def commandsMoved(self, index, count, destination):
+        self._record(('move', index, count, destination))
+
+    def commandsReset(self):
+        if not self._applying: self.clear()
+
+    def commandChanged(self, index, field, oldValue, newValue):
+        self._record(('field', index, field, oldValue, newValue))
+
+    def commandsChanged(self, indices, field, oldValues, newValues):
+        self._record(('fields', field, tuple(indices), tuple(oldValues), tuple(newValues)))
+
+
+
+################################################################
+################################################################
+################################################################
+###################### Streaming and JSON ######################
+
+
+def _iterRecordPositions(source, chunkSize=0x10000):
+    """
+    Yield (buffer, offset, fileOffset) for each record in a sequence,
+    stopping at the null terminator. buffer[offset] is the record's
+    length byte, and fileOffset is its offset from the start of the
+    data.
+
+    source can be any object supporting the buffer protocol (bytes,
+    bytearray, memoryview, mmap...), which is read in place, or a
+    binary file object, which is read chunkSize bytes at a time.
+    """
+    if not hasattr(source, 'read'):
+        buf = memoryview(source)
+        end = len(buf)
+        i = 0
+        while True:
+            if i + 2 > end:
+                raise SequenceParseError('the data ends without the terminating record', i)
+            if not buf[i + 1]: return
+            if buf[i] < 2 or i + buf[i] > end:
+                raise SequenceParseError(_recordProblem(buf, i, buf[i], end), i)
+            yield buf, i, i
+            i += buf[i]
+
+    buf = memoryview(b'')
+    i = base = 0
+    while True:
+        # Make sure the entire record is in the current chunk. The
+        # terminator is only two bytes long, so check for it first.
+        if i + 2 > len(buf) or (buf[i + 1] and i + buf[i] > len(buf)):
+            more = source.read(chunkSize)
+            if not more:
+                if i + 2 > len(buf):
+                    raise SequenceParseError('the data ends without the terminating record', base + i)
+                raise SequenceParseError(_recordProblem(buf, i, buf[i], len(buf)), base + i)
+            buf = memoryview(bytes(buf[i:]) + more)
+            base += i
+            i = 0
+            continue
+
+        if not buf[i + 1]: return
+        if buf[i] < 2:
+            raise SequenceParseError(_recordProblem(buf, i, buf[i], len(buf)), base + i)
+        yield buf, i, base + i
+        i += buf[i]
+
+
+def iterRecords(source, chunkSize=0x10000):
+    """
+    Yield (offset, commandId, parameters) for each record in a
+    sequence, without decoding any commands. parameters is a
+    memoryview of the record's parameter bytes (including padding).
+
+    See _iterRecordPositions() for what source can be.
+    """
+    for buf, i, offset in _iterRecordPositions(source, chunkSize):
+        yield offset, buf[i + 1], buf[i + 2 : i + buf[i]]
+
+
+def iterCommands(source, chunkSize=0x10000):
+    """
+    Yield each command in a sequence, decoding them one at a time.
+
+    See _iterRecordPositions() for what source can be.
+    """
+    for buf, i, offset in _iterRecordPositions(source, chunkSize):
+        problem = _recordProblem(buf, i, buf[i], len(buf))
+        if problem is not None:
+            raise SequenceParseError(problem, offset)
+        yield _decodeRecord(buf, i, buf[i])
+
+
+def iterCommandsInFile(path):
+    """
+    Yield each command in a sequence file, reading it through mmap so
+    that it never has to be loaded into memory all at once
+    """
+    with open(path, 'rb') as f:
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files and unusual file systems can't be mapped
+            yield from iterCommands(f)
+            return
+
+        try:
+            yield from iterCommands(m)
+        finally:
+            try:
+                m.close()
+            except BufferError:
+                pass # something still holds a view into it
+
+
+
+def _commandFields(comType):
+    """
+    Return the names of a command type's fields, in order
+    """
+    return tuple(f.name for f in comType.fieldSpecs)
+
+
+# Names used for command types outside of the binary format
+# ("DelayCommand" -> "Delay"), and field names for each type
+CommandTypeNames = {comType: comType.__name__[:-len('Command')] for comType in [*CommandsById.values(), UnknownCommand]}
+CommandsByTypeName = {name: comType for comType, name in CommandTypeNames.items()}
+CommandFields = {comType: _commandFields(comType) for comType in CommandTypeNames}
+
+
+def _commandToDict(com):
+    """
+    Return a command as a dict of its type name and fields, which can
+    be converted to JSON
+    """
+    d = {'type': CommandTypeNames[type(com)]}
+    for field in CommandFields[type(com)]:
+        d[field] = getattr(com, field)
+    if type(com) is UnknownCommand:
+        d['data'] = com.data.decode('latin-1')
+    return d
+
+
+def _commandFromDict(d, i):
+    """
+    Create a command from a dict made by _commandToDict(). i is its
+    index, for error messages.
+    """
+    d = dict(d)
+    try:
+        comType = CommandsByTypeName[d.pop('type')]
+    except KeyError as e:
+        raise ValueError(f'Command {i} has an unknown or missing type: {e}') from None
+    try:
+        return comType(**d)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Command {i} ({CommandTypeNames[comType]}) has invalid fields: {e}') from None
+
+
+def sequenceToJson(file):
+    """
+    Convert a CreditsSequenceBin to a JSON string
+    """
+    commands = [_commandToDict(com) for com in file.Commands]
+    return json.dumps({'version': 1, 'commands': commands}, indent=1)
+
+
+def sequenceFromJson(text):
+    """
+    Create a CreditsSequenceBin from a JSON string made by
+    sequenceToJson()
+    """
+    file = CreditsSequenceBin()
+    file.Commands = [_commandFromDict(d, i) for i, d in enumerate(json.loads(text)['commands'])]
+    return file
+
+
+class SequenceSnapshot(SequenceListener):
+    """
+    The commands of a CreditsSequenceBin as they were when the snapshot
+    was taken, which can be saved on another thread while the file
+    keeps being edited. Taking one only copies the list of commands;
+    commands themselves are only copied just before they're changed.
+    Call detach() (on the editing thread) once it's no longer needed.
+    """
+    def __init__(self, file):
+        self.file = file
+        self.Commands = list(file.Commands)
+        self.lock = threading.Lock() # held while commands are encoded
+        self._positions = None # {id(command): [indices in self.Commands]}
+        file.addListener(self)
+
+    def detach(self):
+        """
+        Stop following changes to the file
+        """
+        self.file.removeListener(self)
+
+    def commandAboutToChange(self, index, field, value):
+        if self._positions is None:
+            self._positions = {}
+            for i, com in enumerate(self.Commands):
+                self._positions.setdefault(id(com), []).append(i)
+
+        com = self.file.Commands[index]
+        positions = self._positions.pop(id(com), None)
+        if positions is None: return # added since, or already copied
+
+        comType = type(com)
+        copy = comType(**{f: getattr(com, f) for f in CommandFields[comType]})
+        with self.lock:
+            for i in positions:
+                self.Commands[i] = copy
+
+    def saveTo(self, file, chunkSize=0x10000):
+        """
+        Write the commands to a binary file object, like
+        CreditsSequenceBin.saveTo(). This can run on any thread.
+        """
+        encoders = CommandEncoders
+        commands = self.Commands
+        out = bytearray()
+        i = 0
+        while True:
+            # Commands can't be copied while a chunk is being encoded,
+            # so that none of them change halfway through
+            with self.lock:
+                while i < len(commands) and len(out) < chunkSize:
+                    com = commands[i]
+                    try:
+                        encoders[type(com)](com, out)
+                    except KeyError:
+                        raise ValueError(f'Could not find ID of command: {com}') from None
+                    i += 1
+            if i == len(commands): break
+            file.write(out)
+            out.clear()
+
+        out += b'\x02\x00' # null command
+        file.write(out)
+
+
+def writeFileAtomically(path, write, binary=True):
+    """
+    Write a file so that it's either written completely or not at all,
+    even if the program crashes or the disk fills up partway through.
+    write(f) is called with a file object for a temporary file in the
+    same directory, which is then flushed to disk and renamed to path.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+
+    # os.open() applies the umask to new files, unlike tempfile
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666
+    while True:
+        tempPath = os.path.join(directory, f'.{name}.{os.urandom(4).hex()}.tmp')
+        try:
+            fd = os.open(tempPath, flags, mode)
+            break
+        except FileExistsError:
+            continue
+
+    try:
+        with open(fd, 'wb') if binary else open(fd, 'w', encoding='utf-8') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tempPath, path)
+    except BaseException:
+        try:
+            os.remove(tempPath)
+        except OSError:
+            pass
+        raise
+
+    # Make sure the rename itself is on disk too. Directories can't be
+    # opened like this on Windows, where it isn't needed.
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+
+################################################################
+################################################################
+################################################################
+############################ Journal ###########################
+
+
+# A journal is kept next to each open file (see journalPath()), and
+# records every edit as it's made, so that unsaved changes can be
+# recovered after a crash. It starts with JOURNAL_MAGIC, a version
+# byte, and the size and CRC-32 of the saved file it applies to. Then
+# there's one record per edit: an op byte, the length of the payload
+# (u32), the payload, and a CRC-32 of all of that (u32). Commands in
+# payloads are encoded the same way as in the file itself, except for
+# ones that can't be saved yet (text that's too long, or has
+# characters that aren't in latin-1...), which are a 0 byte (an
+# impossible record length), the length of the rest (u32), and the
+# command as JSON (see _commandToDict()).
+#
+#     JOURNAL_INSERT      index (u32), commands
+#     JOURNAL_REMOVE      index (u32), count (u32)
+#     JOURNAL_MOVE        index (u32), count (u32), destination (u32)
+#     JOURNAL_CHANGE      index (u32), the command after the change
+#     JOURNAL_CHECKPOINT  every command
+#     JOURNAL_FIELDS      count (u32), that many indices (u32), and the
+#                         commands at them after the change (one record
+#                         for everything setFieldValues() changes)
+#
+# A record that was only partly written when the editor crashed fails
+# its CRC check, and it and anything after it are ignored.
+
+
+JOURNAL_MAGIC = b'NDCJ'
+JOURNAL_VERSION = 1
+JOURNAL_INSERT, JOURNAL_REMOVE, JOURNAL_MOVE, JOURNAL_CHANGE, JOURNAL_CHECKPOINT, JOURNAL_FIELDS = range(1, 7)
+
+_journalHeader = struct.Struct('<4sBII')
+_journalRecordHeader = struct.Struct('<BI')
+_journalU32 = struct.Struct('<I')
+
+
+def journalPath(path):
+    """
+    Return the path of the journal for a sequence file
+    """
+    return path + '.journal'
+
+
+def journalBaseId(data):
+    """
+    Return the (size, CRC-32) identifying the saved data of a sequence,
+    which a journal has to match to be replayed on top of it
+    """
+    return len(data), zlib.crc32(data)
+
+
+def _encodeCommands(commands):
+    """
+    Encode commands as consecutive records, with no terminator.
+    Commands that can't be saved are encoded as JSON, so that this
+    never fails.
+    """
+    encoders = CommandEncoders
+    out = bytearray()
+    try:
+        for com in commands:
+            encoders[type(com)](com, out)
+        return out
+    except (ValueError, struct.error):
+        pass
+
+    # Something can't be saved, so go through them again more slowly.
+    # Encoders check everything before they append anything.
+    out.clear()
+    for com in commands:
+        try:
+            encoders[type(com)](com, out)
+        except (ValueError, struct.error):
+            d = json.dumps(_commandToDict(com)).encode('ascii')
+            out += b'\0'
+            out += _journalU32.pack(len(d))
+            out += d
+    return out
+
+
+def _decodeCommands(buf, start, end):
+    """
+    Decode the records in buf[start:end] (see _encodeCommands())
+    """
+    commands = []
+    i = start
+    while i < end:
+        if buf[i] == 0:
+            if i + 5 > end: raise ValueError(f'Journal command at {i} is cut off')
+            length = _journalU32.unpack_from(buf, i + 1)[0]
+            if i + 5 + length > end: raise ValueError(f'Journal command at {i} is cut off')
+            commands.append(_commandFromDict(json.loads(bytes(buf[i + 5 : i + 5 + length])), len(commands)))
+            i += 5 + length
+            continue
+        problem = _recordProblem(buf, i, buf[i], end)
+        if problem is not None:
+            raise SequenceParseError(problem, i)
+        commands.append(_decodeRecord(buf, i, buf[i]))
+        i += buf[i]
+    return commands
+
+
+def recoverJournal(path, baseId, baseCommands):
+    """
+    Replay a journal on top of the commands of the saved file it
+    applies to. baseId is journalBaseId() of that file's data. Returns
+    the list of commands, or None if there's no journal, it doesn't
+    apply to that file (it was changed since), or there's nothing in
+    it. baseCommands isn't modified. Raises
+    ValueError if the journal is damaged in a way that a crash
+    couldn't have caused.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+
+    if len(data) < _journalHeader.size:
+        return None
+    magic, version, size, crc = _journalHeader.unpack_from(data)
+    if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION:
+        raise ValueError(f'{path} isn\'t a journal that this version can read')
+    if (size, crc) != tuple(baseId):
+        return None
+
+    commands = list(baseCommands)
+    records = 0
+    u32 = _journalU32.unpack_from
+    pos = _journalHeader.size
+    with memoryview(data) as buf:
+        while pos + _journalRecordHeader.size <= len(buf):
+            op, length = _journalRecordHeader.unpack_from(buf, pos)
+            start = pos + _journalRecordHeader.size
+            end = start + length
+            if end + 4 > len(buf) or u32(buf, end)[0] != zlib.crc32(buf[pos:end]):
+                break # partly written
+
+            n = len(commands)
+            if op == JOURNAL_INSERT:
+                index = u32(buf, start)[0]
+                if index > n: raise ValueError(f'Journal inserts at {index}, past the end')
+                commands[index:index] = _decodeCommands(buf, start + 4, end)
+            elif op == JOURNAL_REMOVE:
+                index, count = struct.unpack_from('<II', buf, start)
+                if index + count > n: raise ValueError(f'Journal removes {index}-{index + count - 1}, past the end')
+                del commands[index : index + count]
+            elif op == JOURNAL_MOVE:
+                index, count, dest = struct.unpack_from('<III', buf, start)
+                if max(index + count, dest) > n: raise ValueError(f'Journal moves {index}-{index + count - 1}, past the end')
+                if dest < index:
+                    commands[dest : index + count] = commands[index : index + count] + commands[dest:index]
+                else:
+                    commands[index:dest] = commands[index + count : dest] + commands[index : index + count]
+            elif op == JOURNAL_CHANGE:
+                index = u32(buf, start)[0]
+                if index >= n: raise ValueError(f'Journal changes {index}, past the end')
+                commands[index], = _decodeCommands(buf, start + 4, end)
+            elif op == JOURNAL_CHECKPOINT:
+                commands = _decodeCommands(buf, start, end)
+            elif op == JOURNAL_FIELDS:
+                count = u32(buf, start)[0]
+                if start + 4 + 4 * count > end: raise ValueError(f'Journal changes {count} commands, but is too short')
+                indices = struct.unpack_from(f'<{count}I', buf, start + 4)
+                changed = _decodeCommands(buf, start + 4 + 4 * count, end)
+                if len(changed) != count: raise ValueError(f'Journal changes {count} commands, but has {len(changed)}')
+                if count and max(indices) >= n: raise ValueError(f'Journal changes {max(indices)}, past the end')
+                for index, com in zip(indices, changed):
+                    commands[index] = com
+            else:
+                raise ValueError(f'Unknown journal record type {op}')
+
+            records += 1
+            pos = end + 4
+
+    return commands if records else None
+
+
+class EditJournal(SequenceListener):
+    """
+    Appends every edit made to a CreditsSequenceBin to a journal file
+    (see the top of this section). Each record is flushed as soon as
+    it's written, so it survives the editor crashing, but it's only
+    fsynced when the journal is compacted.
+
+    baseId is journalBaseId() of the saved file. If the file's
+    commands already differ from that (after recovering a journal, for
+    example), pass checkpoint=True to start with a copy of them.
+
+    Once the records add up to more than compactSize bytes (and more
+    than the file itself), the journal is replaced with one holding a
+    single checkpoint.
+
+    Creating or restarting the journal raises OSError if it can't be
+    written. Once it's recording edits, it never raises: if writing a
+    record fails, the OSError is kept in self.error, nothing more is
+    recorded until it's restarted, and errorCallback (if set) is
+    called with the error.
+    """
+    def __init__(self, path, file, baseId, checkpoint=False, compactSize=1 << 20):
+        self.path = path
+        self.file = file
+        self.compactSize = compactSize
+        self.editCount = 0 # edits recorded since this was created
+        self.error = None
+        self.errorCallback = None
+        self._f = None
+        self.restart(baseId, checkpoint)
+        file.addListener(self)
+
+    def restart(self, baseId, checkpoint=False):
+        """
+        Start the journal again on top of a newly saved file. If
+        checkpoint, it starts with a copy of the current commands.
+        """
+        self.baseId = tuple(baseId)
+        self.error = None
+        try:
+            self._rewrite(checkpoint)
+        except OSError as e:
+            self.error = e
+            raise
+
+    def _rewrite(self, checkpoint):
+        if self._f is not None: self._f.close()
+
+        def write(f):
+            f.write(_journalHeader.pack(JOURNAL_MAGIC, JOURNAL_VERSION, *self.baseId))
+            if checkpoint:
+                f.write(self._record(JOURNAL_CHECKPOINT, _encodeCommands(self.file.Commands)))
+        writeFileAtomically(self.path, write)
+
+        self._f = open(self.path, 'ab')
+        self._recordBytes = 0
+        self._hasEdits = checkpoint
+
+    def close(self, keep=None):
+        """
+        Stop following changes to the file, and close the journal. It's
+        deleted unless it has edits that weren't saved, or keep is
+        given (True or False) to decide that instead.
+        """
+        self.file.removeListener(self)
+        self._f.close()
+        if not (self._hasEdits if keep is None else keep):
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _record(op, payload):
+        record = _journalRecordHeader.pack(op, len(payload)) + payload
+        return record + _journalU32.pack(zlib.crc32(record))
+
+    def _append(self, op, payload):
+        if self.error is not None: return
+        record = self._record(op, payload)
+        try:
+            self._f.write(record)
+            self._f.flush()
+            self.editCount += 1
+            self._hasEdits = True
+
+            self._recordBytes += len(record)
+            if self._recordBytes > max(self.compactSize, self.baseId[0]):
+                self._rewrite(True)
+        except OSError as e:
+            # This is called from inside an edit, which mustn't fail
+            # because the journal couldn't be written
+            self.error = e
+            self._f.close()
+            if self.errorCallback is not None:
+                self.errorCallback(e)
+
+    def commandsInserted(self, index, commands):
+        self._append(JOURNAL_INSERT, _journalU32.pack(index) + _encodeCommands(commands))
+
+    def commandsRemoved(self, index, commands):
+        self._append(JOURNAL_REMOVE, struct.pack('<II', index, len(commands)))
+
+    def commandsMoved(self, index, count, destination):
+        self._append(JOURNAL_MOVE, struct.pack('<III', index, count, destination))
+
+    def commandsReset(self):
+        self._append(JOURNAL_CHECKPOINT, _encodeCommands(self.file.Commands))
+
+    def commandChanged(self, index, field, oldValue, newValue):
+        self._append(JOURNAL_CHANGE, _journalU32.pack(index) + _encodeCommands([self.file.Commands[index]]))
+
+    def commandsChanged(self, indices, field, oldValues, newValues):
+        commands = self.file.Commands
+        payload = struct.pack(f'<I{len(indices)}I', len(indices), *indices)
+        self._append(JOURNAL_FIELDS, payload + _encodeCommands([commands[i] for i in indices]))
+
+
+
+################################################################
+################################################################
+################################################################
+############################ Search ############################
+
+
+_searchTokenPattern = re.compile(r'\w+')
+_searchTermPattern = re.compile(r'(?:(\w+):)?("[^"]*"|\S+)')
+
+
+def searchTokens(text):
+    """
+    Split text into the lowercase words that SearchIndex indexes
+    """
+    return _searchTokenPattern.findall(text.lower())
+
+
+def _searchKeysOf(com):
+    """
+    Return the set of SearchIndex keys a command is listed under
+    """
+    comType = type(com)
+    keys = {('type', comType)}
+    for field in CommandFields[comType]:
+        value = getattr(com, field)
+        if type(value) is str:
+            keys.update(('token', t) for t in searchTokens(value))
+        else:
+            keys.add(('field', field, value))
+    return keys
+
+
+def _fieldKeysOf(field, value):
+    """
+    Return the set of SearchIndex keys one field value is listed
+    under
+    """
+    if type(value) is str:
+        return {('token', t) for t in searchTokens(value)}
+    return {('field', field, value)}
+
+
+class SearchIndex(SequenceListener):
+    """
+    Inverted index over the commands in a CreditsSequenceBin, from
+    keys to sorted lists of command indices. The keys are:
+
+        ('type', command type)
+        ('token', lowercase word in a text field)
+        ('field', field name, value) for every other field
+
+    This follows the file's changes incrementally. Field edits update
+    just the keys involved. Inserts, removes and moves shift the
+    indices after them, so they're written to a log instead, and each
+    key's list catches up on the log the next time it's used. The log
+    is applied to every key and cleared once it gets long.
+    """
+    MAX_LOG_LENGTH = 256
+
+    def __init__(self, file):
+        self.file = file
+        file.addListener(self)
+        self.commandsReset()
+
+    def detach(self):
+        """
+        Stop following changes to the file
+        """
+        self.file.removeListener(self)
+
+    # Postings are [version, sorted list of indices, cached set or
+    # None]. version is how much of the log has been applied.
+
+    def _version(self):
+        return self._logStart + len(self._log)
+
+    def _posting(self, key, create=False):
+        """
+        Return the up-to-date posting for a key, or None
+        """
+        posting = self._postings.get(key)
+        if posting is None:
+            if not create: return None
+            posting = self._postings[key] = [self._version(), [], None]
+        elif posting[0] != self._version():
+            indices = posting[1]
+            for op in self._log[posting[0] - self._logStart:]:
+                self._applyOp(indices, op)
+            posting[0] = self._version()
+            posting[2] = None
+        return posting
+
+    @staticmethod
+    def _applyOp(indices, op):
+        kind, index, count, destination = op
+        if kind == 'insert':
+            i = bisect.bisect_left(indices, index)
+            indices[i:] = [j + count for j in indices[i:]]
+        elif kind == 'remove':
+            i = bisect.bisect_left(indices, index)
+            indices[i:] = [j - count for j in indices[i:]]
+        else:
+            start, end = min(index, destination), max(index + count, destination)
+            lo, hi = bisect.bisect_left(indices, start), bisect.bisect_left(indices, end)
+            if lo == hi: return
+            if destination < index:
+                moved = [j - index + destination if j >= index else j + count for j in indices[lo:hi]]
+            else:
+                moved = [j + destination - count - index if j < index + count else j - count for j in indices[lo:hi]]
+            moved.sort()
+            indices[lo:hi] = moved
+
+    def _logOp(self, op):
+        self._log.append(op)
+        if len(self._log) > self.MAX_LOG_LENGTH:
+            for key in self._postings:
+                self._posting(key)
+            self._logStart = self._version()
+            self._log = []
+
+    def _addIndex(self, key, index):
+        posting = self._posting(key, True)
+        bisect.insort(posting[1], index)
+        posting[2] = None
+
+    def _removeIndex(self, key, index):
+        posting = self._posting(key)
+        indices = posting[1]
+        del indices[bisect.bisect_left(indices, index)]
+        if indices:
+            posting[2] = None
+        else:
+            del self._postings[key]
+
+    def commandsReset(self):
+        postings = {}
+        for i, com in enumerate(self.file.Commands):
+            for key in _searchKeysOf(com):
+                if key in postings:
+                    postings[key].append(i)
+                else:
+                    postings[key] = [i]
+
+        self._logStart = 0
+        self._log = []
+        self._postings = {key: [0, indices, None] for key, indices in postings.items()}
+
+    def commandsInserted(self, index, commands):
+        self._logOp(('insert', index, len(commands), None))
+        for i, com in enumerate(commands, index):
+            for key in _searchKeysOf(com):
+                self._addIndex(key, i)
+
+    def commandsAboutToBeRemoved(self, index, count):
+        # Take the commands out of their own keys' lists first, while
+        # the indices still match
+        for i in range(index, index + count):
+            for key in _searchKeysOf(self.file.Commands[i]):
+                self._removeIndex(key, i)
+
+    def commandsRemoved(self, index, commands):
+        self._logOp(('remove', index, len(commands), None))
+
+    def commandsMoved(self, index, count, destination):
+        self._logOp(('move', index, count, destination))
+
+    def commandChanged(self, index, field, oldValue, newValue):
+        com = self.file.Commands[index]
+        oldKeys = _fieldKeysOf(field, oldValue)
+        newKeys = _fieldKeysOf(field, newValue)
+        if type(oldValue) is str:
+            # Another text field could still contain the same words
+            otherKeys = set()
+            for f in CommandFields[type(com)]:
+                if f != field: otherKeys |= _fieldKeysOf(f, getattr(com, f))
+            oldKeys -= otherKeys
+            newKeys -= otherKeys
+
+        for key in oldKeys - newKeys:
+            self._removeIndex(key, index)
+        for key in newKeys - oldKeys:
+            self._addIndex(key, index)
+
+    def lookup(self, key):
+        """
+        Return the sorted list of indices of the commands listed under
+        a key. Don't modify it.
+        """
+        posting = self._posting(key)
+        return posting[1] if posting is not None else []
+
+    def _lookupSet(self, key):
+        """
+        Return the indices listed under a key as a set, which is
+        cached until the key changes
+        """
+        posting = self._posting(key)
+        if posting is None: return set()
+        if posting[2] is None:
+            posting[2] = set(posting[1])
+        return posting[2]
+
+    def _matchingTokens(self, word):
+        """
+        Return the indexed tokens that contain word
+        """
+        return [key for key in self._postings if key[0] == 'token' and word in key[1]]
+
+    def _wordKeys(self, word, matchTypes):
+        """
+        Return the keys of the text tokens containing word and, if
+        matchTypes, of the command types whose names contain it
+        """
+        keys = self._matchingTokens(word)
+        if matchTypes:
+            keys += [('type', comType) for comType, name in CommandTypeNames.items()
+                if word in name.lower() or word in comType.name.lower()]
+        return keys
+
+    def _lookupAny(self, keys, asSet=False):
+        """
+        Return the indices of the commands listed under any of the
+        keys, as a sorted list or as a set
+        """
+        if len(keys) == 1:
+            return self._lookupSet(keys[0]) if asSet else self.lookup(keys[0])
+        result = set()
+        for key in keys:
+            result.update(self.lookup(key))
+        return result if asSet else sorted(result)
+
+    def findText(self, text, caseSensitive=False):
+        """
+        Return the sorted indices of the commands with a text field
+        containing text
+        """
+        words = searchTokens(text)
+        if words:
+            # Only commands containing the longest word in some token
+            # can match
+            candidates = self._lookupAny(self._wordKeys(max(words, key=len), False))
+        else:
+            candidates = range(len(self.file.Commands))
+
+        if not caseSensitive:
+            text = text.lower()
+        matches = []
+        commands = self.file.Commands
+        for i in candidates:
+            com = commands[i]
+            for field in CommandFields[type(com)]:
+                value = getattr(com, field)
+                if type(value) is str and text in (value if caseSensitive else value.lower()):
+                    matches.append(i)
+                    break
+        return matches
+
+    def query(self, text):
+        """
+        Return the sorted indices of the commands matching a filter,
+        which is a list of terms that all have to match:
+
+            word          a word in a text field or the command type
+                          contains "word"
+            type:Name     the command is of that type ("Delay", ...)
+            field:value   the command has that field, with that value.
+                          Values can be integers, true/false, or file
+                          slot names ("Body Font", in quotes).
+
+        Raises ValueError if a term isn't valid.
+        """
+        # Each term is a list of keys, any of which match. The result
+        # is the indices for the term with the fewest, filtered by
+        # the others.
+        terms = []
+        for field, value in _searchTermPattern.findall(text):
+            if len(value) >= 2 and value[0] == value[-1] == '"':
+                value = value[1:-1]
+
+            if not field:
+                for word in searchTokens(value):
+                    terms.append(self._wordKeys(word, True))
+
+            elif field == 'type':
+                for comType, name in CommandTypeNames.items():
+                    if name.lower() == value.lower(): break
+                else:
+                    raise ValueError(f'Unknown command type: "{value}"')
+                terms.append([('type', comType)])
+
+            else:
+                terms.append([('field', field, self._parseFieldValue(field, value))])
+
+        if not terms:
+            return list(range(len(self.file.Commands)))
+        terms.sort(key=lambda keys: sum(len(self.lookup(key)) for key in keys))
+        result = list(self._lookupAny(terms[0]))
+        for keys in terms[1:]:
+            result = list(filter(self._lookupAny(keys, True).__contains__, result))
+        return result
+
+    @staticmethod
+    def _parseFieldValue(field, value):
+        if value.lower() in ('true', 'false'):
+            return value.lower() == 'true'
+        try:
+            return int(value, 0)
+        except ValueError:
+            pass
+        for slot, name in enumerate(NEWER_DS_FILE_SLOTS):
+            if name.lower() == value.lower():
+                return slot
+        raise ValueError(f'Invalid value for "{field}": "{value}"')
+
+    def replaceText(self, old, new, caseSensitive=False):
+        """
+        Replace old with new in every text field, through the file's
+        setField(). Returns the indices of the commands changed.
+        """
+        pattern = re.compile(re.escape(old), 0 if caseSensitive else re.IGNORECASE)
+        changed = []
+        for i in self.findText(old, caseSensitive):
+            com = self.file.Commands[i]
+            for field in CommandFields[type(com)]:
+                value = getattr(com, field)
+                if type(value) is str:
+                    self.file.setField(i, field, pattern.sub(lambda m: new, value))
+            changed.append(i)
+        return changed
+
+
+
+################################################################
+################################################################
+################################################################
+############################# Lint #############################
+
+
+# A problem found by Linter. severity is 'error' for problems that
+# prevent saving, and 'warning' for ones that only misbehave in-game.
+LintIssue = collections.namedtuple('LintIssue', 'severity message')
+
+
+# The linter's state before each command: whether header and body
+# text have been set yet, and the frozenset of file slots with files
+# loaded into them
+_INITIAL_LINT_STATE = (False, False, frozenset())
+
+
+def _lintText(com, nextCom, state):
+    try:
+        length = len(com.text.encode('latin-1'))
+    except UnicodeEncodeError as e:
+        issues = (LintIssue('error', f'Contains a character that can\'t be saved: {com.text[e.start]!r}'),)
+    else:
+        issues = ()
+        if length > MAX_TEXT_LENGTH:
+            issues = (LintIssue('error', f'Text is too long ({length} bytes; the maximum is {MAX_TEXT_LENGTH})'),)
+
+    headerSet, bodySet, slots = state
+    if type(com) is SetHeaderTextCommand and not headerSet:
+        state = (True, bodySet, slots)
+    elif type(com) is SetBodyTextCommand and not bodySet:
+        state = (headerSet, True, slots)
+    return issues, state
+
+
+def _lintShowText(com, nextCom, state):
+    headerSet, bodySet, slots = state
+    issues = ()
+    if not headerSet and type(com) in (ShowTextCommand, ShowHeaderTextCommand):
+        issues += (LintIssue('warning', 'Shows header text, but no header text has been set yet'),)
+    if not bodySet and type(com) in (ShowTextCommand, ShowBodyTextCommand):
+        issues += (LintIssue('warning', 'Shows body text, but no body text has been set yet'),)
+    return issues, state
+
+
+def _lintLoadFile(com, nextCom, state):
+    headerSet, bodySet, slots = state
+    if com.slot in slots:
+        return (LintIssue('warning', f'The "{fileSlotName(com.slot)}" slot already has a file loaded into it'),), state
+    return (), (headerSet, bodySet, slots | {com.slot})
+
+
+def _lintUnloadFile(com, nextCom, state):
+    headerSet, bodySet, slots = state
+    if com.slot in slots:
+        state = (headerSet, bodySet, slots - {com.slot})
+    return (), state
+
+
+def _lintSwitchScene(com, nextCom, state):
+    if type(nextCom) is not DelayCommand:
+        return (LintIssue('warning', 'Should be followed by a delay, to give the scene time to load'),), state
+    return (), state
+
+
+def _lintUnknown(com, nextCom, state):
+    return (LintIssue('warning', f'Unknown command (ID {com.commandId}); the game may not handle it, but it will be saved unchanged'),), state
+
+
+# Check functions for the command types that need them. Each takes
+# (command, next command or None, state before it), and returns
+# (tuple of LintIssues, state after it).
+_LINT_CHECKS = {
+    SetHeaderTextCommand: _lintText,
+    SetBodyTextCommand: _lintText,
+    ShowTextCommand: _lintShowText,
+    ShowHeaderTextCommand: _lintShowText,
+    ShowBodyTextCommand: _lintShowText,
+    LoadFileCommand: _lintLoadFile,
+    UnloadFileCommand: _lintUnloadFile,
+    SwitchSceneCommand: _lintSwitchScene,
+    UnknownCommand: _lintUnknown,
+    }
+
+_MISSING_EXIT_STAGE = LintIssue('warning', 'The sequence should end with Exit Stage')
+
+
+class Linter(SequenceListener):
+    """
+    Finds problems in a CreditsSequenceBin that would otherwise only
+    show up on hardware. This is a single pass over the commands,
+    carrying a small state (see _INITIAL_LINT_STATE) from each command
+    to the next.
+
+    The state before every command is kept, so after an edit, checking
+    restarts just before the edited commands and stops as soon as the
+    state is the same as it was before. Usually that's right after the
+    edit.
+
+    If changedCallback is set, it's called with the indices of the
+    commands whose issues changed.
+    """
+    def __init__(self, file):
+        self.file = file
+        self.changedCallback = None
+        file.addListener(self)
+        self.commandsReset()
+
+    def detach(self):
+        """
+        Stop following changes to the file
+        """
+        self.file.removeListener(self)
+
+    def issuesAt(self, index):
+        """
+        Return a tuple of the LintIssues for the command at index
+        """
+        return self._issues[index]
+
+    def issueCount(self):
+        """
+        Return the number of commands with issues
+        """
+        return self._count
+
+    def allIssues(self):
+        """
+        Return a list of (index, LintIssue) for every issue
+        """
+        return [(i, issue) for i, issues in enumerate(self._issues) for issue in issues]
+
+    def nextIssue(self, index):
+        """
+        Return the index of the first command after index with issues,
+        wrapping around to the start, or None if there are none
+        """
+        if not self._count: return None
+        issues = self._issues
+        for i in itertools.chain(range(index + 1, len(issues)), range(index + 1)):
+            if issues[i]: return i
+
+    def _recheck(self, start, end):
+        """
+        Check commands again, starting just before start (since a
+        command's issues can depend on the next one), and continuing
+        at least until end
+        """
+        commands = self.file.Commands
+        states, allIssues = self._states, self._issues
+        checks = _LINT_CHECKS
+        n = len(commands)
+        last = n - 1
+        changed = []
+
+        i = max(0, start - 1)
+        state = states[i]
+        while i < n:
+            com = commands[i]
+            check = checks.get(type(com))
+            if check is None:
+                issues = ()
+            else:
+                issues, state = check(com, commands[i + 1] if i < last else None, state)
+            if i == last and type(com) is not ExitStageCommand:
+                issues += (_MISSING_EXIT_STAGE,)
+
+            if issues != allIssues[i]:
+                self._count += bool(issues) - bool(allIssues[i])
+                allIssues[i] = issues
+                changed.append(i)
+
+            i += 1
+            if i >= end and states[i] == state:
+                break # everything after this is the same as before
+            states[i] = state
+
+        if changed and self.changedCallback is not None:
+            self.changedCallback(changed)
+
+    def commandsReset(self):
+        n = len(self.file.Commands)
+        self._states = [_INITIAL_LINT_STATE] + [None] * n
+        self._issues = [()] * n
+        self._count = 0
+        self._recheck(0, n)
+
+    def commandsInserted(self, index, commands):
+        count = len(commands)
+        self._states[index + 1 : index + 1] = [None] * count
+        self._issues[index:index] = [()] * count
+        self._recheck(index, index + count)
+
+    def commandsRemoved(self, index, commands):
+        # Keep the state before the first command after the removed
+        # ones, to compare against when checking again
+        count = len(commands)
+        del self._states[index : index + count]
+        self._states[0] = _INITIAL_LINT_STATE
+        self._count -= sum(1 for issues in self._issues[index : index + count] if issues)
+        del self._issues[index : index + count]
+        self._recheck(index, index)
+
+    def commandsMoved(self, index, count, destination):
+        start, end = min(index, destination), max(index + count, destination)
+        issues = self._issues
+        if destination < index:
+            issues[start:end] = issues[index : index + count] + issues[destination : index]
+        else:
+            issues[start:end] = issues[index + count : destination] + issues[index : index + count]
+        self._states[start + 1 : end] = [None] * (end - start - 1)
+        self._recheck(start, end)
+
+    def commandChanged(self, index, field, oldValue, newValue):
+        self._recheck(index, index + 1)
+
+    def commandsChanged(self, indices, field, oldValues, newValues):
+        # One pass over the whole range is cheaper than one per command
+        self._recheck(min(indices), max(indices) + 1)
+
+
+
+################################################################
+################################################################
+################################################################
+######################### Script Format ########################
+
+
+# A human-readable form of a sequence, with one command per line:
+#
+#     # Comments and blank lines are ignored
+#     SetHeaderText text="Programming"
+#     SetBodyText text="RoadrunnerWMC\nTreeki"
+#     ShowText
+#     Delay time=300
+#
+# Command and field names are the same as in CommandTypeNames and
+# CommandFields. Fields can be given in any order, and ones that are
+# left out keep their default values. Values are integers (decimal,
+# or hexadecimal with "0x"), true/false, or double-quoted strings with
+# \n, \t, \", \\ and \xHH escapes.
+
+
+SCRIPT_HEADER = '# Newer DS Credits Editor script\n'
+
+_scriptFieldPattern = re.compile(r'\s*([A-Za-z_]\w*)=("(?:[^"\\]|\\.)*"|[^\s"]*)')
+_scriptFieldsPattern = re.compile(r'\s*(?:[A-Za-z_]\w*=(?:"(?:[^"\\]|\\.)*"|[^\s"]*)(?:\s+[A-Za-z_]\w*=(?:"(?:[^"\\]|\\.)*"|[^\s"]*))*)?\s*\Z')
+_scriptEscapePattern = re.compile(r'\\(x[0-9A-Fa-f]{2}|.)')
+_scriptUnescapes = {'n': '\n', 't': '\t', '"': '"', '\\': '\\'}
+_scriptEscapes = {'\n': r'\n', '\t': r'\t', '"': r'\"', '\\': '\\\\'}
+_scriptNeedsEscapePattern = re.compile(r'[\x00-\x1f"\\\x7f-\xa0\xad]')
+
+
+def _fieldLimits(comType):
+    """
+    Return {fieldName: maximum value} for a command type's integer
+    fields. Boolean fields map to None.
+    """
+    return {f.name: FIELD_KINDS[f.kind].maximum for f in comType.fieldSpecs if f.kind not in ('text', 'blob')}
+
+CommandFieldLimits = {comType: _fieldLimits(comType) for comType in CommandTypeNames}
+
+
+class ScriptError(ValueError):
+    """
+    Error in a credits script, at a particular line and column (both
+    starting at 1)
+    """
+    def __init__(self, message, line, column):
+        super().__init__(f'line {line}, column {column}: {message}')
+        self.message = message
+        self.line = line
+        self.column = column
+
+
+class SourceMap():
+    """
+    Maps between commands (by index), positions in a script (line and
+    column, starting at 1) and byte offsets in the binary form
+    """
+    def __init__(self):
+        self.lines = array.array('L')
+        self.columns = array.array('L')
+        self.offsets = array.array('L')
+
+    def positionOfCommand(self, index):
+        """
+        Return the (line, column) at which a command appears
+        """
+        return self.lines[index], self.columns[index]
+
+    def offsetOfCommand(self, index):
+        """
+        Return the byte offset of a command's record
+        """
+        return self.offsets[index]
+
+    def commandAtLine(self, line):
+        """
+        Return the index of the command at or before a line, or None
+        if there isn't one
+        """
+        i = bisect.bisect_right(self.lines, line) - 1
+        return None if i < 0 else i
+
+    def commandAtOffset(self, offset):
+        """
+        Return the index of the command whose record contains a byte
+        offset, or None if there isn't one
+        """
+        i = bisect.bisect_right(self.offsets, offset) - 1
+        return None if i < 0 or i >= len(self.lines) else i
+
+
+def _unescapeScriptString(s):
+    return _scriptEscapePattern.sub(
+        lambda m: chr(int(m.group(1)[1:], 16)) if len(m.group(1)) == 3 else _scriptUnescapes.get(m.group(1), m.group(0)),
+        s)
+
+
+def _escapeScriptString(s):
+    if _scriptNeedsEscapePattern.search(s):
+        s = _scriptNeedsEscapePattern.sub(lambda m: _scriptEscapes.get(m.group(0), f'\\x{ord(m.group(0)):02x}'), s)
+    return f'"{s}"'
+
+
+def _parseScriptValue(comType, field, value):
+    """
+    Convert a field value from a script to a Python value. Raises
+    ValueError with a message if it's not valid.
+    """
+    limits = CommandFieldLimits[comType]
+
+    if field not in limits:
+        # String field
+        if not (len(value) >= 2 and value[0] == value[-1] == '"'):
+            raise ValueError(f'"{field}" must be a quoted string')
+        s = _unescapeScriptString(value[1:-1])
+        try:
+            s.encode('latin-1')
+        except UnicodeEncodeError as e:
+            raise ValueError(f'"{field}" contains a character that can\'t be saved: {s[e.start]!r}') from None
+        maximum = MAX_UNKNOWN_DATA_LENGTH if comType is UnknownCommand else MAX_TEXT_LENGTH
+        if len(s) > maximum:
+            raise ValueError(f'"{field}" is too long ({len(s)} characters; the maximum is {maximum})')
+        return s
+
+    maximum = limits[field]
+    if maximum is None:
+        if value not in ('true', 'false'):
+            raise ValueError(f'"{field}" must be true or false')
+        return value == 'true'
+
+    try:
+        n = int(value, 0)
+    except ValueError:
+        raise ValueError(f'"{field}" must be an integer') from None
+    if not 0 <= n <= maximum:
+        raise ValueError(f'"{field}" must be between 0 and {maximum}')
+    return n
+
+
+def _scriptLineError(lineNum, comType, rest, restStart):
+    """
+    Work out exactly what's wrong with a line that couldn't be
+    compiled, and return a ScriptError for it. This is only used once
+    something has already gone wrong, so it can afford to be slow.
+    """
+    fields = CommandFields[comType]
+    kwargs = {}
+    pos = 0
+    while pos < len(rest):
+        m = _scriptFieldPattern.match(rest, pos)
+        if m is None or m.end() == pos:
+            column = restStart + pos + len(rest[pos:]) - len(rest[pos:].lstrip()) + 1
+            return ScriptError('expected field=value', lineNum, column)
+        if pos and m.start(1) == pos:
+            return ScriptError('expected a space before the next field', lineNum, restStart + pos + 1)
+
+        field, value = m.groups()
+        column = restStart + m.start(1) + 1
+        if field not in fields:
+            return ScriptError(f'{CommandTypeNames[comType]} has no field "{field}"', lineNum, column)
+        if field in kwargs:
+            return ScriptError(f'"{field}" is given more than once', lineNum, column)
+        try:
+            kwargs[field] = _parseScriptValue(comType, field, value)
+        except ValueError as e:
+            return ScriptError(str(e), lineNum, restStart + m.start(2) + 1)
+
+        pos = m.end()
+
+    # Every field is valid on its own, so the combination isn't
+    try:
+        comType(**kwargs)
+    except (ValueError, TypeError) as e:
+        return ScriptError(str(e), lineNum, restStart + 1)
+    return ScriptError('invalid command', lineNum, restStart + 1)
+
+
+def _iterScriptCommands(text, sourceMap):
+    """
+    Yield (line, comType, kwargs) for each command in a script, where
+    line is the line's text with whitespace stripped and
+    comType(**kwargs) creates the command. The position of each
+    command is added to sourceMap. Raises ScriptError if the script is
+    invalid.
+    """
+    lines, columns = sourceMap.lines, sourceMap.columns
+    typesByName = CommandsByTypeName
+    findFields = _scriptFieldPattern.findall
+    checkFields = _scriptFieldsPattern.match
+    parseValue = _parseScriptValue
+
+    # Credits scripts repeat the same lines a lot (delays, show/hide
+    # commands...), so parsed fields are cached by line
+    parsedLines = {}
+
+    for lineNum, raw in enumerate(text.split('\n'), 1):
+        line = raw.strip()
+        if not line or line[0] == '#': continue
+        indent = len(raw) - len(raw.lstrip()) if raw[0] in ' \t' else 0
+
+        parsed = parsedLines.get(line)
+        if parsed is None:
+            name, *rest = line.split(None, 1)
+            comType = typesByName.get(name)
+            if comType is None:
+                raise ScriptError(f'unknown command "{name}"', lineNum, indent + 1)
+
+            kwargs = {}
+            rest = rest[0] if rest else ''
+            try:
+                if rest:
+                    if checkFields(rest) is None: raise ValueError
+                    pairs = findFields(rest)
+                    kwargs = {field: parseValue(comType, field, value) for field, value in pairs}
+                    if len(kwargs) != len(pairs): raise ValueError
+                comType(**kwargs)
+            except (ValueError, TypeError):
+                restStart = indent + (line.index(rest, len(name)) if rest else len(name))
+                raise _scriptLineError(lineNum, comType, rest, restStart) from None
+
+            parsed = parsedLines[line] = comType, kwargs
+
+        lines.append(lineNum)
+        columns.append(indent + 1)
+        yield line, parsed[0], parsed[1]
+
+
+def compileScript(text):
+    """
+    Compile a script into a CreditsSequenceBin. Returns
+    (file, sourceMap). Raises ScriptError if the script is invalid.
+    """
+    sourceMap = SourceMap()
+    file = CreditsSequenceBin()
+    file.Commands = [comType(**kwargs) for line, comType, kwargs in _iterScriptCommands(text, sourceMap)]
+    return file, sourceMap
+
+
+def compileScriptToBinary(text):
+    """
+    Compile a script directly to binary data. Returns (data,
+    sourceMap), with the byte offset of every command filled in.
+    Raises ScriptError if the script is invalid.
+    """
+    sourceMap = SourceMap()
+    offsets = sourceMap.offsets
+    encoders = CommandEncoders
+    out = bytearray()
+
+    # Identical lines always produce identical records, so each
+    # distinct line only needs to be encoded once
+    records = {}
+
+    for line, comType, kwargs in _iterScriptCommands(text, sourceMap):
+        record = records.get(line)
+        if record is None:
+            record = bytearray()
+            encoders[comType](comType(**kwargs), record)
+            record = records[line] = bytes(record)
+
+        offsets.append(len(out))
+        out += record
+
+    out += b'\x02\x00' # null command
+    return bytes(out), sourceMap
+
+
+def formatScriptCommand(com, fields=None):
+    """
+    Return the script line for a command. If fields is given, only
+    those fields are included.
+    """
+    comType = type(com)
+    parts = [CommandTypeNames[comType]]
+    fieldLimits = CommandFieldLimits[comType]
+    for field in CommandFields[comType] if fields is None else fields:
+        value = getattr(com, field)
+        if type(value) is bytes:
+            value = _escapeScriptString(value.decode('latin-1'))
+        elif field not in fieldLimits:
+            value = _escapeScriptString(value)
+        elif fieldLimits[field] is None:
+            value = 'true' if value else 'false'
+        parts.append(f'{field}={value}')
+    return ' '.join(parts)
+
+
+def decompileScript(file):
+    """
+    Convert a CreditsSequenceBin to a script. Returns (text,
+    sourceMap).
+    """
+    sourceMap = SourceMap()
+    lines = [SCRIPT_HEADER.rstrip('\n')]
+    lines.extend(map(formatScriptCommand, file.Commands))
+
+    sourceMap.lines = array.array('L', range(2, len(lines) + 1))
+    sourceMap.columns = array.array('L', [1]) * (len(lines) - 1)
+    file.saveTo(_NullFile(), offsets=sourceMap.offsets)
+
+    return '\n'.join(lines) + '\n', sourceMap
+
+
+class _NullFile():
+    """
+    File object that discards everything written to it
+    """
+    def write(self, data):
+        return len(data)
+
+
+
+################################################################
+################################################################
+################################################################
+######################## Diff and Patch ########################
+
+
+
+# Patches describe how to turn one sequence into another, using the
+# same command syntax as scripts:
+#
+#     # Newer DS Credits Editor patch
+#     @ 120
+#     - Delay time=30
+#     + HideText
+#     ~ SetBodyText text="Treeki"
+#
+# "@ N" skips ahead to command N of the original sequence, keeping
+# the commands before it. "-" removes the next command, which has to
+# match the one given exactly. "+" inserts a command. "~" keeps the
+# next command, which has to be of the given type, but changes the
+# fields given (Unknown commands always give their commandId, since
+# they can't be created without one). Everything after the last line
+# is kept.
+
+
+PATCH_HEADER = '# Newer DS Credits Editor patch\n'
+
+
+class PatchError(ValueError):
+    """
+    Error applying a patch, at a particular line (starting at 1)
+    """
+    def __init__(self, message, line):
+        super().__init__(f'line {line}: {message}')
+        self.message = message
+        self.line = line
+
+
+# Functions returning the values of each command type's fields
+_fieldGetters = {comType: operator.attrgetter(*fields) if fields else None
+    for comType, fields in CommandFields.items()}
+
+
+def _commandKeys(commands, ids):
+    """
+    Return a list of ints identifying each command by its type and
+    field values, using (and adding to) ids, {key: int}
+    """
+    getters = _fieldGetters
+    keys = []
+    append = keys.append
+    setdefault = ids.setdefault
+    for com in commands:
+        comType = type(com)
+        getter = getters[comType]
+        key = comType if getter is None else (comType, getter(com))
+        append(setdefault(key, len(ids)))
+    return keys
+
+
+# Myers' algorithm takes time proportional to the number of
+# differences, which is only small if the sequences are similar. Each
+# search for a middle snake gives up after DIFF_MAX_COST differences,
+# and a whole diff after DIFF_BUDGET steps (diagonals tried and
+# commands compared) in total, as git's xdiff does. The part that was
+# being compared then becomes one hunk replacing all of it.
+DIFF_MAX_COST = 1000
+DIFF_BUDGET = 2000000
+
+
+def _middleSnake(a, b, x0, x1, y0, y1, budget):
+    """
+    Find the middle snake of a shortest edit script between a[x0:x1]
+    and b[y0:y1], searching forward from the start and backward from
+    the end at the same time, in linear space. Returns (x, y, length)
+    (which can be empty), or None if it costs too much to find.
+    budget is a one-element list of the steps left, which is reduced.
+    """
+    if budget[0] <= 0: return None
+    n, m = x1 - x0, y1 - y0
+    delta = n - m
+    odd = delta & 1
+    limit = min((n + m + 1) // 2, DIFF_MAX_COST // 2) + 1
+    offset = limit + 1
+    forward = [0] * (2 * offset + 1) # furthest x on each diagonal k = x - y
+    backward = [0] * (2 * offset + 1) # the same, counted from the end
+    steps = 0
+
+    for d in range(limit):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            startX = x
+            while x < n and y < m and a[x0 + x] == b[y0 + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            steps += x - startX
+            if odd and -d < delta - k < d and x + backward[offset + delta - k] >= n:
+                budget[0] -= steps + d * d
+                return x0 + startX, y0 + startX - k, x - startX
+
+        for c in range(-d, d + 1, 2):
+            if c == -d or (c != d and backward[offset + c - 1] < backward[offset + c + 1]):
+                x = backward[offset + c + 1]
+            else:
+                x = backward[offset + c - 1] + 1
+            y = x - c
+            startX = x
+            while x < n and y < m and a[x1 - 1 - x] == b[y1 - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + c] = x
+            steps += x - startX
+            if not odd and -d <= delta - c <= d and x + forward[offset + delta - c] >= n:
+                budget[0] -= steps + d * d
+                return x0 + n - x, y0 + m - y, x - startX
+
+        if steps + d * d > budget[0]: break
+
+    budget[0] = max(0, budget[0] - steps - limit * limit)
+    return None
+
+
+def _myersSnakes(a, b, budget=None):
+    """
+    Find a shortest edit script between two lists with the linear
+    space version of Myers' O(ND) algorithm. Returns the matching runs
+    ("snakes") along it, as a list of (x, y, length) in order. Parts
+    that cost too much to compare (see DIFF_MAX_COST) have no snakes.
+    """
+    if budget is None:
+        budget = [DIFF_BUDGET]
+    snakes = []
+    ranges = [(0, len(a), 0, len(b))]
+    while ranges:
+        x0, x1, y0, y1 = ranges.pop()
+
+        # Skip the parts at the start and end that are the same
+        x, y = x0, y0
+        while x < x1 and y < y1 and a[x] == b[y]:
+            x += 1
+            y += 1
+        if x > x0:
+            snakes.append((x0, y0, x - x0))
+        x0, y0 = x, y
+        x, y = x1, y1
+        while x > x0 and y > y0 and a[x - 1] == b[y - 1]:
+            x -= 1
+            y -= 1
+        if x < x1:
+            snakes.append((x, y, x1 - x))
+        x1, y1 = x, y
+        if x0 == x1 or y0 == y1: continue
+
+        snake = _middleSnake(a, b, x0, x1, y0, y1, budget)
+        if snake is None: continue
+        sx, sy, length = snake
+        if length:
+            snakes.append(snake)
+        ranges.append((x0, sx, y0, sy))
+        ranges.append((sx + length, x1, sy + length, y1))
+
+    snakes.sort()
+    return snakes
+
+
+def _anchoredSnakes(a, b, budget=None):
+    """
+    Like _myersSnakes(), but first matches up the values that appear
+    exactly once in each list (as in "patience diff"), and only runs
+    Myers' algorithm between those. This is much faster for long lists
+    with many scattered changes, but isn't always the shortest edit
+    script.
+    """
+    if budget is None:
+        budget = [DIFF_BUDGET]
+    counts = collections.Counter(a)
+    countsB = collections.Counter(b)
+    positionsB = {value: j for j, value in enumerate(b) if countsB[value] == 1}
+    pairs = [(i, positionsB[value]) for i, value in enumerate(a)
+        if counts[value] == 1 and value in positionsB]
+
+    # Longest increasing subsequence of the pairs, by position in b
+    tails, tailIndices, previous = [], [], []
+    for p, (i, j) in enumerate(pairs):
+        t = bisect.bisect_left(tails, j)
+        if t == len(tails):
+            tails.append(j)
+            tailIndices.append(p)
+        else:
+            tails[t] = j
+            tailIndices[t] = p
+        previous.append(tailIndices[t - 1] if t else -1)
+    anchors = []
+    p = tailIndices[-1] if tailIndices else -1
+    while p != -1:
+        anchors.append(pairs[p])
+        p = previous[p]
+    anchors.reverse()
+
+    snakes = []
+    x = y = 0
+    for ax, ay in anchors + [(len(a), len(b))]:
+        for sx, sy, length in _myersSnakes(a[x:ax], b[y:ay], budget):
+            snakes.append((x + sx, y + sy, length))
+        if ax < len(a):
+            snakes.append((ax, ay, 1))
+        x, y = ax + 1, ay + 1
+    return snakes
+
+
+# Past this many commands (after skipping the unchanged start and
+# end), diffSequences() uses _anchoredSnakes()
+ANCHORED_DIFF_THRESHOLD = 10000
+
+
+def diffSequences(old, new):
+    """
+    Compare two CreditsSequenceBins command by command. Returns a list
+    of (i1, i2, j1, j2) for each place they differ: old.Commands[i1:i2]
+    was replaced with new.Commands[j1:j2]. Either range can be empty.
+    """
+    ids = {}
+    a, b = _commandKeys(old.Commands, ids), _commandKeys(new.Commands, ids)
+
+    # Myers' algorithm is fastest when it only has to look at the part
+    # that changed
+    start = 0
+    end = min(len(a), len(b))
+    while start < end and a[start] == b[start]:
+        start += 1
+    trim = 0
+    while trim < end - start and a[-1 - trim] == b[-1 - trim]:
+        trim += 1
+
+    a, b = a[start : len(a) - trim], b[start : len(b) - trim]
+    snakes = (_anchoredSnakes if len(a) + len(b) > ANCHORED_DIFF_THRESHOLD else _myersSnakes)(a, b)
+    a = b = None
+    snakes.append((len(old.Commands) - trim - start, len(new.Commands) - trim - start, 0))
+
+    hunks = []
+    x = y = 0
+    for sx, sy, length in snakes:
+        if sx > x or sy > y:
+            hunks.append((start + x, start + sx, start + y, start + sy))
+        x, y = sx + length, sy + length
+    return hunks
+
+
+def makePatch(old, new, hunks=None, comments=False):
+    """
+    Return the text of a patch that turns old into new. hunks is the
+    output of diffSequences(), which is called if it's not given. If
+    comments, each changed field is also described in a comment.
+    """
+    if hunks is None:
+        hunks = diffSequences(old, new)
+
+    oldCommands, newCommands = old.Commands, new.Commands
+    lines = [PATCH_HEADER.rstrip('\n')]
+    for i1, i2, j1, j2 in hunks:
+        if comments:
+            oldRange = f'{i1}' if i2 - i1 == 1 else f'{i1}-{i2 - 1}'
+            newRange = f'{j1}' if j2 - j1 == 1 else f'{j1}-{j2 - 1}'
+            if i2 == i1:
+                lines.append(f'# insert {newRange}')
+            elif j2 == j1:
+                lines.append(f'# remove {oldRange}')
+            else:
+                lines.append(f'# change {oldRange} -> {newRange}')
+        lines.append(f'@ {i1}')
+
+        # Pair up commands of the same type, so that only the fields
+        # that changed are written
+        for t in range(max(i2 - i1, j2 - j1)):
+            a = oldCommands[i1 + t] if i1 + t < i2 else None
+            b = newCommands[j1 + t] if j1 + t < j2 else None
+            if a is not None and b is not None and type(a) is type(b):
+                fields = [f for f in CommandFields[type(a)] if getattr(a, f) != getattr(b, f)]
+                if comments:
+                    lines.extend(f'#   {f}: {getattr(a, f)!r} -> {getattr(b, f)!r}' for f in fields)
+                if type(b) is UnknownCommand and 'commandId' not in fields:
+                    fields.insert(0, 'commandId') # the line can't be parsed without it
+                lines.append('~ ' + formatScriptCommand(b, fields))
+                continue
+            if a is not None:
+                lines.append('- ' + formatScriptCommand(a))
+            if b is not None:
+                lines.append('+ ' + formatScriptCommand(b))
+
+    return '\n'.join(lines) + '\n'
+
+
+def applyPatch(file, text):
+    """
+    Apply a patch to a CreditsSequenceBin, and return the result as a
+    new CreditsSequenceBin. Commands that the patch doesn't touch are
+    shared between the two. Raises PatchError if the patch doesn't
+    apply, or ScriptError if it contains an invalid command.
+    """
+    # Parse all of the commands at once, as a script with the same
+    # line numbers as the patch
+    ops = []
+    scriptLines = []
+    for lineNum, line in enumerate(text.split('\n'), 1):
+        line = line.strip()
+        if not line or line[0] == '#':
+            scriptLines.append('')
+        elif line[0] == '@':
+            try:
+                ops.append(('@', lineNum, int(line[1:])))
+            except ValueError:
+                raise PatchError('expected "@ index"', lineNum) from None
+            scriptLines.append('')
+        elif line[0] in '-+~' and line[1:2] == ' ':
+            ops.append((line[0], lineNum, None))
+            scriptLines.append(line[2:])
+        else:
+            raise PatchError('expected a line starting with "@", "-", "+" or "~"', lineNum)
+
+    parsed = iter(_iterScriptCommands('\n'.join(scriptLines), SourceMap()))
+
+    old = file.Commands
+    ids = {}
+    result = []
+    pos = 0
+    for op, lineNum, index in ops:
+        if op == '@':
+            if not pos <= index <= len(old):
+                raise PatchError(f'command {index} is out of order or past the end of the sequence', lineNum)
+            result.extend(old[pos:index])
+            pos = index
+            continue
+
+        line, comType, kwargs = next(parsed)
+        if op == '+':
+            result.append(comType(**kwargs))
+            continue
+
+        if pos >= len(old):
+            raise PatchError('the sequence has already ended', lineNum)
+        com = old[pos]
+        if op == '-':
+            if _commandKeys([com], ids) != _commandKeys([comType(**kwargs)], ids):
+                raise PatchError(f'command {pos} is {formatScriptCommand(com)}, not {line}', lineNum)
+        else:
+            if type(com) is not comType:
+                raise PatchError(f'command {pos} is {CommandTypeNames[type(com)]}, not {CommandTypeNames[comType]}', lineNum)
+            values = {f: getattr(com, f) for f in CommandFields[comType]}
+            values.update(kwargs)
+            result.append(comType(**values))
+        pos += 1
+
+    result.extend(old[pos:])
+    newFile = CreditsSequenceBin()
+    newFile.Commands = result
+    return newFile
+
+
+
+################################################################
+################################################################
+################################################################
+########################## Batch Mode ##########################
+
+
+# Batch mode is run by newer_ds_credits_editor.py when its first
+# argument is one of BATCH_ACTIONS, or by running this file directly.
+
+
+def _readSequence(path, progress=None):
+    """
+    Load a CreditsSequenceBin from a .bin, .json or .txt (script) file.
+    Returns (raw data or None, file). progress is passed on to
+    CreditsSequenceBin for .bin files.
+    """
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return None, sequenceFromJson(f.read())
+
+    if path.lower().endswith('.txt'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return None, compileScript(f.read())[0]
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    return data, CreditsSequenceBin(data, progress)
+
+
+def loadSequence(path, progress=None):
+    """
+    Load a CreditsSequenceBin from a .bin, .json or .txt (script) file.
+    For .bin files, progress(bytesRead, total) is called now and then
+    (see CreditsSequenceBin._initFromData()).
+    """
+    return _readSequence(path, progress)[1]
+
+
+def _writeSequence(path, file):
+    """
+    Save a CreditsSequenceBin to a .bin, .json or .txt (script) file,
+    depending on the extension
+    """
+    if path.lower().endswith('.json'):
+        writeFileAtomically(path, lambda f: f.write(sequenceToJson(file)), binary=False)
+    elif path.lower().endswith('.txt'):
+        writeFileAtomically(path, lambda f: f.write(decompileScript(file)[0]), binary=False)
+    else:
+        writeFileAtomically(path, file.saveTo)
+
+
+def _batchValidate(path, options):
+    data, file = _readSequence(path)
+    file.save() # make sure it can be saved again, too
+    return f'{len(file.Commands)} commands'
+
+
+def _batchLint(path, options):
+    data, file = _readSequence(path)
+    linter = Linter(file)
+    issues = linter.allIssues()
+    message = f'{len(file.Commands)} commands, {len(issues)} problems' + ''.join(
+        f'\n    {i}: {file.Commands[i].name}: {issue.severity}: {issue.message}' for i, issue in issues)
+    if any(issue.severity == 'error' for _, issue in issues):
+        raise ValueError(message)
+    return message
+
+
+def _batchRoundtrip(path, options):
+    data, file = _readSequence(path)
+    if data is None:
+        raise ValueError('round-tripping is only possible for .bin files')
+
+    newData = file.save()
+    if newData != data:
+        for i, (a, b) in enumerate(zip(data, newData)):
+            if a != b: break
+        else:
+            i = min(len(data), len(newData))
+        raise ValueError(f'saved data differs from the original at offset 0x{i:X}')
+    return f'{len(file.Commands)} commands, identical'
+
+
+def _batchNormalize(path, options):
+    data, file = _readSequence(path)
+    newData = file.save() # make sure it can be saved before anything is written
+
+    # The output is in the same format as the input. Scripts and JSON
+    # are easy to overwrite with the wrong format by mistake, so make
+    # sure the output reads back as the same sequence.
+    outPath = path if options.in_place else os.path.join(options.output_dir, os.path.basename(path))
+    _writeSequence(outPath, file)
+    try:
+        written = _readSequence(outPath)[1].save()
+    except ValueError as e:
+        raise ValueError(f'the output can\'t be read back in the format of its extension: {e}') from None
+    if written != newData:
+        raise ValueError('the output doesn\'t read back as the same sequence')
+
+    return f'{len(file.Commands)} commands -> {outPath}' + (' (unchanged)' if data == newData else '')
+
+
+def _batchConvert(path, options):
+    data, file = _readSequence(path)
+
+    outDir = options.output_dir or os.path.dirname(path)
+    ext = {'bin': '.bin', 'json': '.json', 'script': '.txt'}[options.to]
+    outPath = os.path.join(outDir, os.path.splitext(os.path.basename(path))[0] + ext)
+    if os.path.abspath(outPath) == os.path.abspath(path):
+        raise ValueError('input and output file are the same')
+
+    _writeSequence(outPath, file)
+    return f'{len(file.Commands)} commands -> {outPath}'
+
+
+BATCH_ACTIONS = {
+    'validate': _batchValidate,
+    'lint': _batchLint,
+    'roundtrip': _batchRoundtrip,
+    'normalize': _batchNormalize,
+    'convert': _batchConvert,
+    }
+
+
+def _runBatchTask(task):
+    """
+    Run one batch action on one file. Returns (path, error, message,
+    elapsed seconds). This runs in a worker process.
+    """
+    action, path, options = task
+    start = time.perf_counter()
+    try:
+        message = BATCH_ACTIONS[action](path, options)
+        error = False
+    except Exception as e:
+        message = f'{type(e).__name__}: {e}'
+        error = True
+    return path, error, message, time.perf_counter() - start
+
+
+def _printBatchResults(results):
+    """
+    Print each result of _runBatchTask() as it comes in, and return
+    the number that failed
+    """
+    failures = 0
+    for path, error, message, elapsed in results:
+        failures += error
+        print(f'{"FAIL" if error else "OK  "} {path} ({elapsed * 1000:.1f} ms): {message}')
+    return failures
+
+
+def batchMain(argv):
+    """
+    Run a batch action over many files, without any GUI. Returns an
+    exit code.
+    """
+    # These are only needed here, and are slow to import compared to
+    # the rest of this module
+    import argparse
+    import concurrent.futures
+
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(sys.argv[0]),
+        description='Process credits sequence files without starting the editor.')
+    actions = parser.add_subparsers(dest='action')
+    actions.required = True # add_subparsers(required=) is new in Python 3.7
+
+    def addAction(name, help):
+        p = actions.add_parser(name, help=help)
+        p.add_argument('files', nargs='+', help='.bin, .json or .txt (script) sequence files')
+        p.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+            help='number of worker processes (default: one per CPU)')
+        return p
+
+    addAction('validate', 'check that files can be loaded and saved')
+    addAction('lint', 'check files for problems that would only show up in-game; fails on errors')
+    addAction('roundtrip', 'check that files are unchanged when loaded and saved again')
+    p = addAction('normalize', 'load and save files again')
+    group = p.add_mutually_exclusive_group(required=True)
+    group.add_argument('-o', '--output-dir', help='directory to write the normalized files to')
+    group.add_argument('--in-place', action='store_true', help='overwrite the input files')
+    p = addAction('convert', 'convert files between formats')
+    p.add_argument('--to', choices=['bin', 'json', 'script'], required=True, help='output format')
+    p.add_argument('-o', '--output-dir', help='output directory (default: next to each input file)')
+
+    options = parser.parse_args(argv)
+    tasks = [(options.action, path, options) for path in options.files]
+
+    start = time.perf_counter()
+    if options.jobs <= 1 or len(tasks) == 1:
+        failures = _printBatchResults(map(_runBatchTask, tasks))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(options.jobs) as executor:
+            results = executor.map(_runBatchTask, tasks, chunksize=max(1, len(tasks) // (options.jobs * 4)))
+            failures = _printBatchResults(results)
+
+    print(f'{len(tasks) - failures}/{len(tasks)} files OK in {time.perf_counter() - start:.2f} s')
+    return 1 if failures else 0
+
+
+def diffMain(argv):
+    """
+    Compare two sequence files and write a patch. Returns an exit code:
+    0 if they're the same, 1 if they differ (like diff(1)).
+    """
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog=f'{os.path.basename(sys.argv[0])} diff',
+        description='Compare two credits sequence files, command by command.')
+    parser.add_argument('old', help='original .bin, .json or .txt (script) file')
+    parser.add_argument('new', help='changed .bin, .json or .txt (script) file')
+    parser.add_argument('-o', '--output', help='write a patch to this file, instead of a commented one to stdout')
+    options = parser.parse_args(argv)
+
+    old, new = loadSequence(options.old), loadSequence(options.new)
+    start = time.perf_counter()
+    hunks = diffSequences(old, new)
+    patch = makePatch(old, new, hunks, comments=not options.output)
+    elapsed = time.perf_counter() - start
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            f.write(patch)
+        print(f'{len(hunks)} changes -> {options.output} ({elapsed * 1000:.1f} ms)')
+    else:
+        sys.stdout.write(patch)
+    return 1 if hunks else 0
+
+
+def patchMain(argv):
+    """
+    Apply a patch written by diffMain() to a sequence file. Returns an
+    exit code.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog=f'{os.path.basename(sys.argv[0])} patch',
+        description='Apply a patch to a credits sequence file.')
+    parser.add_argument('file', help='.bin, .json or .txt (script) file to patch')
+    parser.add_argument('patch', help='patch file, as written by the diff action')
+    parser.add_argument('-o', '--output', help='file to write the result to (default: overwrite the input file)')
+    options = parser.parse_args(argv)
+
+    file = loadSequence(options.file)
+    with open(options.patch, 'r', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        newFile = applyPatch(file, text)
+    except (PatchError, ScriptError) as e:
+        print(f'{options.patch}: {e}', file=sys.stderr)
+        return 1
+
+    outPath = options.output or options.file
+    _writeSequence(outPath, newFile)
+    print(f'{len(file.Commands)} -> {len(newFile.Commands)} commands -> {outPath}')
+    return 0
+
+
+# Command-line actions that take their own arguments, rather than a
+# list of files like BATCH_ACTIONS
+TOOL_ACTIONS = {
+    'diff': diffMain,
+    'patch': patchMain,
+    }
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] in TOOL_ACTIONS:
+        sys.exit(TOOL_ACTIONS[sys.argv[1]](sys.argv[2:]))
+    sys.exit(batchMain(sys.argv[1:]))
@@ -24,792 +24,25 @@
 
 
 # newer_ds_credits_editor.py
-# This is the main executable for Newer DS Credits Editor
+# This is the main executable for Newer DS Credits Editor. The
+# commands and the file format are in newer_ds_credits_core.py.
 
 
 ################################################################
 ################################################################
 
 
-version = '1.0'
-
+import bisect
+import collections
+import os
 import re
-import struct
 import sys
-import uuid
-
-from PyQt5 import QtCore, QtGui, QtWidgets; Qt = QtCore.Qt
-
-
-
-
-################################################################
-################################################################
-################################################################
-########################### Commands ###########################
-
-
-class Command():
-    """
-    Base class for all commands
-    """
-    name = ''
-    description = ''
-    dynamicDescription = None
-
-    def __init__(self):
-        self.widgets = []
-        self.layout = QtWidgets.QVBoxLayout()
-        self.uuid = uuid.uuid4()
-
-    @classmethod
-    def fromData(cls, data):
-        """
-        Create a Command instance based on some data
-        """
-        return cls()
-
-    def asData(self):
-        """
-        Return data based on current settings
-        """
-        return ()
-
-    def generateLayout(self):
-        """
-        Create a layout from self.widgets
-        """
-        if len(self.widgets) > 0:
-            L = QtWidgets.QFormLayout()
-            for name, W in self.widgets:
-                if name is None:
-                    L.addRow(W)
-                else:
-                    L.addRow(name, W)
-            self.layout = L
-        else: self.layout = getNullLayout()
-
-
-NEWER_DS_FILE_SLOTS = [
-    'Logo',
-    'Header Font',
-    'Body Font',
-    'The End',
-    'Coin Counter Font',
-    'Darkness']
-
-
-class DelayCommand(Command):
-    """
-    Command which indicates a delay
-    """
-    name = 'Wait'
-    description = 'Causes a delay before the next command is processed.'
-
-    def __init__(self):
-        super().__init__()
-
-        W = QtWidgets.QSpinBox()
-        W.setMaximum(0xFFFF)
-        self.widgets = []
-        self.widgets.append(('Time (in frames):', W))
-        self.generateLayout()
-
-    @classmethod
-    def fromData(cls, data):
-        cmd = cls()
-        delay = (data[1] << 8) | data[0]
-        cmd.widgets[0][1].setValue(delay)
-        return cmd
-
-    def asData(self):
-        return struct.pack('<H', self.widgets[0][1].value())
-
-    @property
-    def dynamicDescription(self):
-        n = self.widgets[0][1].value()
-        return 'for 1 frame' if n == 1 else f'for {n} frames'
-
-
-class SwitchSceneCommand(Command):
-    """
-    Command which indicates a scene switch
-    """
-    name = 'Switch Scene'
-    description = 'Causes the level to switch to another scene.'
-
-    def __init__(self):
-        super().__init__()
-
-        self.widgets = []
-
-        W = QtWidgets.QSpinBox()
-        W.setMaximum(0xFFFF)
-        self.widgets.append(('Area ID:', W))
-
-        W = QtWidgets.QSpinBox()
-        W.setMaximum(0xFFFF)
-        self.widgets.append(('Entrance ID:', W))
+import time
 
-        W = QtWidgets.QSpinBox()
-        W.setMaximum(0xFF)
-        self.widgets.append(('Background ID (top):', W))
-
-        W = QtWidgets.QSpinBox()
-        W.setMaximum(0xFF)
-        self.widgets.append(('Background ID (bottom):', W))
-
-        W = QtWidgets.QSpinBox()
-        W.setMaximum(0xFF)
-        self.widgets.append(('Tileset Slot:', W))
-
-        W = QtWidgets.QCheckBox('Is Ending Scene')
-        self.widgets.append((None, W))
-
-        self.generateLayout()
-
-    @classmethod
-    def fromData(cls, data):
-        cmd = cls()
-        aid, eid, bgidt, bgidb, ts, ies = struct.unpack_from('<HH3B?', data, 0)
-        cmd.widgets[0][1].setValue(aid)
-        cmd.widgets[1][1].setValue(eid)
-        cmd.widgets[2][1].setValue(bgidt)
-        cmd.widgets[3][1].setValue(bgidb)
-        cmd.widgets[4][1].setValue(ts)
-        cmd.widgets[5][1].setChecked(ies)
-        return cmd
-
-    def asData(self):
-        values = [self.widgets[i][1].value() for i in range(5)]
-        values.append(self.widgets[5][1].isChecked())
-        return struct.pack('<HH3B?', *values)
-
-    @property
-    def dynamicDescription(self):
-        a, e = self.widgets[0][1].value(),  self.widgets[1][1].value()
-        return f'to area {a}, entrance {e}'
-
-
-class FadeLogoInCommand(Command):
-    """
-    Command which causes the logo to fade in
-    """
-    name = 'Fade Logo In'
-    description = 'Causes the logo to begin to fade in.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class DropLogoCommand(Command):
-    """
-    Command which causes the logo to drop to the bottom screen
-    """
-    name = 'Drop Logo'
-    description = 'Causes the logo to drop to the lower screen.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class FadeToBlackCommand(Command):
-    """
-    Command which causes the screen to fade to black.
-    """
-    name = 'Fade to Black'
-    description = 'Causes the screen to fade to black.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class FadeFromBlackCommand(Command):
-    """
-    Command which causes the screen to fade from black.
-    """
-    name = 'Fade from Black'
-    description = 'Causes the screen to fade in from black.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class FadeToWhiteCommand(Command):
-    """
-    Command which causes the screen to fade to white.
-    """
-    name = 'Fade to White'
-    description = 'Causes the screen to fade to white.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class FadeFromWhiteCommand(Command):
-    """
-    Command which causes the screen to fade from white.
-    """
-    name = 'Fade from White'
-    description = 'Causes the screen to fade in from white.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class ShowTextCommand(Command):
-    """
-    Command which shows the current text
-    """
-    name = 'Show Text'
-    description = 'Causes the current header and body text to fade in.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class HideTextCommand(Command):
-    """
-    Command which hides the current text
-    """
-    name = 'Hide Text'
-    description = 'Causes the current header and body text to fade out.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class SetHeaderTextCommand(Command):
-    """
-    Command which sets the current header text
-    """
-    name = 'Set Header Text'
-    description = 'Changes the current header text.'
-
-    def __init__(self):
-        super().__init__()
-
-        X = QtWidgets.QPlainTextEdit()
-        X.setLineWrapMode(X.NoWrap)
-        self.widgets = [('Text:', X)]
-        self.generateLayout()
-
-    @classmethod
-    def fromData(cls, data):
-
-        strLen = data[0]
-        s = data[1 : 1+strLen].decode('latin-1')
-
-        cmd = cls()
-        cmd.widgets[0][1].setPlainText(s)
-        return cmd
-
-    def asData(self):
-        s = self.widgets[0][1].toPlainText()
-        return bytes([len(s)]) + s.encode('latin-1')
-
-    @property
-    def dynamicDescription(self):
-        s = self.widgets[0][1].toPlainText()
-        s = s.replace('\n', ' / ')
-        if len(s) > 16 + 3:
-            s = s[:16] + '...'
-        return f'to "{s}"'
-
-
-class ShowHeaderTextCommand(Command):
-    """
-    Command which shows the current header text
-    """
-    name = 'Show Header Text'
-    description = 'Causes the current header text to fade in.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class HideHeaderTextCommand(Command):
-    """
-    Command which hides the current header text
-    """
-    name = 'Hide Header Text'
-    description = 'Causes the current header text to fade out.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class SetBodyTextCommand(Command):
-    """
-    Command which sets the current body text
-    """
-    name = 'Set Body Text'
-    description = 'Changes the current body text.'
-
-    def __init__(self):
-        super().__init__()
-
-        X = QtWidgets.QPlainTextEdit()
-        X.setLineWrapMode(X.NoWrap)
-        self.widgets = [('Text:', X)]
-        self.generateLayout()
-
-    @classmethod
-    def fromData(cls, data):
-
-        strLen = data[0]
-        s = data[1 : 1+strLen].decode('latin-1')
-
-        cmd = cls()
-        cmd.widgets[0][1].setPlainText(s)
-        return cmd
-
-    def asData(self):
-        s = self.widgets[0][1].toPlainText()
-        return bytes([len(s)]) + s.encode('latin-1')
-
-    @property
-    def dynamicDescription(self):
-        s = self.widgets[0][1].toPlainText()
-        s = s.replace('\n', ' / ')
-        if len(s) > 16 + 3:
-            s = s[:16] + '...'
-        return f'to "{s}"'
-
-
-class ShowBodyTextCommand(Command):
-    """
-    Command which shows the current body text
-    """
-    name = 'Show Body Text'
-    description = 'Causes the current body text to fade in.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class HideBodyTextCommand(Command):
-    """
-    Command which hides the current body text
-    """
-    name = 'Hide Body Text'
-    description = 'Causes the current body text to fade out.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class DisablePlayerControlCommand(Command):
-    """
-    Command which disables player control
-    """
-    name = 'Disable Player Control'
-    description = 'Prevents Mario from receiving button inputs.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class EnablePlayerControlCommand(Command):
-    """
-    Command which enables player control
-    """
-    name = 'Enable Player Control'
-    description = 'Allows Mario to receive button inputs again.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class EnableLowGravityPhysicsCommand(Command):
-    """
-    Command which enables low-gravity physics
-    """
-    name = 'Enable Low-Gravity Physics'
-    description = 'Causes Mario to experience low-gravity physics.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class DisableLowGravityPhysicsCommand(Command):
-    """
-    Command which disables low-gravity physics
-    """
-    name = 'Disable Low-Gravity Physics'
-    description = 'Switches Mario back to normal physics.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class UnlockInactiveCharacterCommand(Command):
-    """
-    Command which causes the inactive character to become
-    unlocked.
-    """
-    name = 'Unlock Inactive Character'
-    description = 'Causes the inactive character to be able to move.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class SetPlayersFacingScreenCommand(Command):
-    """
-    Command which causes all players to face the screen
-    """
-    name = 'Set Players Facing Screen'
-    description = 'Causes all of the players to face the screen.'
+from newer_ds_credits_core import *
 
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class LoadAndPlacePeachCommand(Command):
-    """
-    Command which loads Peach and places her at a particular
-    location
-    """
-    name = 'Load and Place Peach'
-    description = 'Loads Peach and positions her at a given location.'
-
-    def __init__(self):
-        super().__init__()
-
-        self.widgets = []
-
-        W = HexSpinBox(8)
-        W.setMaximum(0xFFFFFFFF)
-        self.widgets.append(('X:', W))
-
-        W = HexSpinBox(8)
-        W.setMaximum(0xFFFFFFFF)
-        self.widgets.append(('Y:', W))
-
-        self.generateLayout()
-
-    @classmethod
-    def fromData(cls, data):
-        cmd = cls()
-        x, y = struct.unpack_from('<xxII', data)
-        cmd.widgets[0][1].setValue(x)
-        cmd.widgets[1][1].setValue(y)
-        return cmd
-
-    def asData(self):
-        x = self.widgets[0][1].value()
-        y = self.widgets[1][1].value()
-        return struct.pack('<xxII', x, y)
-
-    @property
-    def dynamicDescription(self):
-        x, y = self.widgets[0][1].value(), self.widgets[1][1].value()
-        return f'at position (0x%08X, 0x%08X)' % (x, y)
-
-
-class PlayCharacterWinAnimationsCommand(Command):
-    """
-    Command which causes the characters to play their "win"
-    animations
-    """
-    name = 'Play Character Win Animations'
-    description = 'Causes the characters to play their "win" animations.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class BeginFireworksCommand(Command):
-    """
-    Command which begins the fireworks animation
-    """
-    name = 'Begin Fireworks'
-    description = 'Starts the fireworks firing.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class EndFireworksCommand(Command):
-    """
-    Command which ends the fireworks animation
-    """
-    name = 'End Fireworks'
-    description = 'Stops the fireworks.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class ShowDarknessOverlayCommand(Command):
-    """
-    Command which causes the wipe at the end
-    """
-    name = 'Show Darkness Overlay'
-    description = 'Causes the wipe behind "The End" to occur.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class ShowTheEndCommand(Command):
-    """
-    Command which causes "The End" to be displayed
-    """
-    name = 'Show "The End"'
-    description = 'Causes "The End" to be displayed on-screen.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class HideTheEndCommand(Command):
-    """
-    Command which hides "The End"
-    """
-    name = 'Hide "The End"'
-    description = 'Causes "The End" to be hidden.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class ShowCoinCounterCommand(Command):
-    """
-    Command which shows the coin counter
-    """
-    name = 'Show Coin Counter'
-    description = 'Displays the coin counter.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class HideCoinCounterCommand(Command):
-    """
-    Command which hides the coin counter
-    """
-    name = 'Hide Coin Counter'
-    description = 'Hides the coin counter.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-class LoadFileCommand(Command):
-    """
-    Command which indicates that a file should be loaded
-    """
-    name = 'Load File'
-    description = 'Causes a file to be loaded.'
-
-    def __init__(self):
-        super().__init__()
-
-        self.widgets = []
-
-        W = QtWidgets.QSpinBox()
-        W.setMaximum(0xFFFF)
-        self.widgets.append(('File ID:', W))
-
-        W = QtWidgets.QComboBox()
-        W.addItems(NEWER_DS_FILE_SLOTS)
-        self.widgets.append(('Slot:', W))
-
-        self.generateLayout()
-
-    @classmethod
-    def fromData(cls, data):
-        cmd = cls()
-        a, b = struct.unpack_from('<HB', data)
-        cmd.widgets[0][1].setValue(a)
-        cmd.widgets[1][1].setCurrentIndex(b)
-        return cmd
-
-    def asData(self):
-        return struct.pack('<HB',
-            self.widgets[0][1].value(),
-            self.widgets[1][1].currentIndex())
-
-    @property
-    def dynamicDescription(self):
-        return f'to the "{self.widgets[1][1].currentText()}" slot'
-
-
-class UnloadFileCommand(Command):
-    """
-    Command which indicates that a file should be unloaded
-    """
-    name = 'Unload File'
-    description = 'Causes a file to be unloaded.'
-
-    def __init__(self):
-        super().__init__()
-
-        W = QtWidgets.QComboBox()
-        W.addItems(NEWER_DS_FILE_SLOTS)
-        self.widgets = [('Slot:', W)]
-        self.generateLayout()
-
-    @classmethod
-    def fromData(cls, data):
-        cmd = cls()
-        cmd.widgets[0][1].setCurrentIndex(data[0])
-        return cmd
-
-    def asData(self):
-        return [self.widgets[0][1].currentIndex()]
-
-    @property
-    def dynamicDescription(self):
-        return f'from the "{self.widgets[0][1].currentText()}" slot'
-
-
-class ExitStageCommand(Command):
-    """
-    Command which causes the stage to be exited
-    """
-    name = 'Exit Stage'
-    description = 'Causes the stage to be exited.'
-
-    def __init__(self):
-        super().__init__()
-        self.generateLayout()
-
-
-CommandsById = {
-    1:  DelayCommand,
-    2:  SwitchSceneCommand,
-    3:  FadeLogoInCommand,
-    4:  DropLogoCommand,
-    5:  FadeToBlackCommand,
-    6:  FadeFromBlackCommand,
-    7:  FadeToWhiteCommand,
-    8:  FadeFromWhiteCommand,
-    9:  ShowTextCommand,
-    10: HideTextCommand,
-    11: SetHeaderTextCommand,
-    12: ShowHeaderTextCommand,
-    13: HideHeaderTextCommand,
-    14: SetBodyTextCommand,
-    15: ShowBodyTextCommand,
-    16: HideBodyTextCommand,
-    17: DisablePlayerControlCommand,
-    18: EnablePlayerControlCommand,
-    19: EnableLowGravityPhysicsCommand,
-    20: DisableLowGravityPhysicsCommand,
-    21: UnlockInactiveCharacterCommand,
-    22: SetPlayersFacingScreenCommand,
-    23: LoadAndPlacePeachCommand,
-    24: PlayCharacterWinAnimationsCommand,
-    25: BeginFireworksCommand,
-    26: EndFireworksCommand,
-    27: ShowDarknessOverlayCommand,
-    28: ShowTheEndCommand,
-    29: HideTheEndCommand,
-    30: ShowCoinCounterCommand,
-    31: HideCoinCounterCommand,
-    32: LoadFileCommand,
-    33: UnloadFileCommand,
-    34: ExitStageCommand,
-    }
-
-
-def CommandFromData(data):
-    """
-    Return a command from data
-    """
-    return CommandsById[data[0]].fromData(data[1:])
-
-
-class CreditsSequenceBin():
-    """
-    Class which represents "2848 Credits_Sequence.bin"
-    """
-    def __init__(self, data=None):
-        self.Commands = []
-        if data is not None: self._initFromData(data)
-
-    def _initFromData(self, data):
-        """
-        Initialise the CreditsSequenceBin from raw file data
-        """
-
-        # No headers. Iterate over the data until we've reached the EOF
-        # command
-        commands = []
-        i = 0
-        while True:
-            # Get the command data
-            datalen = data[i] - 1
-            i += 1
-            comdata = data[i:i+datalen]
-            i += datalen
-
-            if comdata[0] == 0: break
-
-            # Make a command
-            commands.append(CommandFromData(comdata))
-
-        # Assign to self.commands
-        self.Commands = commands
-
-
-    def save(self):
-        """
-        Convert self.commands to bytes that can be saved
-        """
-        data = []
-
-        coms = list(self.Commands)
-
-        for com in coms:
-            comdata = list(com.asData())
-            while (len(comdata) + 2) % 4:
-                comdata.append(0)
-            data.append(len(comdata) + 2)
-
-            for id, comType in CommandsById.items():
-                if isinstance(com, comType):
-                    data.append(id)
-                    break
-            else:
-                raise ValueError(f'Could not find ID of command: {com}')
-
-            for itm in comdata:
-                if not isinstance(itm, int):
-                    raise RuntimeError(f'{itm} is not an integer')
-                data.append(itm)
+from PyQt5 import QtCore, QtGui, QtWidgets; Qt = QtCore.Qt
 
-        data.extend([2, 0]) # null command
-        return bytes(data)
 
 
 
@@ -847,53 +80,416 @@ class HexSpinBox(QtWidgets.QDoubleSpinBox):
         return int(super().value(*args, **kwargs))
 
 
-class CreditsViewer(QtWidgets.QWidget):
+class CommandListModel(QtCore.QAbstractListModel, SequenceListener):
     """
-    Widget that allows you to view credits data
+    Model that exposes the commands of a CreditsSequenceBin to a list
+    view. Row text and tooltips are generated on demand, so only the
+    rows the view actually displays are ever rendered.
+
+    All changes should be made through the file's editing methods; the
+    model listens to them and notifies its views.
+
+    The model can also show just some of the commands (see
+    setFilter()). Rows are then different from command indices, and
+    commandIndex() and rowOfCommand() convert between them.
     """
+    MIME_TYPE = 'application/x-newer-ds-credits-editor-rows'
+
+    # Emitted when rows are dropped, with the indices of their commands
+    # and the index to move them to. The model doesn't move them
+    # itself, so that the viewer can make it a single undo step.
+    commandsDropped = QtCore.pyqtSignal(list, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.file = None
+        self.timeline = None
+        self.linter = None
+        self.rows = None # command index of each row, if filtered
+        self._filterFunction = None
+
+        style = QtWidgets.QApplication.style()
+        self._issueIcons = (
+            style.standardIcon(QtWidgets.QStyle.SP_MessageBoxWarning),
+            style.standardIcon(QtWidgets.QStyle.SP_MessageBoxCritical))
+
+        # Rows whose text needs to be refreshed. These are collected
+        # and flushed together once control returns to the event loop,
+        # so a burst of edits only re-renders the affected rows, once.
+        self._dirtyRows = set()
+        self._timesDirtyFrom = None
+        self._flushTimer = QtCore.QTimer(self)
+        self._flushTimer.setSingleShot(True)
+        self._flushTimer.setInterval(0)
+        self._flushTimer.timeout.connect(self.flushDirtyRows)
+
+    def setFile(self, file, linter=None):
+        """
+        Change the file to expose. linter can be a Linter that's already
+        following the file (built by SequenceLoader, for example).
+        """
+        self.beginResetModel()
+        if self.file is not None:
+            self.file.removeListener(self)
+            self.timeline.detach()
+            self.linter.detach()
+
+        # The timeline and linter have to be added first, so that
+        # they're up to date by the time the views ask for start times
+        # and issues
+        self.file = file
+        self.timeline = Timeline(file)
+        self.linter = linter if linter is not None else Linter(file)
+        self.linter.changedCallback = self._issuesChanged
+        file.addListener(self)
+        self._filterFunction = self.rows = None
+        self._dirtyRows.clear()
+        self._timesDirtyFrom = None
+        self.endResetModel()
+
+    def setFilter(self, function):
+        """
+        Only show some of the commands. function() returns the sorted
+        indices of the commands to show, and is called again whenever
+        commands are added, removed or moved. Pass None to show every
+        command again.
+        """
+        self.beginResetModel()
+        self._filterFunction = function
+        self.rows = function() if function is not None else None
+        self._dirtyRows.clear()
+        self._timesDirtyFrom = None
+        self.endResetModel()
+
+    def isFiltered(self):
+        return self.rows is not None
 
-    class DNDPicker(QtWidgets.QListWidget):
+    def commandIndex(self, row):
         """
-        A list widget that emits a signal when an item has been moved
+        Return the index in the file of the command at a given row
         """
-        itemDropped = QtCore.pyqtSignal()
+        return row if self.rows is None else self.rows[row]
 
-        def dropEvent(self, event):
-            super().dropEvent(event)
-            self.itemDropped.emit()
+    def rowOfCommand(self, index):
+        """
+        Return the row showing the command at a given index in the
+        file, or -1 if it's filtered out
+        """
+        if self.rows is None: return index
+        row = bisect.bisect_left(self.rows, index)
+        return row if row < len(self.rows) and self.rows[row] == index else -1
+
+    def commandAt(self, row):
+        """
+        Return the command at a given row
+        """
+        return self.file.Commands[self.commandIndex(row)]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid() or self.file is None: return 0
+        return len(self.file.Commands if self.rows is None else self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            i = self.commandIndex(index.row())
+            com = self.file.Commands[i]
+            text = f'{formatFrames(self.timeline.startFrame(i))}   {com.name}'
+            if com.dynamicDescription:
+                text += f' ({com.dynamicDescription})'
+            return text
+
+        elif role == Qt.ToolTipRole:
+            i = self.commandIndex(index.row())
+            com = self.file.Commands[i]
+            text = f'<b>{com.name}:</b><br>{com.description}'
+            for issue in self.linter.issuesAt(i):
+                text += f'<br><b>{issue.severity.capitalize()}:</b> {issue.message}'
+            return text
+
+        elif role == Qt.DecorationRole:
+            issues = self.linter.issuesAt(self.commandIndex(index.row()))
+            if issues:
+                error = any(issue.severity == 'error' for issue in issues)
+                return self._issueIcons[error]
+
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        if self.rows is not None: # moving rows wouldn't make sense
+            return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemIsDragEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [self.MIME_TYPE]
+
+    def mimeData(self, indexes):
+        rows = sorted(index.row() for index in indexes)
+        mime = QtCore.QMimeData()
+        mime.setData(self.MIME_TYPE, ','.join(str(row) for row in rows).encode('ascii'))
+        return mime
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if action != Qt.MoveAction or not data.hasFormat(self.MIME_TYPE) or self.rows is not None:
+            return False
+
+        rows = [int(r) for r in bytes(data.data(self.MIME_TYPE)).decode('ascii').split(',')]
+        if row == -1:
+            row = parent.row() if parent.isValid() else self.rowCount()
+
+        self.commandsDropped.emit(rows, row) # rows are command indices, since it's not filtered
+
+        # The move has already been done, so return False to prevent
+        # the view from removing the source rows afterward
+        return False
+
+    def moveRows(self, sourceParent, sourceRow, count, destinationParent, destinationChild):
+        if sourceParent.isValid() or destinationParent.isValid() or self.rows is not None: return False
+        return self.file.moveCommands(sourceRow, count, destinationChild)
+
+    def insertCommand(self, index, com):
+        """
+        Insert a command at the given index in the file
+        """
+        self.file.insertCommands(index, [com])
+
+    def removeCommand(self, index):
+        """
+        Remove the command at the given index in the file
+        """
+        self.file.removeCommands(index)
+
+    # SequenceListener methods: pass the file's changes on to the views.
+    # Pending dirty rows would be stale after any of these, so they're
+    # flushed first. While filtered, the filter is run again instead.
+
+    def commandsAboutToBeInserted(self, index, count):
+        self.flushDirtyRows()
+        if self.rows is not None:
+            self.beginResetModel()
+        else:
+            self.beginInsertRows(QtCore.QModelIndex(), index, index + count - 1)
+
+    def commandsInserted(self, index, commands):
+        if self.rows is not None:
+            self._refilter()
+        else:
+            self.endInsertRows()
+
+    def commandsAboutToBeRemoved(self, index, count):
+        self.flushDirtyRows()
+        if self.rows is not None:
+            self.beginResetModel()
+        else:
+            self.beginRemoveRows(QtCore.QModelIndex(), index, index + count - 1)
+
+    def commandsRemoved(self, index, commands):
+        if self.rows is not None:
+            self._refilter()
+        else:
+            self.endRemoveRows()
+
+    def commandsAboutToBeMoved(self, index, count, destination):
+        self.flushDirtyRows()
+        if self.rows is not None:
+            self.beginResetModel()
+        else:
+            self.beginMoveRows(QtCore.QModelIndex(), index, index + count - 1, QtCore.QModelIndex(), destination)
+
+    def commandsMoved(self, index, count, destination):
+        if self.rows is not None:
+            self._refilter()
+        else:
+            self.endMoveRows()
+
+    def commandsAboutToBeReset(self):
+        self.beginResetModel()
+
+    def commandsReset(self):
+        if self.rows is not None:
+            self._refilter()
+        else:
+            self._dirtyRows.clear()
+            self._timesDirtyFrom = None
+            self.endResetModel()
+
+    def _issuesChanged(self, indices):
+        for i in indices:
+            row = self.rowOfCommand(i)
+            if row != -1:
+                self.markDirty(row)
+
+    def _refilter(self):
+        self.rows = self._filterFunction()
+        self._dirtyRows.clear()
+        self._timesDirtyFrom = None
+        self.endResetModel()
+
+    def commandChanged(self, index, field, oldValue, newValue):
+        # Rows aren't filtered again here, so that the command being
+        # edited doesn't disappear
+        row = self.rowOfCommand(index)
+        if row != -1:
+            self.markDirty(row)
+        if field == 'time' and type(self.file.Commands[index]) is DelayCommand:
+            # Every later command now starts at a different time
+            nextRow = index + 1 if self.rows is None else bisect.bisect_right(self.rows, index)
+            if self._timesDirtyFrom is None or nextRow < self._timesDirtyFrom:
+                self._timesDirtyFrom = nextRow
+                self._flushTimer.start()
+
+    def commandsChanged(self, indices, field, oldValues, newValues):
+        # Many commands changed at once (a bulk edit), so refresh every
+        # row from the first one on with one signal, instead of marking
+        # each row
+        first = min(indices)
+        row = first if self.rows is None else bisect.bisect_left(self.rows, first)
+        if self._timesDirtyFrom is None or row < self._timesDirtyFrom:
+            self._timesDirtyFrom = row
+            self._flushTimer.start()
+
+    def markDirty(self, row):
+        """
+        Mark a row as needing its text to be refreshed
+        """
+        self._dirtyRows.add(row)
+        self._flushTimer.start()
+
+    def flushDirtyRows(self):
+        """
+        Notify views about all rows marked as dirty since the last
+        flush
+        """
+        n = self.rowCount()
+        rows, self._dirtyRows = self._dirtyRows, set()
+        timesFrom, self._timesDirtyFrom = self._timesDirtyFrom, None
+        for row in rows:
+            if row < n and (timesFrom is None or row < timesFrom):
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.DecorationRole])
+
+        # The views only re-render the rows in this range that they're
+        # actually showing
+        if timesFrom is not None and timesFrom < n:
+            self.dataChanged.emit(self.index(timesFrom), self.index(n - 1), [Qt.DisplayRole, Qt.DecorationRole])
+
+    def refreshAll(self):
+        """
+        Notify views that the text of every row may have changed
+        """
+        self._dirtyRows.clear()
+        self._timesDirtyFrom = None
+        n = self.rowCount()
+        if n:
+            self.dataChanged.emit(self.index(0), self.index(n - 1))
+
+
+class CommandListView(QtWidgets.QTableView):
+    """
+    A single-column table view, set up to look like a list view. This
+    is used instead of QListView because QListView lays out every row
+    whenever the model is reset, while a table with fixed row heights
+    only ever looks at the rows that are visible.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.horizontalHeader().hide()
+        self.horizontalHeader().setStretchLastSection(True)
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        self.verticalHeader().setMinimumSectionSize(1)
+        self.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 4)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setSelectionBehavior(self.SelectRows)
+        self.setSelectionMode(self.ExtendedSelection)
+        self.setDragDropOverwriteMode(False)
+
+
+class CreditsViewer(QtWidgets.QWidget):
+    """
+    Widget that allows you to view credits data
+    """
+    undoStackChanged = QtCore.pyqtSignal()
 
     def __init__(self):
         super().__init__()
         self.file = None
+        self.fp = None # file path, if it has been saved or opened
+        self.journal = None # EditJournal, managed by MainWindow
+        self.undoStack = None
+        self.searchIndex = None
 
         # Create the command picker widgets
         PickerBox = QtWidgets.QGroupBox('Commands')
-        self.picker = self.DNDPicker(self)
+        self.filterEdit = QtWidgets.QLineEdit()
+        self.filterEdit.setPlaceholderText('Filter (words, type:Name, field:value)')
+        self.filterEdit.setClearButtonEnabled(True)
+        self.model = CommandListModel(self)
+        self.picker = CommandListView(self)
+        self.picker.setModel(self.model)
         self.picker.setDragDropMode(self.picker.InternalMove)
-        self.picker.itemDropped.connect(self.handleDragDrop)
         self.picker.setMinimumWidth(384)
         self.ABtn = QtWidgets.QPushButton('Add')
         self.RBtn = QtWidgets.QPushButton('Remove')
+        self.timeEdit = QtWidgets.QLineEdit()
+        self.timeEdit.setPlaceholderText('m:ss.ff or frames')
+        self.timeEdit.setValidator(QtGui.QRegExpValidator(QtCore.QRegExp(r'(\d+:)?\d*(\.\d*)?'), self.timeEdit))
+        self.totalLabel = QtWidgets.QLabel()
+        self.issueBtn = QtWidgets.QPushButton()
+        self.issueBtn.setFlat(True)
 
         # Add some tooltips
         self.ABtn.setToolTip('<b>Add:</b><br>Adds a command after the currently selected command')
-        self.RBtn.setToolTip('<b>Remove:</b><br>Removes the currently selected command')
+        self.RBtn.setToolTip('<b>Remove:</b><br>Removes the selected commands')
+        self.timeEdit.setToolTip('<b>Go to time:</b><br>Selects the delay that\'s running at a given time (press Enter)')
+        self.filterToolTip = ('<b>Filter:</b><br>Only shows the commands that match everything typed here:<br>'
+            '<i>word</i>: text or a command type containing "word"<br>'
+            '<i>type:Name</i>: commands of a type, such as type:SetBodyText<br>'
+            '<i>field:value</i>: commands with a field set to a value, such as slot:"Body Font" or time:300')
+        self.filterEdit.setToolTip(self.filterToolTip)
+        self.issueBtn.setToolTip('<b>Problems:</b><br>Commands that may not work in-game are marked with an icon. Click to go to the next one.')
 
         # Connect them to handlers
-        self.picker.currentItemChanged.connect(self.handleComSel)
+        self.picker.selectionModel().currentChanged.connect(self.handleComSel)
+        self.picker.selectionModel().selectionChanged.connect(
+            lambda: self.RBtn.setEnabled(self.picker.selectionModel().hasSelection()))
+        self.model.commandsDropped.connect(self.handleDragDrop)
         self.ABtn.clicked.connect(self.handleAdd)
         self.RBtn.clicked.connect(self.handleRemove)
+        self.timeEdit.returnPressed.connect(self.handleGoToTime)
+        self.filterEdit.textChanged.connect(self.handleFilterChange)
+        self.issueBtn.clicked.connect(self.handleNextIssue)
+        for signal in (self.model.modelReset, self.model.rowsInserted, self.model.rowsRemoved, self.model.dataChanged):
+            signal.connect(self.updateTotalTime)
+            signal.connect(self.updateIssueCount)
 
         # Disable them for now
         self.picker.setEnabled(False)
         self.ABtn.setEnabled(False)
         self.RBtn.setEnabled(False)
+        self.timeEdit.setEnabled(False)
+        self.filterEdit.setEnabled(False)
+        self.issueBtn.setEnabled(False)
 
         # Set up the QGroupBox layout
+        TL = QtWidgets.QHBoxLayout()
+        TL.addWidget(QtWidgets.QLabel('Go to time:'))
+        TL.addWidget(self.timeEdit)
+        TL.addStretch(1)
+        TL.addWidget(self.issueBtn)
+        TL.addWidget(self.totalLabel)
+
         L = QtWidgets.QGridLayout()
-        L.addWidget(self.picker, 0, 0, 1, 2)
-        L.addWidget(self.ABtn, 1, 0)
-        L.addWidget(self.RBtn, 1, 1)
+        L.addWidget(self.filterEdit, 0, 0, 1, 2)
+        L.addWidget(self.picker, 1, 0, 1, 2)
+        L.addWidget(self.ABtn, 2, 0)
+        L.addWidget(self.RBtn, 2, 1)
+        L.addLayout(TL, 3, 0, 1, 2)
         PickerBox.setLayout(L)
 
         # Create the command editor
@@ -904,53 +500,53 @@ class CreditsViewer(QtWidgets.QWidget):
         L.addWidget(self.edit)
         self.ComBox.setLayout(L)
 
+        # Create the text preview
+        PreviewBox = QtWidgets.QGroupBox('Preview')
+        PreviewBox.setToolTip('<b>Preview:</b><br>The credits text as it looks after the selected command runs')
+        self.renderer = TextPreviewRenderer()
+        self.preview = QtWidgets.QLabel()
+        self.preview.setFixedSize(SCREEN_WIDTH, SCREEN_HEIGHT)
+        L = QtWidgets.QVBoxLayout()
+        L.addWidget(self.preview)
+        PreviewBox.setLayout(L)
+
         # Make the main layout
+        R = QtWidgets.QVBoxLayout()
+        R.addWidget(self.ComBox, 1)
+        R.addWidget(PreviewBox)
+
         L = QtWidgets.QHBoxLayout()
         L.addWidget(PickerBox)
-        L.addWidget(self.ComBox)
+        L.addLayout(R)
         self.setLayout(L)
 
-    # Ideally, we could just set the corresponding Command to each
-    # QListWidgetItem's UserRole data. And that worked in old versions
-    # of PyQt. Now, however, PyQt pickles the data upon starting a drag,
-    # and Commands can't be pickled because they have widgets in their
-    # attributes. Therefore, we have to maintain our own
-    # item <-> command map that works even if an item is pickled and
-    # unpickled. To do this, we set its UserRole data to a random UUID
-    # that matches an attribute of its corresponding command. Then we
-    # use that as the basis for associations between the two.
-
-    _itemCommandMap = None
-    def commandForItem(self, item):
-        if self._itemCommandMap is None:
-            self._itemCommandMap = {}
-        return self._itemCommandMap.get(item.data(Qt.UserRole))
-    def setCommandForItem(self, item, command):
-        if self._itemCommandMap is None:
-            self._itemCommandMap = {}
-        item.setData(Qt.UserRole, command.uuid)
-        self._itemCommandMap[command.uuid] = command
-
-    def setFile(self, file):
-        """
-        Change the file to view
+    @traced
+    def setFile(self, file, linter=None, searchIndex=None):
         """
+        Change the file to view. linter and searchIndex can be a Linter
+        and a SearchIndex that are already following the file, so that
+        they don't have to be built here.
+        """
+        if self.undoStack is not None:
+            self.undoStack.detach()
+            self.searchIndex.detach()
+
         self.file = file
-        self.picker.clear()
+        self.model.setFile(file, linter)
+        self.searchIndex = searchIndex if searchIndex is not None else SearchIndex(file)
+        self.undoStack = UndoStack(file)
+        self.undoStack.changedCallback = self.undoStackChanged.emit
+        self.undoStackChanged.emit()
         self.setComEdit(CommandEditor()) # clears it
 
         # Enable widgets
         self.picker.setEnabled(True)
         self.ABtn.setEnabled(True)
         self.RBtn.setEnabled(False)
-
-        # Add commands
-        for com in file.Commands:
-            item = QtWidgets.QListWidgetItem() # self.updateNames will add the name
-            self.setCommandForItem(item, com)
-            self.picker.addItem(item)
-
-        self.updateNames()
+        self.timeEdit.setEnabled(True)
+        self.filterEdit.setEnabled(True)
+        self.handleFilterChange(self.filterEdit.text())
+        self.updatePreview()
 
     def saveFile(self):
         """
@@ -958,59 +554,226 @@ class CreditsViewer(QtWidgets.QWidget):
         """
         return self.file.save() # self.file does this for us
 
+    @traced
     def updateNames(self):
         """
         Update item names in the command picker
         """
+        self.model.refreshAll()
+
+    @traced
+    def handleDragDrop(self, indices, destination):
+        """
+        Handle commands being dragged and dropped
+        """
+        self.undoStack.beginMacro()
+        try:
+            first = self.file.moveCommandsTo(indices, destination)
+        finally:
+            self.undoStack.endMacro()
+        self.selectCommandRuns([(first, len(set(indices)))])
 
-        # This is apparently the best way to iterate over all items in
-        # the list widget.
-        for item in self.picker.findItems('', Qt.MatchContains):
-            com = self.commandForItem(item)
+    def selectedCommands(self):
+        """
+        Return the sorted indices in the file of the selected commands
+        """
+        return sorted(self.model.commandIndex(index.row()) for index in self.picker.selectionModel().selectedRows())
 
-            # Pick text and tooltips
-            text = com.name
-            tooltip = f'<b>{com.name}:</b><br>{com.description}'
+    def selectCommandRuns(self, runs, current=None):
+        """
+        Select the commands in runs, a list of (start, count) as
+        returned by commandRuns(), and make the command at index
+        current (by default, the first one) the current one
+        """
+        selection = QtCore.QItemSelection()
+        for start, count in runs:
+            first, last = self.model.rowOfCommand(start), self.model.rowOfCommand(start + count - 1)
+            if first != -1 and last != -1:
+                selection.select(self.model.index(first), self.model.index(last))
+        if current is None and runs:
+            current = runs[0][0]
+        if current is not None:
+            self.selectCommand(current)
+        self.picker.selectionModel().select(selection, QtCore.QItemSelectionModel.ClearAndSelect)
+
+    def currentCommand(self):
+        """
+        Return the index in the file of the selected command, or -1
+        """
+        row = self.picker.currentIndex().row()
+        return self.model.commandIndex(row) if row != -1 else -1
 
-            if com.dynamicDescription:
-                text += f' ({com.dynamicDescription})'
+    def selectCommand(self, i, recreateEditor=False):
+        """
+        Select the command at an index in the file, if it's shown. If
+        recreateEditor, the command editor is recreated even if the
+        command was already selected, so that it shows new values.
+        """
+        row = self.model.rowOfCommand(min(i, len(self.file.Commands) - 1))
+        index = self.model.index(row) if row != -1 else QtCore.QModelIndex()
+        if index == self.picker.currentIndex():
+            if recreateEditor: self.handleComSel(index, index)
+        else:
+            self.picker.setCurrentIndex(index)
+        if index.isValid():
+            self.picker.scrollTo(index)
+
+    def handleFilterChange(self, text):
+        """
+        Handle the filter text changing
+        """
+        current = self.currentCommand()
+        try:
+            if text.strip():
+                self.searchIndex.query(text) # check that it's valid first
+                self.model.setFilter(lambda: self.searchIndex.query(text))
+            else:
+                self.model.setFilter(None)
+            self.filterEdit.setStyleSheet('')
+            self.filterEdit.setToolTip(self.filterToolTip)
+        except ValueError as e:
+            self.filterEdit.setStyleSheet('QLineEdit { color: red; }')
+            self.filterEdit.setToolTip(str(e))
+            return
+
+        self.picker.setDragDropMode(self.picker.NoDragDrop if self.model.isFiltered() else self.picker.InternalMove)
+        if current != -1:
+            self.selectCommand(current)
+
+    def handleReplace(self):
+        """
+        Handle the user choosing to replace text
+        """
+        dlg = ReplaceTextDlg()
+        if dlg.exec_() != dlg.Accepted or not dlg.find.text(): return
+
+        self.undoStack.beginMacro()
+        try:
+            changed = self.searchIndex.replaceText(
+                dlg.find.text(), dlg.replace.text(), dlg.caseSensitive.isChecked())
+        finally:
+            self.undoStack.endMacro()
 
-            # Set text
-            item.setText(text)
-            item.setToolTip(tooltip)
+        current = self.currentCommand()
+        if current in changed:
+            self.selectCommand(current, True)
+        QtWidgets.QMessageBox.information(self, 'Replace Text', f'Replaced text in {len(changed)} commands.')
 
-    def handleDragDrop(self):
+    def handleBulkEdit(self):
+        """
+        Handle the user choosing to change many commands at once
+        """
+        try:
+            import newer_ds_credits_arrays as arrays
+        except ImportError as e:
+            QtWidgets.QMessageBox.warning(self, 'Bulk Edit', f'Bulk editing needs NumPy, which couldn\'t be imported ({e}).')
+            return
+
+        selected = self.selectedCommands()
+        dlg = BulkEditDlg(len(selected), len(self.model.rows) if self.model.isFiltered() else None, len(self.file.Commands))
+        if dlg.exec_() != dlg.Accepted: return
+
+        if dlg.scopeSelected.isChecked():
+            indices = selected
+        elif dlg.scopeFiltered.isChecked():
+            indices = self.model.rows
+        else:
+            indices = range(len(self.file.Commands))
+
+        try:
+            page = dlg.tabs.currentIndex()
+            if page == 0:
+                changed = arrays.scaleDelays(self.file, indices, dlg.scale.value(), dlg.offset.value())
+            elif page == 1:
+                changed = arrays.remapField(self.file, indices, dlg.remapField.currentText(), dlg.remapTableValues())
+            else:
+                changed = arrays.fillField(self.file, indices, dlg.setField.currentText(), dlg.setFieldValue())
+        except ValueError as e:
+            QtWidgets.QMessageBox.warning(self, 'Bulk Edit', str(e))
+            return
+
+        current = self.currentCommand()
+        if current in changed:
+            self.selectCommand(current, True)
+        self.updatePreview()
+        QtWidgets.QMessageBox.information(self, 'Bulk Edit', f'Changed {len(changed)} commands.')
+
+    def handleComDatChange(self, values):
         """
-        Handle dragging and dropping
+        Handle changes to the current message data
+        """
+        # Only the command being edited can have changed. The model
+        # finds out which rows to refresh from the file.
+        i = self.currentCommand()
+        if i == -1: return
+        for field, value in values.items():
+            self.file.setField(i, field, value)
+        self.updatePreview()
+
+    def updatePreview(self):
         """
-        # First, update the file
-        newCommands = []
-        for item in self.picker.findItems('', Qt.MatchContains):
-            com = self.commandForItem(item)
-            newCommands.append(com)
-        self.file.Commands = newCommands
+        Show the text as it is after the selected command runs
+        """
+        i = self.currentCommand()
+        state = textStateAt(self.file.Commands, i + 1) if self.file is not None else INITIAL_TEXT_STATE
+        self.preview.setPixmap(QtGui.QPixmap.fromImage(self.renderer.render(state)))
 
-        # Then, update the names
-        self.updateNames()
+    def updateTotalTime(self):
+        """
+        Update the label showing the length of the whole sequence
+        """
+        frames = self.model.timeline.totalFrames()
+        self.totalLabel.setText(f'Total: {formatFrames(frames)} ({frames} frames)')
 
-    def handleComDatChange(self):
+    def updateIssueCount(self):
         """
-        Handle changes to the current message data
+        Update the button showing how many commands have problems
         """
-        self.updateNames()
+        count = self.model.linter.issueCount()
+        self.issueBtn.setText(f'{count} problem' + ('' if count == 1 else 's'))
+        self.issueBtn.setEnabled(count > 0)
 
-    def handleComSel(self):
+    def handleNextIssue(self):
+        """
+        Select the next command with a problem
+        """
+        if self.file is None: return
+        i = self.model.linter.nextIssue(self.currentCommand())
+        if i is None: return
+        if self.model.rowOfCommand(i) == -1:
+            self.filterEdit.clear() # it's filtered out
+        self.selectCommand(i)
+
+    def handleGoToTime(self):
+        """
+        Handle the user entering a time to go to
+        """
+        try:
+            frame = parseFrames(self.timeEdit.text())
+        except ValueError:
+            QtWidgets.QApplication.beep()
+            return
+
+        # Past the end, just go to the last command
+        i = min(self.model.timeline.commandAtFrame(frame), len(self.file.Commands) - 1)
+        if i == -1: return
+        if self.model.rowOfCommand(i) == -1:
+            self.filterEdit.clear() # it's filtered out
+        index = self.model.index(self.model.rowOfCommand(i))
+        self.picker.scrollTo(index, self.picker.PositionAtCenter)
+        self.picker.setCurrentIndex(index)
+
+    @traced
+    def handleComSel(self, current, previous):
         self.setComEdit(CommandEditor()) # clears it
 
-        # Get the current item (it's None if nothing's selected)
-        currentItem = self.picker.currentItem()
-
-        # Update the Remove btn
-        self.RBtn.setEnabled(currentItem is not None)
+        # Update the Remove btn and the preview
+        self.RBtn.setEnabled(current.isValid())
+        self.updatePreview()
 
         # Get the command
-        if currentItem is None: return
-        com = self.commandForItem(currentItem)
+        if not current.isValid(): return
+        com = self.model.commandAt(current.row())
 
         # Set up the command editor
         e = CommandEditor(com)
@@ -1024,35 +787,121 @@ class CreditsViewer(QtWidgets.QWidget):
         if comT is None: return
         com = comT()
 
-        # Add it to self.file and self.picker
-        self.file.Commands.append(com)
-        item = QtWidgets.QListWidgetItem()
-        self.setCommandForItem(item, com)
-        self.picker.addItem(item)
-        self.picker.scrollToItem(item)
-        item.setSelected(True)
-
-        self.updateNames()
+        # Add it to the end of the file
+        i = len(self.file.Commands)
+        self.model.insertCommand(i, com)
+        self.selectCommand(i)
 
     def handleRemove(self):
         """
         Handle the user clicking Remove
         """
-        item = self.picker.currentItem()
-        com = self.commandForItem(item)
+        runs = commandRuns(self.selectedCommands())
+        if not runs: return
 
-        # Remove it from file and the picker
-        self.file.Commands.remove(com)
-        self.picker.takeItem(self.picker.row(item))
+        # Remove them from the file, from the end backward so that the
+        # indices of the rest stay the same
+        self.undoStack.beginMacro()
+        try:
+            for start, count in reversed(runs):
+                self.file.removeCommands(start, count)
+        finally:
+            self.undoStack.endMacro()
 
         # Clear the selection
         self.setComEdit(CommandEditor())
         self.picker.clearSelection()
-        self.picker.setCurrentItem(None)
+        self.picker.setCurrentIndex(QtCore.QModelIndex())
         self.RBtn.setEnabled(False)
 
-        self.updateNames()
+    def handleCopy(self):
+        """
+        Copy the selected commands to the clipboard, as script lines
+        (see formatScriptCommand())
+        """
+        indices = self.selectedCommands()
+        if not indices: return False
+        text = ''.join(formatScriptCommand(self.file.Commands[i]) + '\n' for i in indices)
+        QtWidgets.QApplication.clipboard().setText(text)
+        return True
+
+    def handleCut(self):
+        """
+        Copy the selected commands to the clipboard, and remove them
+        """
+        if self.handleCopy():
+            self.handleRemove()
+
+    def handlePaste(self):
+        """
+        Insert the commands on the clipboard after the current command
+        (or at the end, if there isn't one), and select them
+        """
+        try:
+            commands = compileScript(QtWidgets.QApplication.clipboard().text())[0].Commands
+        except ScriptError:
+            QtWidgets.QApplication.beep()
+            return
+        if not commands: return
+
+        current = self.currentCommand()
+        i = current + 1 if current != -1 else len(self.file.Commands)
+        self.undoStack.beginMacro()
+        try:
+            self.file.insertCommands(i, commands)
+        finally:
+            self.undoStack.endMacro()
+        self.selectCommandRuns([(i, len(commands))])
+
+    def moveSelection(self, offset):
+        """
+        Move each run of selected commands up (offset -1) or down
+        (offset 1) by one command. This only moves the command next to
+        each run to its other side, so it takes time proportional to
+        the number of commands selected.
+        """
+        runs = commandRuns(self.selectedCommands())
+        if not runs or self.model.isFiltered(): return
+        if (offset < 0 and runs[0][0] == 0) or (offset > 0 and sum(runs[-1]) == len(self.file.Commands)):
+            QtWidgets.QApplication.beep()
+            return
+
+        current = self.currentCommand()
+        self.undoStack.beginMacro()
+        try:
+            for start, count in (runs if offset < 0 else reversed(runs)):
+                if offset < 0:
+                    self.file.moveCommands(start - 1, 1, start + count)
+                else:
+                    self.file.moveCommands(start + count, 1, start)
+        finally:
+            self.undoStack.endMacro()
+        self.selectCommandRuns([(start + offset, count) for start, count in runs],
+            current + offset if current != -1 else None)
+
+    def undo(self):
+        """
+        Undo the last change, and select the command it affected
+        """
+        if self.undoStack is not None:
+            self.selectChangedCommand(self.undoStack.undo())
+
+    def redo(self):
+        """
+        Redo the last undone change, and select the command it affected
+        """
+        if self.undoStack is not None:
+            self.selectChangedCommand(self.undoStack.redo())
+
+    def selectChangedCommand(self, i):
+        """
+        Select a command after it was changed by something other than
+        the command editor, so that the editor shows its new values
+        """
+        if i is not None:
+            self.selectCommand(i, True)
 
+    @traced
     def setComEdit(self, e):
         """
         Change the current CommandEditor
@@ -1073,30 +922,30 @@ class CommandEditor(QtWidgets.QWidget):
     """
     Widget that allows you to edit a command
     """
-    dataChanged = QtCore.pyqtSignal()
+    dataChanged = QtCore.pyqtSignal(dict)
 
     def __init__(self, com=None):
         super().__init__()
         self.com = Command() if com is None else com
 
-        # Set the layout
-        self.setLayout(self.com.layout)
+        # Create the widgets and the layout
+        create, self.readValues = getCommandWidgetFunctions(type(self.com))
+        self.widgets = create(self.com)
+        self.setLayout(getCommandLayout(self.widgets))
         self.setMinimumWidth(384)
 
         # Connect each widget to the handler
-        for i in range(self.com.layout.count()):
-            w = self.com.layout.itemAt(i).widget()
-
-            connectors = {
-                QtWidgets.QCheckBox: 'stateChanged',
-                QtWidgets.QComboBox: 'currentIndexChanged',
-                QtWidgets.QDoubleSpinBox: 'valueChanged',
-                QtWidgets.QLineEdit: 'textEdited',
-                QtWidgets.QPlainTextEdit: 'textChanged',
-                QtWidgets.QSpinBox: 'valueChanged',
-                }
-            for type, name in connectors.items():
-                if isinstance(w, type):
+        connectors = {
+            QtWidgets.QCheckBox: 'stateChanged',
+            QtWidgets.QComboBox: 'currentIndexChanged',
+            QtWidgets.QDoubleSpinBox: 'valueChanged',
+            QtWidgets.QLineEdit: 'textEdited',
+            QtWidgets.QPlainTextEdit: 'textChanged',
+            QtWidgets.QSpinBox: 'valueChanged',
+            }
+        for _, w in self.widgets:
+            for widgetType, name in connectors.items():
+                if isinstance(w, widgetType):
                     getattr(w, name).connect(self.handleDataChanged)
 
 
@@ -1105,13 +954,45 @@ class CommandEditor(QtWidgets.QWidget):
         Prepare to be deleted
         """
         self.hide()
+        self.deleteLater()
 
 
     def handleDataChanged(self):
         """
-        Handle data changes
+        Handle data changes by emitting the values of all of the
+        command's fields, as {field: value}. The command itself is
+        left alone; applying them is up to whoever's listening.
         """
-        self.dataChanged.emit()
+        self.dataChanged.emit(self.readValues([w for _, w in self.widgets]))
+
+
+def getCommandLayout(widgets):
+    """
+    Return a layout for a list of (label, widget) pairs
+    """
+    if not widgets: return getNullLayout()
+
+    L = QtWidgets.QFormLayout()
+    for name, W in widgets:
+        if name is None:
+            L.addRow(W)
+        else:
+            L.addRow(name, W)
+    return L
+
+
+def createFileSlotComboBox(slot):
+    """
+    Return a combobox for choosing a file slot, with each item's data
+    set to its slot number
+    """
+    W = QtWidgets.QComboBox()
+    for i, name in enumerate(NEWER_DS_FILE_SLOTS):
+        W.addItem(name, i)
+    if W.findData(slot) == -1:
+        W.addItem(fileSlotName(slot), slot)
+    W.setCurrentIndex(W.findData(slot))
+    return W
 
 
 def getNullLayout():
@@ -1136,6 +1017,144 @@ def getUserPickedCommand():
     return dlg.combo.itemData(dlg.combo.currentIndex())
 
 
+class ReplaceTextDlg(QtWidgets.QDialog):
+    """
+    Dialog that asks what text to replace, and with what
+    """
+    def __init__(self):
+        super().__init__()
+        self.setWindowTitle('Replace Text')
+
+        self.find = QtWidgets.QLineEdit()
+        self.replace = QtWidgets.QLineEdit()
+        self.caseSensitive = QtWidgets.QCheckBox('Match case')
+
+        # Make a buttonbox
+        buttonBox = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        buttonBox.button(QtWidgets.QDialogButtonBox.Ok).setText('Replace All')
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+
+        # Add a layout
+        L = QtWidgets.QFormLayout()
+        L.addRow('Find:', self.find)
+        L.addRow('Replace with:', self.replace)
+        L.addRow(self.caseSensitive)
+        L.addRow(buttonBox)
+        self.setLayout(L)
+
+
+class BulkEditDlg(QtWidgets.QDialog):
+    """
+    Dialog that asks which commands to change, and how: retiming
+    delays, remapping IDs through a table, or setting a field
+    """
+    def __init__(self, selectedCount, filteredCount, totalCount):
+        super().__init__()
+        self.setWindowTitle('Bulk Edit')
+
+        # Which commands
+        self.scopeSelected = QtWidgets.QRadioButton(f'Selected commands ({selectedCount})')
+        self.scopeFiltered = QtWidgets.QRadioButton(f'Commands shown by the filter ({filteredCount or 0})')
+        self.scopeAll = QtWidgets.QRadioButton(f'All commands ({totalCount})')
+        self.scopeSelected.setEnabled(selectedCount > 0)
+        self.scopeFiltered.setEnabled(filteredCount is not None)
+        (self.scopeSelected if selectedCount > 1 else self.scopeFiltered if filteredCount is not None else self.scopeAll).setChecked(True)
+
+        # Unknown commands are left out, since their IDs and data can't
+        # be edited
+        intFields = sorted({f for comType in CommandsById.values()
+            for f, maximum in CommandFieldLimits[comType].items() if maximum is not None})
+        allFields = sorted({f for comType in CommandsById.values() for f in CommandFields[comType]})
+
+        # Retime delays
+        self.scale = QtWidgets.QDoubleSpinBox()
+        self.scale.setRange(0, 100)
+        self.scale.setDecimals(4)
+        self.scale.setValue(1)
+        self.offset = QtWidgets.QSpinBox()
+        self.offset.setRange(-0xFFFF, 0xFFFF)
+        self.offset.setSuffix(' frames')
+        retimePage = QtWidgets.QWidget()
+        L = QtWidgets.QFormLayout(retimePage)
+        L.addRow('Multiply by:', self.scale)
+        L.addRow('Then add:', self.offset)
+
+        # Remap IDs
+        self.remapField = QtWidgets.QComboBox()
+        self.remapField.addItems(intFields)
+        self.remapField.setCurrentText('areaId')
+        self.remapTable = QtWidgets.QPlainTextEdit()
+        self.remapTable.setPlaceholderText('old=new, one per line or separated by commas\n1=5\n2=6')
+        remapPage = QtWidgets.QWidget()
+        L = QtWidgets.QFormLayout(remapPage)
+        L.addRow('Field:', self.remapField)
+        L.addRow('Table:', self.remapTable)
+
+        # Set a field
+        self.setField = QtWidgets.QComboBox()
+        self.setField.addItems(allFields)
+        self.setValue = QtWidgets.QLineEdit()
+        self.setValue.setPlaceholderText('a number, true/false, or text')
+        setPage = QtWidgets.QWidget()
+        L = QtWidgets.QFormLayout(setPage)
+        L.addRow('Field:', self.setField)
+        L.addRow('Value:', self.setValue)
+
+        self.tabs = QtWidgets.QTabWidget()
+        self.tabs.addTab(retimePage, 'Retime Delays')
+        self.tabs.addTab(remapPage, 'Remap IDs')
+        self.tabs.addTab(setPage, 'Set Field')
+
+        # Make a buttonbox
+        buttonBox = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        buttonBox.button(QtWidgets.QDialogButtonBox.Ok).setText('Apply')
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+
+        # Add a layout
+        L = QtWidgets.QVBoxLayout()
+        L.addWidget(self.scopeSelected)
+        L.addWidget(self.scopeFiltered)
+        L.addWidget(self.scopeAll)
+        L.addWidget(self.tabs)
+        L.addWidget(buttonBox)
+        self.setLayout(L)
+
+    def remapTableValues(self):
+        """
+        Return the remap table as {old: new}. Raises ValueError if it
+        can't be parsed.
+        """
+        table = {}
+        for entry in re.split(r'[,;\n]', self.remapTable.toPlainText()):
+            if not entry.strip(): continue
+            m = re.fullmatch(r'\s*(\w+)\s*(?:=|->|:)\s*(\w+)\s*', entry)
+            try:
+                table[int(m.group(1), 0)] = int(m.group(2), 0)
+            except (AttributeError, ValueError):
+                raise ValueError(f'"{entry.strip()}" isn\'t "old=new"') from None
+        return table
+
+    def setFieldValue(self):
+        """
+        Return the value to set the field to, as the right type for
+        that field. Raises ValueError if it's not valid.
+        """
+        field, text = self.setField.currentText(), self.setValue.text()
+        for limits in CommandFieldLimits.values():
+            if field in limits:
+                if limits[field] is None:
+                    if text.lower() not in ('true', 'false'):
+                        raise ValueError(f'"{field}" must be true or false')
+                    return text.lower() == 'true'
+                try:
+                    return int(text, 0)
+                except ValueError:
+                    raise ValueError(f'"{field}" must be an integer') from None
+        return text
+
+
 class CommandPickDlg(QtWidgets.QDialog):
     """
     Dialog that lets the user pick a command type
@@ -1166,6 +1185,432 @@ class CommandPickDlg(QtWidgets.QDialog):
         self.setLayout(L)
 
 
+
+################################################################
+################################################################
+################################################################
+####################### Command Widgets ########################
+
+
+# Each command type's editor widgets are created by a "create"
+# function, which returns a list of (label, widget) pairs set to the
+# command's current values, and read back by a "read" function, which
+# returns the values the widgets are set to as {field: value}. Both
+# are put together from the command type's fieldSpecs the first time
+# it's edited, using a widget for each kind of field.
+
+
+def createSpinBoxWidget(maximum):
+    """
+    Return a function creating a spinbox for integers up to maximum
+    """
+    def create(value, label):
+        W = QtWidgets.QSpinBox()
+        W.setMaximum(maximum)
+        W.setValue(value)
+        return label, W
+    return create
+
+
+def createHexSpinBoxWidget(value, label):
+    # QSpinBox can't go past 0x7FFFFFFF
+    W = HexSpinBox(8)
+    W.setMaximum(0xFFFFFFFF)
+    W.setValue(value)
+    return label, W
+
+
+def createCheckBoxWidget(value, label):
+    W = QtWidgets.QCheckBox(label)
+    W.setChecked(value)
+    return None, W
+
+
+def createSlotWidget(value, label):
+    return label, createFileSlotComboBox(value)
+
+
+def createTextWidget(value, label):
+    X = QtWidgets.QPlainTextEdit()
+    X.setLineWrapMode(X.NoWrap)
+    X.setPlainText(value)
+    return label, X
+
+
+def createBlobWidget(value, label):
+    # Raw bytes are only shown, not edited
+    W = QtWidgets.QLineEdit(value.hex().upper())
+    W.setReadOnly(True)
+    return label, W
+
+
+def createCommandIdWidget(value, label):
+    # Changing an unknown command's ID could make it a known command
+    # (or the end of the sequence), so it's only shown
+    W = QtWidgets.QLineEdit(str(value))
+    W.setReadOnly(True)
+    return label, W
+
+
+# (create, read) functions for each kind of field (see FIELD_KINDS).
+# create(value, label) returns a (label, widget) pair, and
+# read(widget) returns the widget's value.
+FieldWidgetFunctions = {
+    'u8': (createSpinBoxWidget(0xFF), QtWidgets.QSpinBox.value),
+    'u16': (createSpinBoxWidget(0xFFFF), QtWidgets.QSpinBox.value),
+    'u32': (createHexSpinBoxWidget, HexSpinBox.value),
+    'bool': (createCheckBoxWidget, QtWidgets.QCheckBox.isChecked),
+    'slot': (createSlotWidget, QtWidgets.QComboBox.currentData),
+    'text': (createTextWidget, QtWidgets.QPlainTextEdit.toPlainText),
+    'blob': (createBlobWidget, lambda W: bytes.fromhex(W.text())),
+    'commandId': (createCommandIdWidget, lambda W: int(W.text())),
+    }
+
+
+# (create, read) functions for each command type that's been edited
+CommandWidgetFunctions = {}
+
+
+def getCommandWidgetFunctions(comType):
+    """
+    Return the (create, read) functions for a command type's editor
+    widgets, putting them together if this is the first time
+    """
+    functions = CommandWidgetFunctions.get(comType)
+    if functions is not None: return functions
+
+    fields = [(f.name, f.label) + FieldWidgetFunctions[f.kind] for f in comType.fieldSpecs]
+
+    def create(com):
+        return [createField(getattr(com, name), label) for name, label, createField, _ in fields]
+
+    def read(widgets):
+        return {name: readField(w) for (name, _, _, readField), w in zip(fields, widgets)}
+
+    functions = CommandWidgetFunctions[comType] = (create, read)
+    return functions
+
+
+################################################################
+################################################################
+################################################################
+######################### Text Preview #########################
+
+
+SCREEN_WIDTH = 256
+SCREEN_HEIGHT = 192
+
+
+class TextPreviewRenderer():
+    """
+    Draws the credits text as it looks on the DS, into QImages the
+    size of one screen. The DS font isn't available, so an unhinted
+    pixel font of about the same size stands in for it.
+
+    Each character is rasterized once per style and cached, and whole
+    text blocks (a header or body) are cached too, most recently used
+    first, so scrubbing back and forth or exporting many pages mostly
+    just composes cached images. Needs a QGuiApplication, but works
+    under the "offscreen" platform.
+    """
+    BACKGROUND = QtGui.QColor(16, 24, 48)
+    FADE_COLORS = {'black': QtGui.QColor(0, 0, 0), 'white': QtGui.QColor(255, 255, 255)}
+    STYLES = {
+        # style: (pixel size, bold, color)
+        'header': (12, True, QtGui.QColor(255, 224, 96)),
+        'body': (10, False, QtGui.QColor(255, 255, 255)),
+        }
+    HEADER_TOP = 24
+    BODY_TOP = 56
+    LINE_SPACING = 2
+    MAX_BLOCKS = 256
+
+    def __init__(self):
+        self._fonts = {}
+        self._glyphs = {}
+        self._blocks = collections.OrderedDict()
+
+    def _font(self, style):
+        """
+        Return (QFont, QFontMetrics, QColor) for a style
+        """
+        font = self._fonts.get(style)
+        if font is None:
+            size, bold, color = self.STYLES[style]
+            f = QtGui.QFont()
+            f.setPixelSize(size)
+            f.setBold(bold)
+            f.setStyleStrategy(QtGui.QFont.NoAntialias)
+            font = self._fonts[style] = (f, QtGui.QFontMetrics(f), color)
+        return font
+
+    def _glyph(self, style, char):
+        """
+        Return (QImage, advance) for one character in a style
+        """
+        key = (style, char)
+        glyph = self._glyphs.get(key)
+        if glyph is None:
+            font, metrics, color = self._font(style)
+            advance = metrics.horizontalAdvance(char)
+            image = QtGui.QImage(max(advance, 1), metrics.height(), QtGui.QImage.Format_ARGB32_Premultiplied)
+            image.fill(Qt.transparent)
+            p = QtGui.QPainter(image)
+            p.setFont(font)
+            p.setPen(color)
+            p.drawText(0, metrics.ascent(), char)
+            p.end()
+            glyph = self._glyphs[key] = (image, advance)
+        return glyph
+
+    def _block(self, style, text):
+        """
+        Return a QImage of a piece of text in a style, with each line
+        centered
+        """
+        key = (style, text)
+        blocks = self._blocks
+        image = blocks.get(key)
+        if image is not None:
+            blocks.move_to_end(key)
+            return image
+
+        lineHeight = self._font(style)[1].height() + self.LINE_SPACING
+        lines = [[self._glyph(style, c) for c in line] for line in text.split('\n')]
+        widths = [sum(advance for _, advance in line) for line in lines]
+        width = max(max(widths), 1)
+
+        image = QtGui.QImage(width, lineHeight * len(lines), QtGui.QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        p = QtGui.QPainter(image)
+        for y, (line, lineWidth) in enumerate(zip(lines, widths)):
+            x = (width - lineWidth) // 2
+            for glyph, advance in line:
+                p.drawImage(x, y * lineHeight, glyph)
+                x += advance
+        p.end()
+
+        blocks[key] = image
+        if len(blocks) > self.MAX_BLOCKS:
+            blocks.popitem(last=False)
+        return image
+
+    def render(self, state):
+        """
+        Return a QImage of the screen for a TextState
+        """
+        image = QtGui.QImage(SCREEN_WIDTH, SCREEN_HEIGHT, QtGui.QImage.Format_RGB32)
+        if state.fade is not None:
+            image.fill(self.FADE_COLORS[state.fade])
+            return image
+        image.fill(self.BACKGROUND)
+
+        p = QtGui.QPainter(image)
+        for style, text, shown, top in (
+                ('header', state.header, state.headerShown, self.HEADER_TOP),
+                ('body', state.body, state.bodyShown, self.BODY_TOP)):
+            if shown and text:
+                block = self._block(style, text)
+                p.drawImage((SCREEN_WIDTH - block.width()) // 2, top, block)
+        p.end()
+
+        return image
+
+    def renderFrame(self, file, timeline, frame):
+        """
+        Return a QImage of the screen at a frame of a sequence
+        """
+        return self.render(textStateAt(file.Commands, timeline.commandAtFrame(frame)))
+
+
+def exportTextPages(file, directory, renderer=None):
+    """
+    Render each page of text in a sequence (see iterTextPages()) to a
+    PNG file in directory. Returns the paths written.
+    """
+    renderer = renderer or TextPreviewRenderer()
+    timeline = Timeline(file)
+    try:
+        paths = []
+        for n, (index, state) in enumerate(iterTextPages(file.Commands), 1):
+            path = os.path.join(directory, f'page_{n:04d}_frame_{timeline.startFrame(index)}.png')
+            if not renderer.render(state).save(path, 'PNG'):
+                raise OSError(f'Could not write "{path}"')
+            paths.append(path)
+        return paths
+    finally:
+        timeline.detach()
+
+
+def previewMain(argv):
+    """
+    Render text previews of a sequence to PNG files without opening a
+    window. Returns an exit code.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog=f'{os.path.basename(sys.argv[0])} preview',
+        description='Render the credits text of a sequence to 256x192 PNG images.')
+    parser.add_argument('file', help='.bin, .json or .txt (script) sequence file')
+    parser.add_argument('-o', '--output-dir', required=True, help='directory to write the images to')
+    parser.add_argument('--frame', action='append',
+        help='render the screen at this time (m:ss.ff or frames) instead of every page; can be repeated')
+    options = parser.parse_args(argv)
+
+    # No display is needed for this
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QtGui.QGuiApplication(sys.argv[:1])
+
+    file = loadSequence(options.file)
+    os.makedirs(options.output_dir, exist_ok=True)
+    if options.frame is None:
+        paths = exportTextPages(file, options.output_dir)
+    else:
+        renderer = TextPreviewRenderer()
+        timeline = Timeline(file)
+        paths = []
+        for frame in map(parseFrames, options.frame):
+            path = os.path.join(options.output_dir, f'frame_{frame}.png')
+            if not renderer.renderFrame(file, timeline, frame).save(path, 'PNG'):
+                raise OSError(f'Could not write "{path}"')
+            paths.append(path)
+
+    print(f'Wrote {len(paths)} images to {options.output_dir}')
+    return 0
+
+
+################################################################
+################################################################
+################################################################
+###################### Background Loading ######################
+
+
+class SequenceLoader(QtCore.QRunnable):
+    """
+    Loads a sequence file on a QThreadPool thread. Its Linter and
+    SearchIndex are built there too, since for large files that takes
+    longer than parsing, and its journal is replayed if it has one.
+    Connect to the signals in self.signals before starting it.
+
+    Once it's loaded, self.baseId is journalBaseId() of the file's
+    data, and self.recovered is the list of commands recovered from
+    its journal (or None).
+    """
+    class Signals(QtCore.QObject):
+        progress = QtCore.pyqtSignal(int) # percent
+        loaded = QtCore.pyqtSignal(object, object, object, float) # CreditsSequenceBin, Linter, SearchIndex, seconds
+        failed = QtCore.pyqtSignal(str)
+
+    class Cancelled(Exception):
+        pass
+
+    def __init__(self, fp):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fp = fp
+        self.cancelled = False
+        self.signals = self.Signals()
+        self.baseId = None
+        self.recovered = None
+        self._percent = -1
+
+    def cancel(self):
+        """
+        Stop loading as soon as possible. No more signals are emitted.
+        """
+        self.cancelled = True
+
+    def _progress(self, done, total):
+        if self.cancelled: raise self.Cancelled
+
+        # Only report whole percents, so that loading a large file
+        # doesn't flood the GUI thread with events. Parsing is counted
+        # as the first half.
+        percent = done * 50 // total
+        if percent != self._percent:
+            self._percent = percent
+            self.signals.progress.emit(percent)
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            with open(self.fp, 'rb') as f:
+                data = f.read()
+            file = CreditsSequenceBin(data, self._progress, recover=True)
+            self.baseId = journalBaseId(data)
+            try:
+                self.recovered = recoverJournal(journalPath(self.fp), self.baseId, file.Commands)
+            except ValueError:
+                pass # it's damaged, and will be replaced
+            self._progress(60, 100)
+            linter = Linter(file)
+            self._progress(70, 100)
+            searchIndex = SearchIndex(file)
+            self._progress(100, 100)
+        except self.Cancelled:
+            return
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.failed.emit(f'{type(e).__name__}: {e}')
+            return
+        if not self.cancelled:
+            self.signals.loaded.emit(file, linter, searchIndex, time.perf_counter() - start)
+
+
+class SequenceSaver(QtCore.QRunnable):
+    """
+    Saves a SequenceSnapshot on a QThreadPool thread, replacing the
+    file atomically (see writeFileAtomically()). Once it's saved,
+    self.baseId is journalBaseId() of the new file.
+    """
+    class Signals(QtCore.QObject):
+        saved = QtCore.pyqtSignal(int, float) # bytes, seconds
+        failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, fp, snapshot):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fp = fp
+        self.snapshot = snapshot
+        self.signals = self.Signals()
+        self.baseId = None
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            writeFileAtomically(self.fp, self.snapshot.saveTo)
+            with open(self.fp, 'rb') as f:
+                self.baseId = journalBaseId(f.read())
+        except Exception as e:
+            self.signals.failed.emit(f'{type(e).__name__}: {e}')
+            return
+        self.signals.saved.emit(self.baseId[0], time.perf_counter() - start)
+
+
+class LoadingPage(QtWidgets.QWidget):
+    """
+    Placeholder tab for a file that's still loading, with a progress
+    bar and a button to cancel (which MainWindow connects to)
+    """
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+
+        self.progressBar = QtWidgets.QProgressBar()
+        self.progressBar.setRange(0, 100)
+        self.cancelBtn = QtWidgets.QPushButton('Cancel')
+        loader.signals.progress.connect(self.progressBar.setValue)
+
+        L = QtWidgets.QVBoxLayout()
+        L.addStretch(1)
+        L.addWidget(QtWidgets.QLabel(f'Loading "{loader.fp}"...'), 0, Qt.AlignCenter)
+        L.addWidget(self.progressBar)
+        L.addWidget(self.cancelBtn, 0, Qt.AlignCenter)
+        L.addStretch(1)
+        self.setLayout(L)
+
+
 ################################################################
 ################################################################
 ################################################################
@@ -1175,25 +1620,60 @@ class CommandPickDlg(QtWidgets.QDialog):
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
-        self.fp = None # file path
 
-        # Create the viewer
-        self.view = CreditsViewer()
-        self.setCentralWidget(self.view)
+        # Files are loaded and saved in the background. That's mostly
+        # Python code, which only runs on one thread at a time, so more
+        # threads than this wouldn't make it any faster; they'd just
+        # slow down the UI.
+        self.workerPool = QtCore.QThreadPool(self)
+        self.workerPool.setMaxThreadCount(2)
+
+        # SequenceSavers that are running, and viewers to save again
+        # once they finish, by viewer
+        self.savers = {}
+        self.pendingSaves = set()
+
+        # Create the tabs. Each one is a CreditsViewer, or a LoadingPage
+        # while its file loads.
+        self.tabs = QtWidgets.QTabWidget()
+        self.tabs.setDocumentMode(True)
+        self.tabs.setTabsClosable(True)
+        self.tabs.setMovable(True)
+        self.tabs.currentChanged.connect(self.updateActions)
+        self.tabs.tabCloseRequested.connect(self.handleCloseTab)
+        self.setCentralWidget(self.tabs)
 
         # Create the menubar and a few actions
         self.createMenubar()
+        self.updateActions()
 
         # Set window title and show the window
         self.setWindowTitle('Newer DS Credits Editor')
         self.show()
 
+    @property
+    def view(self):
+        """
+        The CreditsViewer in the current tab, or None
+        """
+        w = self.tabs.currentWidget()
+        return w if isinstance(w, CreditsViewer) else None
+
     def createMenubar(self):
         """
         Sets up the menubar
         """
         m = self.menuBar()
 
+        def forView(method):
+            """
+            Return a slot that calls a CreditsViewer method on the
+            current tab's viewer
+            """
+            def slot(*args):
+                if self.view is not None: method(self.view)
+            return slot
+
         # File Menu
         f = m.addMenu('&File')
 
@@ -1201,19 +1681,26 @@ class MainWindow(QtWidgets.QMainWindow):
         newAct.setShortcut('Ctrl+N')
         newAct.triggered.connect(self.handleNew)
 
-        openAct = f.addAction('Open File...')
+        openAct = f.addAction('Open Files...')
         openAct.setShortcut('Ctrl+O')
         openAct.triggered.connect(self.handleOpen)
 
         self.saveAct = f.addAction('Save File')
         self.saveAct.setShortcut('Ctrl+S')
         self.saveAct.triggered.connect(self.handleSave)
-        self.saveAct.setEnabled(False)
 
         self.saveAsAct = f.addAction('Save File As...')
         self.saveAsAct.setShortcut('Ctrl+Shift+S')
         self.saveAsAct.triggered.connect(self.handleSaveAs)
-        self.saveAsAct.setEnabled(False)
+
+        self.closeAct = f.addAction('Close File')
+        self.closeAct.setShortcut(QtGui.QKeySequence.Close)
+        self.closeAct.triggered.connect(lambda: self.handleCloseTab(self.tabs.currentIndex()))
+
+        f.addSeparator()
+
+        self.exportPagesAct = f.addAction('Export Text Pages as PNG...')
+        self.exportPagesAct.triggered.connect(self.handleExportPages)
 
         f.addSeparator()
 
@@ -1221,6 +1708,59 @@ class MainWindow(QtWidgets.QMainWindow):
         exitAct.setShortcut('Ctrl+Q')
         exitAct.triggered.connect(self.handleExit)
 
+        # Edit Menu
+        e = m.addMenu('&Edit')
+
+        self.undoAct = e.addAction('Undo')
+        self.undoAct.setShortcut(QtGui.QKeySequence.Undo)
+        self.undoAct.triggered.connect(forView(CreditsViewer.undo))
+
+        self.redoAct = e.addAction('Redo')
+        self.redoAct.setShortcut(QtGui.QKeySequence.Redo)
+        self.redoAct.triggered.connect(forView(CreditsViewer.redo))
+
+        e.addSeparator()
+
+        # Line edits and text boxes in the command editor take these
+        # shortcuts for themselves while they have focus
+        self.cutAct = e.addAction('Cut Commands')
+        self.cutAct.setShortcut(QtGui.QKeySequence.Cut)
+        self.cutAct.triggered.connect(forView(CreditsViewer.handleCut))
+
+        self.copyAct = e.addAction('Copy Commands')
+        self.copyAct.setShortcut(QtGui.QKeySequence.Copy)
+        self.copyAct.triggered.connect(forView(CreditsViewer.handleCopy))
+
+        self.pasteAct = e.addAction('Paste Commands')
+        self.pasteAct.setShortcut(QtGui.QKeySequence.Paste)
+        self.pasteAct.triggered.connect(forView(CreditsViewer.handlePaste))
+
+        self.moveUpAct = e.addAction('Move Commands Up')
+        self.moveUpAct.setShortcut('Alt+Up')
+        self.moveUpAct.triggered.connect(forView(lambda view: view.moveSelection(-1)))
+
+        self.moveDownAct = e.addAction('Move Commands Down')
+        self.moveDownAct.setShortcut('Alt+Down')
+        self.moveDownAct.triggered.connect(forView(lambda view: view.moveSelection(1)))
+
+        e.addSeparator()
+
+        self.bulkEditAct = e.addAction('Bulk Edit...')
+        self.bulkEditAct.setShortcut('Ctrl+B')
+        self.bulkEditAct.triggered.connect(forView(CreditsViewer.handleBulkEdit))
+
+        self.replaceAct = e.addAction('Replace Text...')
+        self.replaceAct.setShortcut(QtGui.QKeySequence.Replace)
+        self.replaceAct.triggered.connect(forView(CreditsViewer.handleReplace))
+
+        self.findAct = e.addAction('Filter Commands')
+        self.findAct.setShortcut(QtGui.QKeySequence.Find)
+        self.findAct.triggered.connect(forView(lambda view: view.filterEdit.setFocus()))
+
+        self.nextIssueAct = e.addAction('Go to Next Problem')
+        self.nextIssueAct.setShortcut('F8')
+        self.nextIssueAct.triggered.connect(forView(CreditsViewer.handleNextIssue))
+
         # Help Menu
         h = m.addMenu('&Help')
 
@@ -1229,73 +1769,303 @@ class MainWindow(QtWidgets.QMainWindow):
         aboutAct.triggered.connect(self.handleAbout)
 
 
+    def updateActions(self):
+        """
+        Enable or disable the actions that depend on the current tab
+        """
+        view = self.view
+        hasView = view is not None
+        self.saveAct.setEnabled(hasView and view.fp is not None)
+        for act in (self.saveAsAct, self.exportPagesAct, self.cutAct, self.copyAct, self.pasteAct,
+                self.moveUpAct, self.moveDownAct, self.bulkEditAct, self.replaceAct, self.findAct, self.nextIssueAct):
+            act.setEnabled(hasView)
+        self.closeAct.setEnabled(self.tabs.count() > 0)
+        self.updateUndoActions()
+
+    def addViewer(self, file, fp=None, index=None, linter=None, searchIndex=None):
+        """
+        Add a tab with a new CreditsViewer for a file, at index or at
+        the end, and return the viewer
+        """
+        view = CreditsViewer()
+        view.fp = fp
+        view.setFile(file, linter, searchIndex)
+        view.undoStackChanged.connect(self.updateUndoActions)
+
+        title = os.path.basename(fp) if fp is not None else 'Untitled'
+        index = self.tabs.insertTab(self.tabs.count() if index is None else index, view, title)
+        self.tabs.setTabToolTip(index, fp or '')
+        return view
+
     def handleNew(self):
         """
         Handle creating a new file
         """
-        f = CreditsSequenceBin()
-        self.view.setFile(f)
-        self.saveAsAct.setEnabled(True)
+        view = self.addViewer(CreditsSequenceBin())
+        self.tabs.setCurrentWidget(view)
 
     def handleOpen(self):
         """
         Handle file opening
         """
-        fp = QtWidgets.QFileDialog.getOpenFileName(self, 'Open File', '', 'Binary Files (*.bin);;All Files (*)')[0]
-        if fp == '': return
-        self.fp = fp
-
-        # Open the file
-        with open(fp, 'rb') as f:
-            data = f.read()
+        fps = QtWidgets.QFileDialog.getOpenFileNames(self, 'Open Files', '', 'Binary Files (*.bin);;All Files (*)')[0]
+        self.openFiles(fps)
 
-        M = CreditsSequenceBin(data)
+    def openFiles(self, fps):
+        """
+        Start loading files in the background, each in its own tab.
+        Files that are already open are just switched to.
+        """
+        openPaths = {}
+        for i in range(self.tabs.count()):
+            w = self.tabs.widget(i)
+            fp = w.loader.fp if isinstance(w, LoadingPage) else w.fp
+            if fp is not None: openPaths[os.path.abspath(fp)] = w
+
+        for fp in fps:
+            if os.path.abspath(fp) in openPaths:
+                self.tabs.setCurrentWidget(openPaths[os.path.abspath(fp)])
+                continue
+
+            loader = SequenceLoader(fp)
+            page = LoadingPage(loader)
+            loader.signals.loaded.connect(
+                lambda file, linter, searchIndex, seconds, page=page: self.handleLoaded(page, file, linter, searchIndex, seconds))
+            loader.signals.failed.connect(lambda message, page=page: self.handleLoadFailed(page, message))
+            page.cancelBtn.clicked.connect(lambda checked, page=page: self.handleCloseTab(self.tabs.indexOf(page)))
+            self.tabs.setCurrentIndex(self.tabs.addTab(page, os.path.basename(fp)))
+            openPaths[os.path.abspath(fp)] = page
+            self.workerPool.start(loader)
+
+    def handleLoaded(self, page, file, linter, searchIndex, seconds):
+        """
+        Replace a LoadingPage with a CreditsViewer once its file has
+        loaded
+        """
+        i = self.tabs.indexOf(page)
+        if i == -1: return # its tab was closed
+
+        wasCurrent = self.tabs.currentIndex() == i
+        self.tabs.removeTab(i)
+        view = self.addViewer(file, page.loader.fp, i, linter, searchIndex)
+        if wasCurrent: self.tabs.setCurrentWidget(view)
+        page.deleteLater()
+
+        if file.parseErrors:
+            details = '\n'.join(str(e) for e in file.parseErrors[:10])
+            if len(file.parseErrors) > 10:
+                details += f'\n(and {len(file.parseErrors) - 10} more)'
+            QtWidgets.QMessageBox.warning(
+                self,
+                'Damaged File',
+                f'"{page.loader.fp}" is damaged. As much of it as possible was opened, but the parts that couldn\'t'
+                ' be read were left out, and will be missing if it\'s saved.\n\n' + details,
+                )
 
-        # Update the viewer with this data
-        self.view.setFile(M)
+        recovered = page.loader.recovered is not None and QtWidgets.QMessageBox.question(
+            self,
+            'Recover Unsaved Changes',
+            f'"{page.loader.fp}" has unsaved changes from a previous session. Do you want to restore them?'
+            ' If not, they will be discarded.',
+            ) == QtWidgets.QMessageBox.Yes
+        if recovered:
+            file.setCommands(page.loader.recovered)
+        self.startJournal(view, page.loader.baseId, recovered)
 
-        # Enable saving
-        self.saveAct.setEnabled(True)
-        self.saveAsAct.setEnabled(True)
+        self.statusBar().showMessage(
+            f'Loaded "{page.loader.fp}" ({len(file.Commands)} commands) in {seconds * 1000:.0f} ms', 5000)
 
-    def handleSave(self):
+    def handleLoadFailed(self, page, message):
         """
-        Handle file saving
+        Close a LoadingPage whose file couldn't be loaded
         """
-        data = self.view.saveFile()
-
+        i = self.tabs.indexOf(page)
+        if i == -1: return
+        self.tabs.removeTab(i)
+        page.deleteLater()
+
+        QtWidgets.QMessageBox.warning(
+            self,
+            'Unable to Open',
+            f'There was an error while trying to open "{page.loader.fp}". (Specifically, "{message}".)',
+            )
+
+    def startJournal(self, view, baseId, checkpoint=False):
+        """
+        Start recording the edits made in a viewer to its file's
+        journal, replacing any journal it already has. See EditJournal
+        for baseId and checkpoint.
+        """
+        if view.journal is not None:
+            view.journal.close(False)
+            view.journal = None
         try:
-            with open(self.fp, 'wb') as f:
-                f.write(data)
+            view.journal = EditJournal(journalPath(view.fp), view.file, baseId, checkpoint)
         except OSError as e:
-            QtWidgets.QMessageBox.warning(
-                self,
-                'Unable to Save',
-                f'There was an error while trying to save "{self.fp}".'
-                f' (Specifically, "OSError: {e}".)\n'
-                '\n'
-                'If the file is open in another program, close that program and try again.'
-                ' Otherwise, use Save As to save your work somewhere else.',
-                )
+            self.statusBar().showMessage(f'Unable to create a journal for "{view.fp}", so changes can\'t be recovered after a crash: {e}')
+        else:
+            view.journal.errorCallback = lambda e: self.statusBar().showMessage(
+                f'Unable to write to the journal for "{view.fp}", so changes from now on can\'t be recovered after a crash: {e}')
+
+    def closeJournals(self):
+        """
+        Close the journal of every tab. Journals with unsaved edits are
+        kept, to be recovered when their files are opened again.
+        """
+        for i in range(self.tabs.count()):
+            w = self.tabs.widget(i)
+            if isinstance(w, CreditsViewer) and w.journal is not None:
+                w.journal.close()
+                w.journal = None
+
+    def handleCloseTab(self, i):
+        """
+        Close a tab, cancelling loading if it's still loading. Unsaved
+        edits are kept in the file's journal.
+        """
+        w = self.tabs.widget(i)
+        if w is None: return
+        if isinstance(w, LoadingPage):
+            w.loader.cancel()
+        elif w.journal is not None:
+            w.journal.close()
+            w.journal = None
+        self.tabs.removeTab(i)
+        w.deleteLater()
+
+    def handleSave(self, view=None):
+        """
+        Handle file saving. The file is saved in the background, as it
+        is right now, so it can keep being edited in the meantime.
+        """
+        view = view or self.view
+        if view is None or view.fp is None: return
+        if view in self.savers:
+            # Save again afterwards, rather than racing the current save
+            self.pendingSaves.add(view)
+            return
+
+        saver = SequenceSaver(view.fp, SequenceSnapshot(view.file))
+        saver.signals.saved.connect(lambda size, seconds: self.handleSaved(view, size, seconds))
+        saver.signals.failed.connect(lambda message: self.handleSaveFailed(view, message))
+        self.savers[view] = saver
+        self.statusBar().showMessage(f'Saving "{view.fp}"...')
+        self.workerPool.start(saver)
+
+    def finishSave(self, view):
+        """
+        Clean up after a SequenceSaver, and start the next save of the
+        same viewer if there is one
+        """
+        saver = self.savers.pop(view)
+        saver.snapshot.detach()
+        if view in self.pendingSaves:
+            self.pendingSaves.remove(view)
+            self.handleSave(view)
+        return saver
+
+    def handleSaved(self, view, size, seconds):
+        """
+        Handle a file having been saved
+        """
+        saver = self.finishSave(view)
+
+        # Start the journal again on top of the saved file. Anything
+        # edited while it was being saved is still unsaved.
+        editedSince = saver.snapshot.Commands != view.file.Commands
+        if view.journal is not None and view.journal.path == journalPath(saver.fp):
+            try:
+                view.journal.restart(saver.baseId, editedSince)
+            except OSError as e:
+                self.statusBar().showMessage(f'Unable to restart the journal for "{view.fp}", so changes can\'t be recovered after a crash: {e}')
+        elif view.fp == saver.fp and any(self.tabs.widget(i) is view for i in range(self.tabs.count())):
+            self.startJournal(view, saver.baseId, editedSince)
+
+        self.statusBar().showMessage(
+            f'Saved "{saver.fp}" ({len(saver.snapshot.Commands)} commands, {size} bytes) in {seconds * 1000:.0f} ms', 5000)
+
+    def handleSaveFailed(self, view, message):
+        """
+        Handle a file that couldn't be saved. The original file is
+        left as it was.
+        """
+        saver = self.finishSave(view)
+        self.statusBar().clearMessage()
+        QtWidgets.QMessageBox.warning(
+            self,
+            'Unable to Save',
+            f'There was an error while trying to save "{saver.fp}".'
+            f' (Specifically, "{message}".) The file has not been changed.\n'
+            '\n'
+            'If the file is open in another program, close that program and try again.'
+            ' Otherwise, use Save As to save your work somewhere else.',
+            )
 
     def handleSaveAs(self):
         """
         Handle saving to a new file
         """
+        view = self.view
+        if view is None: return
         fp = QtWidgets.QFileDialog.getSaveFileName(self, 'Save File', '', 'Binary Files (*.bin);;All Files (*)')[0]
         if fp == '': return
-        self.fp = fp
+        view.fp = fp
+        i = self.tabs.indexOf(view)
+        self.tabs.setTabText(i, os.path.basename(fp))
+        self.tabs.setTabToolTip(i, fp)
 
         # Save it
         self.handleSave()
 
         # Enable saving
-        self.saveAct.setEnabled(True)
+        self.updateActions()
+
+    def handleExportPages(self):
+        """
+        Handle exporting every page of text to PNG files
+        """
+        view = self.view
+        if view is None: return
+        directory = QtWidgets.QFileDialog.getExistingDirectory(self, 'Export Text Pages')
+        if directory == '': return
+
+        try:
+            paths = exportTextPages(view.file, directory, view.renderer)
+        except OSError as e:
+            QtWidgets.QMessageBox.warning(self, 'Unable to Export', str(e))
+            return
+
+        QtWidgets.QMessageBox.information(self, 'Export Text Pages', f'Exported {len(paths)} pages to "{directory}".')
+
+    def updateUndoActions(self):
+        """
+        Enable or disable Undo and Redo
+        """
+        stack = self.view.undoStack if self.view is not None else None
+        self.undoAct.setEnabled(stack is not None and stack.canUndo())
+        self.redoAct.setEnabled(stack is not None and stack.canRedo())
+
+    def cancelLoading(self):
+        """
+        Cancel every file that's still loading, and wait for those and
+        any saves in progress to finish
+        """
+        for i in range(self.tabs.count()):
+            w = self.tabs.widget(i)
+            if isinstance(w, LoadingPage): w.loader.cancel()
+        self.workerPool.waitForDone()
+
+    def closeEvent(self, event):
+        self.cancelLoading()
+        self.closeJournals()
+        super().closeEvent(event)
 
     def handleExit(self):
         """
         Exit the editor
         """
+        self.cancelLoading()
+        self.closeJournals()
         raise SystemExit
 
     def handleAbout(self):
@@ -1335,8 +2105,28 @@ def main(argv):
     """
     Main startup function
     """
+    argv = list(argv)
+    for i, arg in enumerate(argv[1:], 1):
+        if arg == '--trace' and i + 1 < len(argv):
+            enableTracing(argv[i + 1])
+            del argv[i : i + 2]
+            break
+        elif arg.startswith('--trace='):
+            enableTracing(arg[len('--trace='):])
+            del argv[i]
+            break
+
+    if len(argv) > 1 and argv[1] in BATCH_ACTIONS:
+        # Batch mode: no GUI
+        sys.exit(batchMain(argv[1:]))
+    if len(argv) > 1 and argv[1] in TOOL_ACTIONS:
+        sys.exit(TOOL_ACTIONS[argv[1]](argv[2:]))
+    if len(argv) > 1 and argv[1] == 'preview':
+        sys.exit(previewMain(argv[2:]))
+
     app = QtWidgets.QApplication(argv)
     mainWindow = MainWindow()
+    mainWindow.openFiles(app.arguments()[1:])
     sys.exit(app.exec_())
 
 if __name__ == '__main__': main(sys.argv)
@@ -0,0 +1,31 @@
+# Newer DS Credits Editor - Edits Newer DS's
+# zh_cutscenes/A_CREDITS/2848 Credits_Sequence.bin
+# Version 1.0
+# Copyright (C) 2013-2019 RoadrunnerWMC
+
+# This file is part of Newer DS Credits Editor.
+
+# Newer DS Credits Editor is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Newer DS Credits Editor is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Newer DS Credits Editor.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# conftest.py
+# The modules being tested are in the directory above, which isn't a
+# package, so it's added to the import path.
+
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,215 @@
+# Newer DS Credits Editor - Edits Newer DS's
+# zh_cutscenes/A_CREDITS/2848 Credits_Sequence.bin
+# Version 1.0
+# Copyright (C) 2013-2019 RoadrunnerWMC
+
+# This file is part of Newer DS Credits Editor.
+
+# Newer DS Credits Editor is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Newer DS Credits Editor is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Newer DS Credits Editor.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# test_journal.py
+# Tests of EditJournal and recoverJournal()
+
+
+import struct
+
+import pytest
+
+import newer_ds_credits_core as core
+
+
+def makeFile():
+    """
+    Return a small CreditsSequenceBin, and the data it was loaded from
+    """
+    file = core.CreditsSequenceBin()
+    file.Commands = [
+        core.SetBodyTextCommand('Treeki'),
+        core.ShowTextCommand(),
+        core.DelayCommand(60),
+        core.DelayCommand(30),
+        core.ExitStageCommand(),
+        ]
+    data = file.save()
+    return core.CreditsSequenceBin(data), data
+
+
+def recovered(path, data):
+    """
+    Return the commands recoverJournal() gets from a journal, as a
+    list of JSON-like dicts that can be compared
+    """
+    commands = core.recoverJournal(path, core.journalBaseId(data), core.CreditsSequenceBin(data).Commands)
+    return None if commands is None else [core._commandToDict(com) for com in commands]
+
+
+def current(file):
+    return [core._commandToDict(com) for com in file.Commands]
+
+
+@pytest.mark.parametrize('text', [
+    'x' * (core.MAX_TEXT_LENGTH + 2), # too long to save
+    'Trééki ★', # not all latin-1
+    ], ids=['tooLong', 'notLatin1'])
+def test_unsaveableTextIsJournalled(tmp_path, text):
+    file, data = makeFile()
+    path = str(tmp_path / 'a.bin.journal')
+    journal = core.EditJournal(path, file, core.journalBaseId(data))
+
+    # Typing the text into the editor, one character at a time
+    for i in range(1, len(text) + 1):
+        file.setField(0, 'text', text[:i])
+    file.setFieldValues('text', [0], ['!' + text])
+    file.insertCommands(1, [core.SetHeaderTextCommand(text)])
+
+    assert journal.error is None
+    with pytest.raises(ValueError):
+        file.save()
+    assert recovered(path, data) == current(file)
+    journal.close()
+
+
+def test_unsaveableTextInCheckpoint(tmp_path):
+    file, data = makeFile()
+    file.setField(0, 'text', 'x' * 0x100)
+    path = str(tmp_path / 'a.bin.journal')
+    journal = core.EditJournal(path, file, core.journalBaseId(data), checkpoint=True)
+    file.setCommands(file.Commands + [core.SetHeaderTextCommand('★')])
+    assert recovered(path, data) == current(file)
+    journal.close()
+
+
+def test_writeErrorDoesNotFailEdits(tmp_path):
+    file, data = makeFile()
+    path = str(tmp_path / 'a.bin.journal')
+    journal = core.EditJournal(path, file, core.journalBaseId(data))
+    errors = []
+    journal.errorCallback = errors.append
+
+    class FullDisk():
+        def write(self, data): raise OSError(28, 'No space left on device')
+        def flush(self): pass
+        def close(self): pass
+    journal._f = FullDisk()
+
+    file.setField(2, 'time', 1)
+    file.setField(2, 'time', 2)
+    assert file.Commands[2].time == 2
+    assert isinstance(journal.error, OSError)
+    assert errors == [journal.error]
+
+    # Restarting after a save records edits again
+    data = file.save()
+    journal.restart(core.journalBaseId(data))
+    file.setField(3, 'time', 5)
+    assert journal.error is None
+    assert recovered(path, data) == current(file)
+    journal.close()
+
+
+def makeEdits(file):
+    """
+    Make one edit of every kind that the journal records
+    """
+    file.insertCommands(1, [core.SetHeaderTextCommand('Music'), core.DelayCommand(5)])
+    file.removeCommands(4)
+    file.moveCommands(0, 2, 4)
+    delays = [i for i, com in enumerate(file.Commands) if isinstance(com, core.DelayCommand)]
+    file.setField(delays[0], 'time', 90)
+    file.setFieldValues('time', delays, [7] * len(delays))
+    file.setCommands(file.Commands + [core.HideTextCommand()])
+    file.insertCommands(0, [core.UnknownCommand(99, b'\x01\x02')])
+
+
+def test_replay(tmp_path):
+    file, data = makeFile()
+    path = str(tmp_path / 'a.bin.journal')
+    journal = core.EditJournal(path, file, core.journalBaseId(data))
+    makeEdits(file)
+    assert journal.editCount == 7
+    assert recovered(path, data) == current(file)
+
+    # The journal is kept when it has edits that weren't saved
+    journal.close()
+    assert recovered(path, data) == current(file)
+
+
+def test_replayAfterCompacting(tmp_path):
+    file, data = makeFile()
+    path = str(tmp_path / 'a.bin.journal')
+    journal = core.EditJournal(path, file, core.journalBaseId(data), compactSize=0)
+    makeEdits(file)
+    assert recovered(path, data) == current(file)
+    journal.close()
+
+
+def test_truncatedLastRecord(tmp_path):
+    file, data = makeFile()
+    path = str(tmp_path / 'a.bin.journal')
+    journal = core.EditJournal(path, file, core.journalBaseId(data))
+    file.setField(2, 'time', 1)
+    expected = current(file)
+    with open(path, 'rb') as f:
+        size = len(f.read())
+    file.setField(3, 'time', 2)
+    journal.close()
+
+    # A crash partway through writing a record leaves part of it,
+    # which is ignored
+    with open(path, 'rb') as f:
+        journalData = f.read()
+    for end in range(size, len(journalData)):
+        with open(path, 'wb') as f:
+            f.write(journalData[:end])
+        assert recovered(path, data) == expected
+
+    # So is a whole record with the wrong checksum
+    with open(path, 'wb') as f:
+        f.write(journalData[:-1] + bytes([journalData[-1] ^ 1]))
+    assert recovered(path, data) == expected
+
+
+def test_nothingToRecover(tmp_path):
+    file, data = makeFile()
+    path = str(tmp_path / 'a.bin.journal')
+    assert recovered(path, data) is None
+
+    # A journal with no edits is deleted when it's closed
+    journal = core.EditJournal(path, file, core.journalBaseId(data))
+    assert recovered(path, data) is None
+    journal.close()
+    assert not (tmp_path / 'a.bin.journal').exists()
+
+    # A journal for a file that's been changed since doesn't apply
+    journal = core.EditJournal(path, file, core.journalBaseId(data))
+    file.setField(2, 'time', 1)
+    journal.close()
+    assert recovered(path, file.save()) is None
+
+
+def test_damagedJournal(tmp_path):
+    file, data = makeFile()
+    path = tmp_path / 'a.bin.journal'
+    path.write_bytes(b'not a journal at all')
+    with pytest.raises(ValueError):
+        recovered(str(path), data)
+
+    # A record that a crash couldn't have written
+    journal = core.EditJournal(str(path), file, core.journalBaseId(data))
+    journal._append(core.JOURNAL_REMOVE, struct.pack('<II', 3, 10))
+    journal.close()
+    with pytest.raises(ValueError):
+        recovered(str(path), data)
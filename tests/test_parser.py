@@ -0,0 +1,116 @@
+# Newer DS Credits Editor - Edits Newer DS's
+# zh_cutscenes/A_CREDITS/2848 Credits_Sequence.bin
+# Version 1.0
+# Copyright (C) 2013-2019 RoadrunnerWMC
+
+# This file is part of Newer DS Credits Editor.
+
+# Newer DS Credits Editor is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Newer DS Credits Editor is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Newer DS Credits Editor.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# test_parser.py
+# Tests of loading damaged sequences, strictly and with recover=True
+
+
+import pytest
+
+import fuzz
+import newer_ds_credits_core as core
+
+
+DELAY = bytes([4, 1, 60, 0]) # Delay time=60
+END = bytes([2, 0]) # the terminating record
+
+
+def load(data):
+    """
+    Load data with recover=True, and check that strict parsing fails
+    at the first problem it finds
+    """
+    file = core.CreditsSequenceBin(data, recover=True)
+    assert file.parseErrors
+    with pytest.raises(core.SequenceParseError) as info:
+        core.CreditsSequenceBin(data)
+    assert info.value.offset == file.parseErrors[0].offset
+    return file
+
+
+def times(file):
+    return [com.time for com in file.Commands]
+
+
+def test_undamaged():
+    file = core.CreditsSequenceBin(DELAY + DELAY + END, recover=True)
+    assert file.parseErrors == []
+    assert times(file) == [60, 60]
+
+
+def test_noTerminator():
+    file = load(DELAY + DELAY)
+    assert times(file) == [60, 60]
+    assert file.parseErrors[0].offset == 8
+
+    file = load(b'')
+    assert file.Commands == []
+
+
+def test_cutOff():
+    # The last record says it's longer than the data that's left
+    file = load(DELAY + DELAY[:3])
+    assert times(file) == [60]
+    assert file.parseErrors[0].offset == 4
+    assert len(file.parseErrors) == 1
+
+
+def test_impossibleLength():
+    # Loading continues at the next multiple of 4 bytes
+    file = load(DELAY + bytes([1, 1, 99, 0]) + DELAY + END)
+    assert times(file) == [60, 60]
+    assert [e.offset for e in file.parseErrors] == [4]
+
+
+def test_tooShortForType():
+    # The record is skipped, but its length is trusted
+    file = load(bytes([2, 1]) + DELAY + END)
+    assert times(file) == [60]
+    assert [e.offset for e in file.parseErrors] == [0]
+
+
+def test_textDoesNotFit():
+    file = load(bytes([4, 14, 10, ord('a')]) + DELAY + END) # SetBodyText
+    assert times(file) == [60]
+    assert 'doesn\'t fit' in file.parseErrors[0].message
+
+
+def test_unknownCommandIsNotDamage():
+    file = core.CreditsSequenceBin(bytes([4, 0xEE, 1, 2]) + DELAY + END)
+    assert type(file.Commands[0]) is core.UnknownCommand
+    assert (file.Commands[0].commandId, file.Commands[0].data) == (0xEE, b'\x01\x02')
+    assert file.save() == bytes([4, 0xEE, 1, 2]) + DELAY + END
+
+
+def test_everyProblemFound():
+    data = bytes([1, 1, 0, 0]) + bytes([2, 1]) + DELAY + bytes([4, 14, 10, ord('a')]) + DELAY + DELAY[:2]
+    file = load(data)
+    assert times(file) == [60, 60]
+    assert [e.offset for e in file.parseErrors] == [0, 4, 10, 18]
+
+
+def test_fuzzSeeds():
+    # Every seed input, and every way of cutting each one off, parses
+    # consistently
+    for data in fuzz.seedCorpus():
+        for end in range(0, len(data) + 1, 3):
+            fuzz.checkInput(data[:end])
@@ -0,0 +1,143 @@
+# Newer DS Credits Editor - Edits Newer DS's
+# zh_cutscenes/A_CREDITS/2848 Credits_Sequence.bin
+# Version 1.0
+# Copyright (C) 2013-2019 RoadrunnerWMC
+
+# This file is part of Newer DS Credits Editor.
+
+# Newer DS Credits Editor is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# Newer DS Credits Editor is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with Newer DS Credits Editor.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+# test_patch.py
+# Tests of diffSequences(), makePatch() and applyPatch()
+
+
+import random
+
+import pytest
+
+import benchmark
+import newer_ds_credits_core as core
+
+
+def sequence(*commands):
+    file = core.CreditsSequenceBin()
+    file.Commands = list(commands)
+    return file
+
+
+def assertRoundTrip(old, new):
+    """
+    Check that a patch made from old to new turns old into new, with
+    and without comments
+    """
+    for comments in (False, True):
+        patch = core.makePatch(old, new, comments=comments)
+        assert core.applyPatch(old, patch).save() == new.save()
+
+
+def test_unknownCommandChanged():
+    old = sequence(core.UnknownCommand(99, b'\x01\x02'), core.ExitStageCommand())
+    new = sequence(core.UnknownCommand(99, b'\x03\x04'), core.ExitStageCommand())
+    patch = core.makePatch(old, new)
+    assert '~ Unknown commandId=99 data=' in patch
+    assertRoundTrip(old, new)
+
+
+def test_unknownCommandIdChanged():
+    old = sequence(core.UnknownCommand(99, b'\x01\x02'))
+    new = sequence(core.UnknownCommand(100, b'\x01\x02'))
+    assertRoundTrip(old, new)
+
+
+def test_unknownCommandsInsertedAndRemoved():
+    old = sequence(core.DelayCommand(1), core.UnknownCommand(200, b'abc'), core.DelayCommand(2))
+    new = sequence(core.UnknownCommand(201), core.DelayCommand(1), core.DelayCommand(2))
+    assertRoundTrip(old, new)
+    assertRoundTrip(new, old)
+
+
+def delays(*times):
+    return sequence(*(core.DelayCommand(t) for t in times))
+
+
+def editDistance(a, b):
+    """
+    Return the smallest number of commands that have to be inserted
+    or removed to turn list a into list b
+    """
+    row = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        previous, row[0] = row[0], i
+        for j, y in enumerate(b, 1):
+            previous, row[j] = row[j], previous if x == y else min(row[j], row[j - 1]) + 1
+    return row[-1]
+
+
+def test_identical():
+    old = delays(1, 2, 3)
+    assert core.diffSequences(old, delays(1, 2, 3)) == []
+    assert core.applyPatch(old, core.makePatch(old, old)).save() == old.save()
+
+
+def test_insertOnly():
+    old, new = delays(1, 2, 3), delays(0, 1, 2, 9, 9, 3, 4)
+    assert core.diffSequences(old, new) == [(0, 0, 0, 1), (2, 2, 3, 5), (3, 3, 6, 7)]
+    assert not any(line.startswith('-') for line in core.makePatch(old, new).splitlines())
+    assertRoundTrip(old, new)
+    assertRoundTrip(delays(), new)
+
+
+def test_deleteOnly():
+    old, new = delays(0, 1, 2, 9, 9, 3, 4), delays(1, 2, 3)
+    assert core.diffSequences(old, new) == [(0, 1, 0, 0), (3, 5, 2, 2), (6, 7, 3, 3)]
+    assert not any(line.startswith('+') for line in core.makePatch(old, new).splitlines())
+    assertRoundTrip(old, new)
+    assertRoundTrip(old, delays())
+
+
+def test_shortestEditScript():
+    rng = random.Random(0)
+    for _ in range(300):
+        a = [rng.randrange(4) for _ in range(rng.randrange(12))]
+        b = [rng.randrange(4) for _ in range(rng.randrange(12))]
+        old, new = delays(*a), delays(*b)
+        hunks = core.diffSequences(old, new)
+        assert sum(i2 - i1 + j2 - j1 for i1, i2, j1, j2 in hunks) == editDistance(a, b)
+        assertRoundTrip(old, new)
+
+
+@pytest.mark.parametrize('changes', [1, 50, 1000])
+def test_anchored(monkeypatch, changes):
+    old = benchmark.generateSequence(3000, 1)
+    new = benchmark.editSequence(old, changes, 2)
+    assertRoundTrip(old, new)
+    monkeypatch.setattr(core, 'ANCHORED_DIFF_THRESHOLD', 0)
+    assertRoundTrip(old, new)
+
+
+@pytest.mark.parametrize('setting, value', [('DIFF_MAX_COST', 4), ('DIFF_BUDGET', 0)])
+def test_costLimit(monkeypatch, setting, value):
+    # Past the limit, whatever is left becomes one hunk, but the patch
+    # still works
+    old = benchmark.generateSequence(500, 1)
+    new = benchmark.editSequence(old, 40, 2)
+    monkeypatch.setattr(core, setting, value)
+    hunks = core.diffSequences(old, new)
+    assert sum(i2 - i1 + j2 - j1 for i1, i2, j1, j2 in hunks) > 80
+    assertRoundTrip(old, new)
+
+    # Unrelated sequences too
+    assertRoundTrip(old, benchmark.generateSequence(400, 2))